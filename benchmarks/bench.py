@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+throughput benchmarks for the hot paths of es2json, without an Elasticsearch cluster
+
+starts the fake Elasticsearch of fake_es.py with generated documents and runs every scenario
+in its own python process, so the peak memory (RSS) of each scenario gets measured on its own.
+Reported per scenario:
+    docs/s, MB/s (response bytes sent by the fake cluster), peak RSS of the process and the time spent
+    in requests (incl. decoding the responses), in return_doc and in encoding/writing the output
+the stage times are summed up over all threads, so they can be bigger than the wall time for parallel scenarios
+
+run from the root directory of this git repository:
+    python3 benchmarks/bench.py [--docs N] [--doc-size BYTES] [--latency SECONDS] [--json] [SCENARIO ...]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_es  # noqa: E402
+
+INDEX = "bench"
+
+SCENARIOS = {
+    # name: (generator class, extra arguments)
+    "scroll": ("ESGenerator", {"paginator": "scroll"}),
+    "scroll-prefetch": ("ESGenerator", {"paginator": "scroll", "prefetch": 2}),
+    "scroll-parallel": ("ESGenerator", {"paginator": "scroll", "parallel": 4}),
+    "pit": ("ESGenerator", {"paginator": "pit"}),
+    "headless": ("ESGenerator", {"headless": True}),
+    "headless-passthrough": ("ESGenerator", {"headless": True, "passthrough": True}),
+    "idfile": ("IDFile", {}),
+    "idfile-parallel": ("IDFile", {"parallel": 4}),
+    "cli": ("cli", {}),
+}
+
+
+class Timings:
+    """
+    thread-safe sums of the time spent per stage
+    """
+    def __init__(self):
+        self.stages = {"request": 0.0, "return_doc": 0.0, "write": 0.0}
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.stages[stage] += seconds
+
+    def timed(self, stage, function):
+        """
+        returns function wrapped to add the time of every call to stage
+        """
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+
+class TimedClient:
+    """
+    proxy for the elasticsearch.Elasticsearch() client which times all its API calls
+    """
+    def __init__(self, es, timings):
+        self.es = es
+        self.timings = timings
+
+    def __getattr__(self, name):
+        attribute = getattr(self.es, name)
+        if callable(attribute):
+            return self.timings.timed("request", attribute)
+        return attribute
+
+
+def child(params):
+    """
+    runs one scenario against the fake cluster, returns its results
+    """
+    import es2json
+    import es2json.cli
+    import es2json.output
+    kind, kwargs = SCENARIOS[params["scenario"]]
+    start = time.perf_counter()
+    if kind == "cli":
+        es2json.cli.run(["-server", "http://127.0.0.1:{}/{}".format(params["port"], INDEX),
+                         "-chunksize", str(params["chunksize"]), "-output", os.devnull])
+        return {"records": params["docs"], "seconds": time.perf_counter() - start, "stages": {}}
+    kwargs = dict(kwargs, host="127.0.0.1", port=params["port"], index=INDEX, chunksize=params["chunksize"], verbose=False)
+    if kind == "IDFile":
+        # every 10th ID is missing in the index
+        kwargs.update(idfile=[str(n) for n in range(params["docs"] + params["docs"] // 10)], missing_behaviour="yield")
+    generator = getattr(es2json, kind)(**kwargs)
+    timings = Timings()
+    generator.es = TimedClient(generator.es, timings)
+    if generator.raw_es:
+        generator.raw_es = TimedClient(generator.raw_es, timings)
+    generator.return_raw_doc = timings.timed("return_doc", generator.return_raw_doc)
+    records = 0
+    with open(os.devnull, "wb") as fileobj:
+        with es2json.output.NDJSONWriter(fileobj) as writer:
+            write = timings.timed("write", writer.write)
+            for record in generator.generator():
+                if isinstance(record, bytes) or record.get("found") is not False:
+                    records += 1
+                write(record)
+    return {"records": records, "seconds": time.perf_counter() - start, "stages": timings.stages}
+
+
+def run(scenario, cluster, port, docs, chunksize):
+    """
+    runs the scenario in a new python process, returns the results
+    """
+    params = {"scenario": scenario, "port": port, "docs": docs, "chunksize": chunksize}
+    bytes_sent = cluster.bytes_sent
+    with tempfile.TemporaryFile() as stderr:  # progress output and warnings, only shown if the scenario fails
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", json.dumps(params)],
+                                   stdout=subprocess.PIPE, stderr=stderr)
+        result = process.stdout.read()
+        process.stdout.close()
+        _, status, usage = os.wait4(process.pid, 0)  # wait4 gives us the resource usage of just this process
+        process.returncode = status
+        if status:
+            stderr.seek(0)
+            sys.stderr.write(stderr.read().decode("utf-8", "replace"))
+            raise RuntimeError("scenario {} failed".format(scenario))
+    result = json.loads(result.decode("utf-8").splitlines()[-1])
+    result["scenario"] = scenario
+    result["bytes"] = cluster.bytes_sent - bytes_sent
+    result["peak_rss"] = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)  # bytes on macOS, KiB elsewhere
+    return result
+
+
+def report(results):
+    columns = "{:<20} {:>8} {:>8} {:>9} {:>7} {:>8} {:>8} {:>10} {:>7}"
+    print(columns.format("scenario", "docs", "seconds", "docs/s", "MB/s", "RSS MB", "request", "return_doc", "write"))
+    for result in results:
+        stages = result["stages"]
+        print(columns.format(result["scenario"],
+                             result["records"],
+                             "{:.2f}".format(result["seconds"]),
+                             "{:.0f}".format(result["records"] / result["seconds"]),
+                             "{:.1f}".format(result["bytes"] / result["seconds"] / 1e6),
+                             "{:.0f}".format(result["peak_rss"] / 1e6),
+                             *("{:.2f}".format(stages[stage]) if stage in stages else "-"
+                               for stage in ("request", "return_doc", "write"))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="throughput benchmarks of es2json against a fake Elasticsearch")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help="scenarios to run, default is all of them: " + ", ".join(SCENARIOS))
+    parser.add_argument("--docs", type=int, default=20000, help="number of documents, default is 20000")
+    parser.add_argument("--doc-size", type=int, default=500, help="size of a document in bytes, default is 500")
+    parser.add_argument("--latency", type=float, default=0.001, help="latency of every request in seconds, default is 0.001")
+    parser.add_argument("--chunksize", type=int, default=1000, help="chunksize/pagesize, default is 1000")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON, e.g. for comparing runs")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(child(json.loads(args.child))))
+        sys.exit(0)
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error("unknown scenario {}, use one of {}".format(scenario, ", ".join(SCENARIOS)))
+    cluster = fake_es.FakeCluster({INDEX: fake_es.make_docs(args.docs, args.doc_size)}, latency=args.latency)
+    server = fake_es.serve(cluster)
+    results = [run(scenario, cluster, server.server_address[1], args.docs, args.chunksize)
+               for scenario in args.scenarios or list(SCENARIOS)]
+    server.shutdown()
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
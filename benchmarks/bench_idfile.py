@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+benchmark for the ID bookkeeping of IDFile.generator()
+
+uses an in-process stand-in for elasticsearch.Elasticsearch() which answers every mget instantly,
+so only the CPU time spent in es2json gets measured. The throughput (IDs/s) should stay flat
+while the number of IDs grows, a dropping throughput means the bookkeeping isn't O(1) per ID anymore.
+
+run from the root directory of this git repository:
+    python3 benchmarks/bench_idfile.py [N ...]
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import es2json  # noqa: E402
+
+
+class InstantMget:
+    """
+    answers mget requests without any network, every 10th ID is missing
+    """
+    def mget(self, body, index=None, **kwargs):
+        docs = []
+        for doc in body["docs"]:
+            if int(doc["_id"]) % 10 == 0:
+                docs.append({"_index": index, "_type": "_doc", "_id": doc["_id"], "found": False})
+            else:
+                docs.append({"_index": index, "_type": "_doc", "_id": doc["_id"], "_version": 1,
+                             "found": True, "_source": {"foo": doc["_id"]}})
+        return {"docs": docs}
+
+
+def bench(n, chunksize=1000):
+    """
+    returns the number of records and the seconds needed to harvest n IDs
+    """
+    ids = [str(i) for i in range(n)]
+    start = time.perf_counter()
+    records = 0
+    generator = es2json.IDFile(idfile=ids, es=InstantMget(), index="bench", chunksize=chunksize,
+                               headless=True, missing_behaviour='yield', verbose=False)
+    for _ in generator.generator():
+        records += 1
+    return records, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [10000, 20000, 40000, 80000, 160000]
+    print("{:>10} {:>10} {:>12}".format("IDs", "seconds", "IDs/s"))
+    for n in sizes:
+        records, seconds = bench(n)
+        assert records == n
+        print("{:>10} {:>10.3f} {:>12.0f}".format(n, seconds, n / seconds))
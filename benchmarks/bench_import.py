@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+startup benchmark of es2json: wall time of a fresh python process for short runs,
+where the imports are most of the work, e.g. the cmdline tool called for single documents from shell pipelines
+
+every scenario runs --runs times in a new interpreter, the median gets reported together with the heavy
+dependencies (elasticsearch, elasticsearch_dsl, httplib2, aiohttp) the scenario loaded,
+compare it with the 'python' scenario, the startup of the bare interpreter
+
+run from the root directory of this git repository:
+    python3 benchmarks/bench_import.py [--runs N] [--json] [SCENARIO ...]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_es  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HEAVY = ("elasticsearch", "elasticsearch_dsl", "httplib2", "aiohttp")
+
+SCENARIOS = {
+    # name: python code, {port} gets replaced by the port of the fake cluster
+    "python": "pass",
+    "import es2json": "import es2json",
+    "es2json.ESGenerator": "import es2json\nes2json.ESGenerator",
+    "cli -h": "import es2json.cli\ntry:\n    es2json.cli.run(['-h'])\nexcept SystemExit:\n    pass",
+    "cli document": "import es2json.cli\nes2json.cli.run(['-server', 'http://127.0.0.1:{port}/bench/_doc/1'])",
+}
+REPORT = "\nimport sys\nprint(','.join(m for m in {!r} if m in sys.modules), file=sys.stderr)".format(HEAVY)
+
+
+def run(scenario, port, runs):
+    code = SCENARIOS[scenario].replace("{port}", str(port)) + REPORT
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-c", code], cwd=ROOT, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        times.append(time.perf_counter() - start)
+    return {"scenario": scenario,
+            "median_ms": round(statistics.median(times) * 1000, 1),
+            "min_ms": round(min(times) * 1000, 1),
+            "loaded": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else ""}
+
+
+def report(results):
+    print("{:<22}{:>12}{:>10}  {}".format("scenario", "median ms", "min ms", "heavy modules loaded"))
+    for result in results:
+        print("{scenario:<22}{median_ms:>12}{min_ms:>10}  {loaded}".format(**result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="startup benchmark of es2json")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help="scenarios to run, default is all of them: " + ", ".join(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=10, help="processes per scenario, default is 10")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON, e.g. for comparing runs")
+    args = parser.parse_args()
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error("unknown scenario {}, use one of {}".format(scenario, ", ".join(SCENARIOS)))
+    server = fake_es.serve(fake_es.FakeCluster({"bench": fake_es.make_docs(10)}))
+    results = [run(scenario, server.server_address[1], args.runs) for scenario in args.scenarios or list(SCENARIOS)]
+    server.shutdown()
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+tiny Elasticsearch stand-in for offline benchmarks (and tests)
+
+implements just enough of the Elasticsearch 7.x REST API for es2json:
+_search (incl. scroll, slice, point in time and search_after), _search/scroll,
+_mget, _msearch, _count, _pit, single document GET, _cat/indices, _mapping and _nodes (for sniffing)
+every request can get an artificial latency, to simulate the round trip to a real cluster
+
+run from the root directory of this git repository, e.g. to serve the index of the tests:
+    python3 benchmarks/fake_es.py --port 9200 --index test --docs 1000
+"""
+import re
+import gzip
+import json
+import time
+import uuid
+import zlib
+import bisect
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+def make_docs(n, doc_size=0):
+    """
+    builds n testdocuments, padded to roughly doc_size bytes of JSON each
+    without padding they are the same as the ones of tests/generate_testdata.py
+    """
+    docs = {}
+    for i in range(n):
+        doc = {"foo": i, "bar": n - i, "baz": "test{}".format(i)}
+        pad = doc_size - len(json.dumps(doc))
+        if pad > 12:
+            doc["pad"] = "x" * (pad - 10)
+        docs[str(i)] = doc
+    return docs
+
+
+def get_path(doc, path):
+    for part in path.split("."):
+        if isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        else:
+            return None
+    return doc
+
+
+def field_name(field):
+    if field.endswith(".keyword"):
+        return field[:-len(".keyword")]
+    return field
+
+
+def as_list(clauses):
+    if isinstance(clauses, dict):
+        return [clauses]
+    return clauses
+
+
+def matches(query, _id, doc, index=None):
+    """
+    minimal query evaluation: match_all, ids, term(s), match, prefix and bool, terms on _index need the index name
+    """
+    if not query:
+        return True
+    (kind, params), = query.items()
+    if kind == "match_all":
+        return True
+    if kind == "ids":
+        return _id in params.get("values", [])
+    if kind == "bool":
+        for key in ("must", "filter"):
+            if not all(matches(clause, _id, doc, index) for clause in as_list(params.get(key, []))):
+                return False
+        if any(matches(clause, _id, doc, index) for clause in as_list(params.get("must_not", []))):
+            return False
+        should = as_list(params.get("should", []))
+        return not should or any(matches(clause, _id, doc, index) for clause in should)
+    (field, value), = params.items()
+    if isinstance(value, dict):
+        value = value.get("value", value.get("query"))
+    actual = _id if field == "_id" else index if field == "_index" else get_path(doc, field_name(field))
+    if kind in ("term", "match", "match_phrase"):
+        return str(actual) == str(value)
+    if kind == "terms":
+        return str(actual) in [str(v) for v in value]
+    if kind == "prefix":
+        return str(actual).startswith(str(value))
+    raise ValueError("unsupported query {}".format(kind))
+
+
+def filter_source(source, spec):
+    if spec is False:
+        return None
+    if spec is None or spec is True:
+        return source
+    if isinstance(spec, (str, list)):
+        spec = {"includes": spec}
+    includes = spec.get("includes") or spec.get("include") or []
+    excludes = spec.get("excludes") or spec.get("exclude") or []
+    if isinstance(includes, str):
+        includes = includes.split(",")
+    if isinstance(excludes, str):
+        excludes = excludes.split(",")
+    return {key: value for key, value in source.items()
+            if (not includes or key in includes) and key not in excludes}
+
+
+def source_params(params):
+    """
+    the _source filtering of the URL parameters of get/mget as _source spec
+    """
+    if params.get("_source") == "false":
+        return False
+    if "_source_includes" in params or "_source_excludes" in params:
+        return {"includes": [x for x in params.get("_source_includes", "").split(",") if x],
+                "excludes": [x for x in params.get("_source_excludes", "").split(",") if x]}
+    return None
+
+
+def filter_path(obj, paths):
+    """
+    simplified response filtering, supports dotted paths without wildcards
+    """
+    out = {}
+    for path in paths.split(","):
+        copy_path(obj, out, path.split("."))
+    return out
+
+
+def copy_path(src, dst, parts):
+    head, rest = parts[0], parts[1:]
+    if head not in src:
+        return
+    value = src[head]
+    if not rest:
+        dst[head] = value
+    elif isinstance(value, list):
+        target = dst.setdefault(head, [{} for _ in value])
+        for item, titem in zip(value, target):
+            copy_path(item, titem, rest)
+    elif isinstance(value, dict):
+        copy_path(value, dst.setdefault(head, {}), rest)
+
+
+def error(status, kind, reason=None):
+    payload = {"error": {"type": kind}, "status": status}
+    if reason:
+        payload["error"]["reason"] = reason
+    return status, payload
+
+
+class FakeCluster:
+    """
+    the state of the fake cluster: indices, open scroll contexts and point in times
+    """
+    def __init__(self, indices=None, latency=0.0, max_result_window=10000, pit=True, shard_doc=True,
+                 track_total_hits=10000):
+        """
+        Creates a new FakeCluster Object
+        :param indices: dict of index name → dict of _id → _source
+        :param latency: seconds every request gets delayed, default is 0
+        :param max_result_window: maximum from + size of a search without scroll/point in time, default is 10000
+        :param pit: support point in time, like Elasticsearch >= 7.10, default is True
+        :param shard_doc: support sorting by _shard_doc, like Elasticsearch >= 7.12, default is True
+        :param track_total_hits: hits.total is only exact up to this number without track_total_hits, default is 10000
+        """
+        self.indices = indices or {}
+        self.latency = latency
+        self.max_result_window = max_result_window
+        self.pit = pit
+        self.shard_doc = shard_doc
+        self.track_total_hits = track_total_hits
+        self.scrolls = {}
+        self.pits = {}
+        self.results = {}  # cache of the sorted matches of the last queries, for cheap search_after pages
+        self.requests = 0
+        self.bytes_sent = 0
+        self.nodes = []  # host:port of the servers serving this cluster, for sniffing
+        self.lock = threading.Lock()
+
+    def resolve(self, index):
+        if not index or index in ("_all", "*"):
+            return list(self.indices)
+        names = []
+        for part in index.split(","):
+            pattern = re.compile("^" + re.escape(part).replace("\\*", ".*") + "$")
+            names.extend(name for name in self.indices if pattern.match(name))
+        if not names:
+            raise KeyError(index)
+        return names
+
+    def docs(self, index):
+        for name in self.resolve(index):
+            for position, (_id, source) in enumerate(self.indices[name].items()):
+                yield name, position, _id, source
+
+    def sortkey(self, sort, name, position, _id, source):
+        key = []
+        for item in sort:
+            field = item if isinstance(item, str) else next(iter(item))
+            if field in ("_doc", "_shard_doc"):
+                key.append(list(self.indices).index(name) * 2 ** 31 + position)
+            elif field == "_score":
+                key.append(1.0)
+            elif field == "_id":
+                key.append(_id)
+            else:
+                key.append(get_path(source, field_name(field)))
+        return key
+
+    @staticmethod
+    def order(sort, key):
+        """
+        turns sort values into something that sorts ascending in the order of the sort,
+        missing values last, descending is only supported for numbers
+        """
+        result = []
+        for item, value in zip(sort, key):
+            order = item[next(iter(item))] if isinstance(item, dict) else "asc"
+            if isinstance(order, dict):
+                order = order.get("order", "asc")
+            if order == "desc" and isinstance(value, (int, float)):
+                value = -value
+            result.append((value is None, value))
+        return result
+
+    def matching(self, index, body):
+        """
+        returns the sorted matches of the query body as list of (name, position, _id, source),
+        their sort values, the sort and the ascending order of the sort values, see order()
+        """
+        sort = body.get("sort")
+        if isinstance(sort, (str, dict)):
+            sort = [sort]
+        cache_key = json.dumps([index, body.get("query"), body.get("slice"), sort], sort_keys=True)
+        if cache_key in self.results:
+            return self.results[cache_key]
+        slice_ = body.get("slice")
+        hits = []
+        for name, position, _id, source in self.docs(index):
+            if slice_ and zlib.crc32(_id.encode()) % slice_["max"] != slice_["id"]:
+                continue
+            if matches(body.get("query"), _id, source, name):
+                hits.append((name, position, _id, source))
+        keys = order = [None] * len(hits)
+        if sort:
+            keys = [self.sortkey(sort, *hit) for hit in hits]
+            order = [self.order(sort, key) for key in keys]
+            positions = sorted(range(len(hits)), key=order.__getitem__)
+            hits = [hits[i] for i in positions]
+            keys = [keys[i] for i in positions]
+            order = [order[i] for i in positions]
+        with self.lock:
+            if len(self.results) > 32:
+                self.results.clear()
+            self.results[cache_key] = hits, keys, sort, order
+        return hits, keys, sort, order
+
+    def search(self, index, body, params):
+        size = int(params.get("size", body.get("size", 10)))
+        from_ = int(params.get("from", body.get("from", 0)))
+        pit = body.get("pit")
+        if pit:
+            if pit["id"] not in self.pits:
+                return error(404, "search_context_missing_exception")
+            index = self.pits[pit["id"]]
+        if "scroll" not in params and from_ + size > self.max_result_window:  # also with a point in time
+            return error(400, "illegal_argument_exception", "Result window is too large")
+        if not self.shard_doc and "_shard_doc" in json.dumps(body.get("sort")):
+            return error(400, "search_phase_execution_exception", "No mapping found for [_shard_doc] in order to sort on")
+        try:
+            hits, keys, sort, order = self.matching(index, body)
+        except KeyError:
+            return error(404, "index_not_found_exception")
+        except ValueError as e:
+            return error(400, "parsing_exception", str(e))
+        total = len(hits)
+        search_after = body.get("search_after")
+        if search_after is not None:
+            start = bisect.bisect_right(order, self.order(sort, search_after))
+            hits = hits[start:]
+            keys = keys[start:]
+            total = len(hits)
+        response = {"took": 1, "timed_out": False,
+                    "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0}}
+        if "scroll" in params:
+            scroll_id = uuid.uuid4().hex
+            self.scrolls[scroll_id] = [hits, keys, sort, size, 0, body]
+            response["_scroll_id"] = scroll_id
+            page = self.scroll_page(scroll_id)
+        else:
+            page = self.render(hits[from_:from_ + size], keys[from_:from_ + size], sort, body)
+        if pit:
+            response["pit_id"] = pit["id"]
+        track = body.get("track_total_hits", params.get("track_total_hits", self.track_total_hits))
+        if track in (True, "true"):
+            response["hits"] = {"total": {"value": total, "relation": "eq"}}
+        elif track in (False, "false"):
+            response["hits"] = {}
+        else:
+            track = int(track)
+            response["hits"] = {"total": {"value": min(total, track), "relation": "eq" if total <= track else "gte"}}
+        response["hits"]["max_score"] = None if sort else 1.0
+        response["hits"]["hits"] = page
+        return 200, response
+
+    def render(self, hits, keys, sort, body):
+        page = []
+        for (name, position, _id, source), key in zip(hits, keys):
+            hit = {"_index": name, "_type": "_doc", "_id": _id, "_score": None if sort else 1.0}
+            source = filter_source(source, body.get("_source"))
+            if source is not None:
+                hit["_source"] = source
+            if sort:
+                hit["sort"] = key
+            page.append(hit)
+        return page
+
+    def scroll_page(self, scroll_id):
+        hits, keys, sort, size, position, body = self.scrolls[scroll_id]
+        self.scrolls[scroll_id][4] = position + size
+        return self.render(hits[position:position + size], keys[position:position + size], sort, body)
+
+    def scroll(self, body):
+        scroll_id = body["scroll_id"]
+        if scroll_id not in self.scrolls:
+            return error(404, "search_context_missing_exception")
+        return 200, {"_scroll_id": scroll_id, "took": 1, "timed_out": False,
+                     "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+                     "hits": {"total": {"value": len(self.scrolls[scroll_id][0]), "relation": "eq"},
+                              "hits": self.scroll_page(scroll_id)}}
+
+    def get(self, index, _id, params):
+        source = self.indices.get(index, {}).get(_id)
+        if source is None:
+            return {"_index": index, "_type": "_doc", "_id": _id, "found": False}
+        doc = {"_index": index, "_type": "_doc", "_id": _id, "_version": 1,
+               "_seq_no": int(_id) if _id.isdigit() else 0, "_primary_term": 1, "found": True}
+        source = filter_source(source, source_params(params))
+        if source is not None:
+            doc["_source"] = source
+        return doc
+
+    def mget(self, index, body, params):
+        docs = []
+        for item in body.get("docs") or [{"_id": _id} for _id in body.get("ids", [])]:
+            docs.append(self.get(item.get("_index", index), str(item["_id"]), params))
+        return 200, {"docs": docs}
+
+    def open_pit(self, index):
+        if not self.pit:
+            return error(400, "illegal_argument_exception",
+                         "request [/{}/_pit] contains unrecognized parameter".format(index))
+        try:
+            self.resolve(index)
+        except KeyError:
+            return error(404, "index_not_found_exception")
+        pit_id = uuid.uuid4().hex
+        self.pits[pit_id] = index
+        return 200, {"id": pit_id}
+
+    def mapping(self, index):
+        mapping = {}
+        for name in self.resolve(index):
+            properties = {}
+            for doc in list(self.indices[name].values())[:100]:
+                for key, value in doc.items():
+                    kind = "long" if isinstance(value, int) else "double" if isinstance(value, float) else "keyword"
+                    properties.setdefault(key, {"type": kind})
+            mapping[name] = {"mappings": {"properties": properties}}
+        return 200, mapping
+
+    def nodes_info(self):
+        nodes = {"node-{}".format(n): {"name": "node-{}".format(n), "roles": ["data", "ingest", "master"],
+                                        "http": {"publish_address": address}}
+                 for n, address in enumerate(self.nodes)}
+        return 200, {"_nodes": {"total": len(nodes)}, "cluster_name": "fake", "nodes": nodes}
+
+    def cat_indices(self, index):
+        rows = []
+        for name in self.resolve(index):
+            docs = self.indices[name]
+            rows.append({"index": name, "docs.count": str(len(docs)), "store.size": str(len(json.dumps(docs)))})
+        return 200, rows
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    cluster = None
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, payload):
+        data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()  # compact UTF-8, like Elasticsearch
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with self.cluster.lock:
+            self.cluster.bytes_sent += len(data)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        return data
+
+    def handle_any(self, method):
+        cluster = self.cluster
+        if cluster.latency:
+            time.sleep(cluster.latency)
+        path, _, query = self.path.partition("?")
+        params = {key: value[-1] for key, value in urllib.parse.parse_qs(query, keep_blank_values=True).items()}
+        data = self.read_body()
+        with cluster.lock:
+            cluster.requests += 1
+        parts = [part for part in path.split("/") if part]
+        try:
+            if parts and parts[-1] == "_msearch":
+                status, payload = self.msearch(parts, data)
+            else:
+                status, payload = self.dispatch(method, parts, json.loads(data) if data else {}, params)
+        except Exception as e:  # surface bugs in the fake as server errors
+            status, payload = error(500, "fake_es_exception", repr(e))
+        if status == 200 and params.get("filter_path"):
+            payload = filter_path(payload, params["filter_path"])
+        self.send(status, payload)
+
+    def msearch(self, parts, data):
+        lines = [json.loads(line) for line in data.decode().splitlines() if line.strip()]
+        default = parts[0] if parts[0] != "_msearch" else None
+        responses = []
+        for header, body in zip(lines[::2], lines[1::2]):
+            index = header.get("index", default)
+            if isinstance(index, list):
+                index = ",".join(index)
+            status, response = self.cluster.search(index, body, {})
+            response["status"] = status
+            responses.append(response)
+        return 200, {"took": 1, "responses": responses}
+
+    def dispatch(self, method, parts, body, params):
+        cluster = self.cluster
+        if not parts:
+            return 200, {"name": "fake", "cluster_name": "fake", "tagline": "You Know, for Search",
+                         "version": {"number": "7.17.0", "build_flavor": "default", "lucene_version": "8.11.1"}}
+        if parts[0] == "_search" and len(parts) > 1:  # _search/scroll
+            if method == "DELETE":
+                scroll_ids = body.get("scroll_id")
+                for scroll_id in scroll_ids if isinstance(scroll_ids, list) else [scroll_ids]:
+                    cluster.scrolls.pop(scroll_id, None)
+                return 200, {"succeeded": True}
+            return cluster.scroll(body)
+        if parts == ["_pit"]:
+            return 200, {"succeeded": True, "num_freed": int(cluster.pits.pop(body.get("id"), None) is not None)}
+        if parts[0] == "_nodes":
+            return cluster.nodes_info()
+        if parts[:2] == ["_cat", "indices"]:
+            return cluster.cat_indices(parts[2] if len(parts) > 2 else None)
+        if parts[0] == "_search":
+            return cluster.search(None, body, params)
+        index, rest = parts[0], parts[1:]
+        action = rest[-1] if rest else None
+        if action == "_search":
+            return cluster.search(index, body, params)
+        if action == "_count":
+            try:
+                return 200, {"count": len(cluster.matching(index, body)[0])}
+            except KeyError:
+                return error(404, "index_not_found_exception")
+        if action == "_mget":
+            return cluster.mget(index, body, params)
+        if action == "_pit":
+            return cluster.open_pit(index)
+        if action == "_mapping":
+            return cluster.mapping(index)
+        if len(rest) == 2 and method in ("GET", "HEAD"):
+            doc = cluster.get(index, rest[1], params)
+            return 200 if doc["found"] else 404, doc
+        return error(400, "fake_es_exception", "unsupported {} {}".format(method, parts))
+
+    def do_GET(self):
+        self.handle_any("GET")
+
+    def do_POST(self):
+        self.handle_any("POST")
+
+    def do_PUT(self):
+        self.handle_any("PUT")
+
+    def do_DELETE(self):
+        self.handle_any("DELETE")
+
+    def do_HEAD(self):
+        self.handle_any("HEAD")
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve(cluster, host="127.0.0.1", port=0):
+    """
+    starts the fake cluster on a background thread, returns the server,
+    the port can be found in server.server_address[1]
+    """
+    handler = type("BoundHandler", (Handler,), {"cluster": cluster})
+    server = ThreadingServer((host, port), handler)
+    cluster.nodes.append("{}:{}".format(*server.server_address))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="serve a fake Elasticsearch index with generated documents")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--index", default="test")
+    parser.add_argument("--docs", type=int, default=1000, help="number of documents, default is 1000")
+    parser.add_argument("--doc-size", type=int, default=0, help="pad the documents to about that many bytes")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every request gets delayed")
+    parser.add_argument("--no-pit", action="store_true", help="behave like a cluster without point in time")
+    args = parser.parse_args()
+    server = serve(FakeCluster({args.index: make_docs(args.docs, args.doc_size)}, latency=args.latency, pit=not args.no_pit),
+                   args.host, args.port)
+    print("serving {} documents on http://{}:{}/{}".format(args.docs, args.host, args.port, args.index))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
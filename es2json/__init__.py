@@ -1,3 +1,49 @@
-from .es2json import *
-from .helperscripts import *
-from .oldapi_calls import *
+"""
+the public names of the submodules get imported on first access (PEP 562), not with the package,
+so `import es2json` and the commandline tool only load elasticsearch, elasticsearch_dsl and httplib2 when they need them
+"""
+import importlib
+
+
+_MODULES = {
+    ".es2json": ("ESGenerator", "IDFile", "IDFileConsume", "Paginator", "ScrollPaginator", "PITPaginator", "PAGINATORS",
+                 "hits_total", "parse_hosts", "pit_unsupported", "threaded_merge"),
+    ".helperscripts": ("ArrayOrSingleValue", "eprint", "eprintjs", "isfile", "isfloat", "isint", "isiter",
+                       "jsonstring_or_file", "litter", "put_dict", "size2bytes", "str2bool"),
+    ".oldapi_calls": ("esfatgenerator", "esgenerator", "esidfileconsumegenerator", "esidfilegenerator"),
+    ".output": ("BlockCompressor", "COMPRESSIONS", "ENCODERS", "NDJSONWriter", "PARTITIONS", "PartitionedWriter",
+                "ShardWriter", "dump", "get_encoder", "gzip_compress", "open_output", "partitioner", "shard_path",
+                "zstd_compress"),
+    ".async_es2json": ("AsyncESGenerator", "AsyncIDFile", "AsyncIDFileConsume", "AsyncScrollPaginator",
+                       "AsyncPITPaginator", "ASYNC_PAGINATORS", "AsyncElasticsearch", "AsyncAdaptiveTransport",
+                       "async_merge", "iterate"),
+    ".scheduler": ("MultiIndexExport", "resolve_indices", "tag_index"),
+    ".checkpoint": ("Checkpoint",),
+    ".metrics": ("Metrics", "MetricsConnection", "AsyncMetricsConnection"),
+    ".chunksize": ("AdaptiveChunksize", "AdaptiveTransport"),
+    ".passthrough": ("raw_client", "raw_line"),
+    ".progress": ("Progress",),
+    ".transform": ("Transformer", "Pipeline", "Projection", "load_transform", "flatten"),
+    ".columnar": ("ParquetWriter", "RecordBatcher", "record_batches", "to_record_batch", "infer_schema",
+                  "mapping_schema"),
+}
+_LAZY = {name: module for module, names in _MODULES.items() for name in names}
+__all__ = sorted(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        # the submodules, e.g. es2json.helperscripts, were there after a plain `import es2json` before
+        try:
+            return importlib.import_module("." + name, __name__)
+        except ModuleNotFoundError as e:
+            if e.name != "{}.{}".format(__name__, name):
+                raise
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value  # next time without __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,559 @@
+import time
+import asyncio
+import itertools
+import collections
+import elasticsearch
+import es2json.helperscripts as helperscripts
+import es2json.idstore as idstore
+from es2json.es2json import (ESGenerator, IDFile, IDFileConsume, ScrollPaginator, PITPaginator, hits_total,
+                             pit_unsupported)
+from es2json.metrics import AsyncMetricsConnection
+from es2json.chunksize import TimeoutRetries
+from es2json.progress import Progress
+AsyncElasticsearch = getattr(elasticsearch, "AsyncElasticsearch", None)  # only available with aiohttp installed
+if AsyncElasticsearch:
+    class AsyncAdaptiveTransport(TimeoutRetries, elasticsearch.AsyncTransport):
+        """
+        elasticsearch.AsyncTransport for the clients of generators with an adaptive chunksize, see chunksize.TimeoutRetries
+        """
+else:
+    AsyncAdaptiveTransport = None
+
+
+class AsyncESGenerator(ESGenerator):
+    """
+    asyncio counterpart of ESGenerator, built on elasticsearch.AsyncElasticsearch()
+    iterate with: async for record in AsyncESGenerator(...).generator()
+    the next page of every slice is already requested while the current one gets consumed
+    """
+    def __init__(self, es=None, **kwargs):
+        """
+        Construct a new AsyncESGenerator Object, takes the same parameters as ESGenerator except checkpoint and passthrough
+        :param es: Don't use the host/port/timeout setting, use your own elasticsearch.AsyncElasticsearch() Object
+        """
+        if kwargs.get("checkpoint"):
+            raise ValueError("checkpoints are only supported by the sync generators")
+        if kwargs.get("passthrough"):
+            raise ValueError("passthrough is only supported by the sync ESGenerator")
+        self.own_es = es is None  # only close the client if we created it
+        super().__init__(es=es, **kwargs)
+
+    def connect(self, hosts, timeout):
+        """
+        creates the AsyncElasticsearch client used if no es Object was given, see ESGenerator.connect()
+        """
+        if not AsyncElasticsearch:
+            raise ImportError("the async generators need the aiohttp package: pip install es2json[async]")
+        kwargs = self.client_kwargs()
+        if self.metrics:
+            kwargs["connection_class"] = AsyncMetricsConnection
+        if self.adaptive:
+            kwargs["transport_class"] = AsyncAdaptiveTransport
+        return AsyncElasticsearch(hosts=hosts, timeout=timeout, **kwargs)
+
+    async def __aenter__(self):
+        """
+        function needed for async with-statement
+        __aenter__ only returns the instanced object
+        """
+        return self
+
+    async def __aexit__(self, doc_, value, traceback):
+        """
+        function needed for async with-statement
+        closes the connections of the client, if we created it
+        """
+        await self.close()
+
+    async def close(self):
+        """
+        closes the connections of the client, if we created it
+        """
+        if self.own_es:
+            await self.es.close()
+
+    async def generator(self):
+        """
+        main async generator function which harvests from the Elasticsearch-Cluster, see ESGenerator.generator()
+        """
+        pages = self.iter_pages()
+        try:
+            async for page in pages:
+                for record in page:
+                    yield record
+        finally:
+            await pages.aclose()
+
+    async def iter_pages(self):
+        """
+        async generator yielding the records page by page, see ESGenerator.iter_pages()
+        """
+        if self.id_:
+            doc = await self.es.get(index=self.index,
+                                    id=self.id_,
+                                    _source_excludes=self.source_excludes,
+                                    _source_includes=self.source_includes,
+                                    _source=self.source)
+            yield [self.return_raw_doc(doc, skip_empty=True)]
+            if self.metrics:
+                self.metrics.finish()
+            return
+        s = self.search()
+        # the paginators take the total from their first responses, no extra count request
+        progress = self.progress = Progress(self.chunksize) if self.verbose else None
+        if self.slice_:
+            pages = self.window_pages(s)
+        else:
+            pages = self.scan_pages(s.to_dict())
+        metrics = self.metrics
+        try:
+            async for page in pages:
+                if metrics:
+                    start = time.perf_counter()
+                    records = [self.return_raw_doc(hit) for hit in page]
+                    metrics.doc(time.perf_counter() - start, len(records))
+                else:
+                    records = [self.return_raw_doc(hit) for hit in page]
+                if progress:
+                    progress.update(progress.count + len(records))
+                yield records
+        finally:
+            await pages.aclose()  # release the search contexts now, not when the client may be already closed
+        if progress:
+            progress.finish()
+        if metrics:
+            metrics.finish()
+
+    async def iter_batches(self, size=None):
+        """
+        async generator yielding the records in lists of exactly size records, see ESGenerator.iter_batches()
+        """
+        size = size or self.chunksize
+        batch = []
+        pages = self.iter_pages()
+        try:
+            async for page in pages:
+                if not batch and len(page) == size:
+                    yield page
+                    continue
+                batch.extend(page)
+                if len(batch) >= size:
+                    full = len(batch) - len(batch) % size
+                    for start in range(0, full, size):
+                        yield batch[start:start + size]
+                    batch = batch[full:]
+        finally:
+            await pages.aclose()
+        if batch:
+            yield batch
+
+    async def window_pages(self, s):
+        """
+        yields the hits of the python slice slice_ of the elasticsearch_dsl.Search s page by page,
+        see ESGenerator.window_pages()
+        """
+        sliced = s[self.slice_]  # raises a ValueError for negative slices
+        start, stop, step = self.slice_.start or 0, self.slice_.stop, self.slice_.step or 1
+        size = min(self.chunksize, AsyncPITPaginator.skip_size)
+        if stop is None or stop <= size:
+            response = await self.es.search(index=self.index, doc_type=self.type_, body=sliced.to_dict())
+            if self.progress:
+                self.progress.add_total(len(response["hits"]["hits"]))
+            yield response["hits"]["hits"]
+            return
+        if self.progress:
+            self.progress.add_total(len(range(start, stop, step)))
+        body = s.to_dict()
+        if "sort" not in body:
+            body["sort"] = [{"_score": "desc"}, {"_shard_doc": "asc"}]  # the order of a from/size request
+        pages = self.get_paginator(body, paginator=AsyncPITPaginator, skip=start, progress=None, size=size).pages()
+        n = start  # position of the first hit of the next page in the search
+        try:
+            while n < stop:
+                begin = time.perf_counter()
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    break
+                if self.metrics:
+                    self.metrics.page(len(page), time.perf_counter() - begin)
+                hits = page[:stop - n][(start - n) % step::step]
+                n += len(page)
+                if hits:
+                    yield hits
+        finally:
+            await pages.aclose()  # the hits after the slice aren't needed, release the point in time now
+
+    def get_paginator(self, body, paginator=None, **kwargs):
+        """
+        returns an instance of the async version of the configured paginator for the query body
+        see ESGenerator.get_paginator()
+        """
+        if not paginator:
+            paginator = ASYNC_PAGINATORS.get(self.paginator, self.paginator)
+        return super().get_paginator(body, paginator=paginator, **kwargs)
+
+    async def scan(self, body):
+        """
+        harvests all hits of the query body, yields them one by one, see scan_pages()
+        :param body: the query body to harvest
+        """
+        pages = self.scan_pages(body)
+        try:
+            async for page in pages:
+                for hit in page:
+                    yield hit
+        finally:
+            await pages.aclose()
+
+    async def scan_pages(self, body):
+        """
+        harvests all hits of the query body with the configured paginator and yields them page by page,
+        split into concurrently harvested slices if parallel is set
+        :param body: the query body to harvest
+        """
+        if self.parallel and self.parallel > 1:
+            pages = self.parallel_pages(body)
+        else:
+            pages = self.get_paginator(body).pages()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    break
+                if self.metrics:
+                    self.metrics.page(len(page), time.perf_counter() - start)
+                yield page
+        finally:
+            await pages.aclose()
+
+    async def parallel_pages(self, body):
+        """
+        sliced scroll/point in time: every slice gets harvested by its own task,
+        the pages of all slices are merged into one stream of pages
+        :param body: the query body to slice
+        """
+        paginator = ASYNC_PAGINATORS.get(self.paginator, self.paginator)
+        pit_id = None
+        if issubclass(paginator, AsyncPITPaginator):
+            # all the slices have to share the same point in time
+            try:
+                pit_id = await paginator.open(self.es, self.index, self.keep_alive or paginator.keep_alive)
+            except elasticsearch.exceptions.TransportError as e:
+                if not pit_unsupported(e, opening=True):
+                    raise
+                helperscripts.eprint("point in time not supported by the cluster, falling back to scroll: {}".format(e))
+                paginator = AsyncScrollPaginator
+        slices = [self.get_paginator(body,
+                                     paginator=paginator,
+                                     slice_id=n,
+                                     slice_max=self.parallel,
+                                     pit_id=pit_id).pages() for n in range(self.parallel)]
+        try:
+            async for page in async_merge(slices, maxsize=self.parallel):
+                yield page
+        finally:
+            if pit_id:
+                await AsyncPITPaginator.close(self.es, pit_id)
+
+
+async def iterate(iterable):
+    """
+    turns an iterable into an async iterable
+    """
+    for item in iterable:
+        yield item
+
+
+async def async_merge(iterables, maxsize=0):
+    """
+    iterates over every async iterable in its own task and yields the items as they arrive
+    exceptions raised in a task get re-raised in the consumer
+    if the consumer stops early, the tasks get cancelled and close their iterables
+    :param iterables: list of async generators to merge
+    :param maxsize: how many items may be queued before the tasks have to wait for the consumer, 0 means unbounded
+    """
+    items = asyncio.Queue(maxsize)
+    done = object()
+
+    async def worker(iterable):
+        try:
+            async for item in iterable:
+                await items.put((None, item))
+            await items.put((None, done))
+        except asyncio.CancelledError:  # no Exception anymore since python 3.8
+            raise
+        except Exception as e:
+            await items.put((e, None))
+        finally:
+            await iterable.aclose()
+
+    tasks = [asyncio.ensure_future(worker(iterable)) for iterable in iterables]
+    running = len(tasks)
+    try:
+        while running:
+            error, item = await items.get()
+            if error:
+                raise error
+            if item is done:
+                running -= 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AsyncScrollPaginator(ScrollPaginator):
+    """
+    async version of the ScrollPaginator, requests the next page while the current one gets consumed
+    """
+    async def pages(self):
+        response = await self.es.search(index=self.index, doc_type=self.doc_type, body=self.first_body(),
+                                        scroll=self.keep_alive, size=self.size)
+        self.report_total(response)
+        scroll_id = response.get("_scroll_id")
+        next_page = None
+        try:
+            while scroll_id and response["hits"]["hits"]:
+                self.check_shards(response)
+                next_page = asyncio.ensure_future(self.es.scroll(body={"scroll_id": scroll_id, "scroll": self.keep_alive}))
+                hits = self.trim(response["hits"]["hits"])
+                if hits:
+                    yield hits
+                response = await next_page
+                next_page = None
+                scroll_id = response.get("_scroll_id")
+        finally:
+            if next_page:
+                next_page.cancel()
+            if scroll_id:
+                await self.es.clear_scroll(body={"scroll_id": [scroll_id]}, ignore=(404,))
+
+
+class AsyncPITPaginator(PITPaginator):
+    """
+    async version of the PITPaginator, requests the next page while the current one gets consumed
+    falls back to the AsyncScrollPaginator on clusters without point in time support
+    """
+    scroll_class = AsyncScrollPaginator
+    @staticmethod
+    async def open(es, index, keep_alive):
+        """
+        opens a new point in time and returns its id
+        """
+        return (await es.open_point_in_time(index=index or "_all", keep_alive=keep_alive))["id"]
+
+    @staticmethod
+    async def close(es, pit_id):
+        """
+        closes the point in time, missing point in times are ignored
+        """
+        await es.close_point_in_time(body={"id": pit_id}, ignore=(404,))
+
+    async def request(self, body):
+        """
+        searches the next page, with the current adaptive chunksize as size if set
+        returns the size used and the response
+        """
+        if not self.adaptive:
+            return self.size, await self.es.search(body=body)
+        size, response, _ = await self.adaptive.acall(lambda size: self.es.search(body=dict(body, size=size)),
+                                                      lambda response: response["hits"]["hits"])
+        return size, response
+
+    async def skip_request(self, body):
+        """
+        async version of PITPaginator.skip_request()
+        """
+        size = min(self.skip, self.skip_size)
+        response = await self.es.search(body=self.skip_body(body, size), filter_path="pit_id,hits.hits.sort")
+        return self.skipped(body, size, response)
+
+    async def pages(self):
+        body = self.first_body()
+        pit_id = self.pit_id
+        fallback = False
+        if not pit_id:
+            try:
+                pit_id = await self.open(self.es, self.index, self.keep_alive)
+            except elasticsearch.exceptions.TransportError as e:
+                if not self.fall_back(e, opening=True):
+                    raise
+                fallback = True
+        if not fallback:
+            body["pit"] = {"id": pit_id, "keep_alive": self.keep_alive}
+            more = True
+            try:
+                while self.skip and more:
+                    more = await self.skip_request(body)
+                if more:
+                    size, response = await self.request(body)
+            except elasticsearch.exceptions.TransportError as e:
+                if not self.pit_id:
+                    await self.close(self.es, body["pit"]["id"])
+                if not self.fall_back(e):
+                    raise
+                fallback = True
+        if fallback:
+            pages = self.scroll_paginator().pages()
+            try:
+                async for page in pages:
+                    yield page
+            finally:
+                await pages.aclose()  # also when stopped early, not when the client may be already closed
+            return
+        if not more:  # no hits left after the skipped ones
+            if not self.pit_id:
+                await self.close(self.es, body["pit"]["id"])
+            return
+        pit_id = body["pit"]["id"]  # the skip requests can have changed it
+        self.report_total(response)
+        body["track_total_hits"] = False  # the next pages don't need to count the hits again
+        next_page = None
+        try:
+            while True:
+                pit_id = response.get("pit_id", pit_id)  # the id of the point in time can change between requests
+                hits = response["hits"]["hits"]
+                if len(hits) >= size:
+                    # a new dict, the request of the next page may not see changes of the body
+                    body = dict(body, pit={"id": pit_id, "keep_alive": self.keep_alive}, search_after=hits[-1]["sort"])
+                    next_page = asyncio.ensure_future(self.request(body))
+                if hits:
+                    yield hits
+                if not next_page:
+                    break
+                size, response = await next_page
+                next_page = None
+        finally:
+            if next_page:
+                next_page.cancel()
+            if not self.pit_id:
+                await self.close(self.es, pit_id)
+
+
+ASYNC_PAGINATORS = {"scroll": AsyncScrollPaginator,
+                    "pit": AsyncPITPaginator}
+
+
+class AsyncIDFile(AsyncESGenerator, IDFile):
+    """
+    asyncio counterpart of IDFile, takes the same parameters
+    up to parallel chunks of IDs are requested concurrently, the records are still yielded in the order of the chunks
+    """
+    async def iter_pages(self):
+        """
+        async generator yielding the records chunk by chunk for AsyncIDFile and AsyncIDFileConsume,
+        see IDFile.iter_pages()
+        """
+        with idstore.Spool() as missing:  # the missing ids, spooled to a temporary file
+            chunks = collections.deque()  # the requests of the chunks in flight, in order
+            pending = self.chunks()
+            try:
+                while True:
+                    for ids in itertools.islice(pending, (self.parallel or 1) - len(chunks)):
+                        chunks.append(asyncio.ensure_future(self.get_chunk(ids)))
+                    if not chunks:
+                        break
+                    start = time.perf_counter()
+                    records, chunk_missing = await chunks.popleft()
+                    if self.metrics:
+                        self.metrics.page(len(records), time.perf_counter() - start)
+                        self.metrics.missing(len(chunk_missing))
+                    if records:
+                        yield records
+                    missing.extend(chunk_missing)
+            finally:
+                for chunk in chunks:
+                    chunk.cancel()
+            items = self.write_file(missing)
+            while True:
+                page = list(itertools.islice(items, self.chunksize))
+                if not page:
+                    break
+                yield page
+        if self.metrics:
+            self.metrics.finish()
+
+    async def get_chunk(self, ids):
+        """
+        gets the IDs of one chunk, returns a list of the records found and a list of the missing IDs
+        :param ids: OrderedDict with the IDs of the chunk as keys
+        """
+        if self.body:
+            if self.batched:
+                return self.search_result(ids, await self.batch_search(ids))
+            return self.search_result(ids, await self.multi_search(ids))
+        return self.mget_result(await self.mget(ids))
+
+    async def mget(self, ids):
+        """
+        gets the IDs via mget, returns the raw docs of the response, found or not
+        :param ids: the IDs to get
+        """
+        if self.adaptive:
+            return await self.adaptive_requests(ids, self.mget_request, self.mget_docs)
+        return self.mget_docs(await self.mget_request(ids))
+
+    async def adaptive_requests(self, ids, request, items):
+        """
+        async version of IDFile.adaptive_requests(), request returns an awaitable
+        """
+        ids = list(ids)
+        result = []
+        while ids:
+            size, _, hits = await self.adaptive.acall(lambda size: request(ids[:size]), items)
+            result.extend(hits)
+            ids = ids[size:]
+        return result
+
+    async def multi_search(self, ids):
+        """
+        searches the IDs with the query body, one search per ID bundled into one MultiSearch
+        returns a list of the raw hits of all the searches
+        :param ids: the IDs to search for
+        """
+        if self.adaptive:
+            return await self.adaptive_requests(ids, self.multi_search_request,
+                                                lambda response: list(self.multi_search_hits(response["responses"])))
+        response = await self.multi_search_request(ids)
+        return list(self.multi_search_hits(response["responses"]))
+
+    async def batch_search(self, ids):
+        """
+        searches the IDs with the query body, with an ids filter, in searches of at most max_batch IDs
+        returns a list of the raw hits of the searches
+        :param ids: the IDs to search for
+        """
+        ids = list(ids)
+        hits = []
+        for start in range(0, len(ids), self.max_batch):
+            hits.extend(await self.batch_request(ids[start:start + self.max_batch]))
+        return hits
+
+    async def batch_request(self, ids):
+        """
+        async version of IDFile.batch_request()
+        """
+        s = self.search().filter("ids", values=ids)
+        response = await self.es.search(index=self.index, doc_type=self.type_,
+                                        body=s[:len(ids)].extra(track_total_hits=True).to_dict())
+        hits = response["hits"]["hits"]
+        if hits_total(response) > len(hits):
+            # the same ID can exist in several indices, so we have to get the rest of the hits via a plain scroll
+            pages = self.get_paginator(self.rest_body(s, hits), paginator=AsyncScrollPaginator, progress=None).pages()
+            try:
+                async for page in pages:
+                    hits.extend(page)
+            finally:
+                await pages.aclose()
+        return hits
+
+
+class AsyncIDFileConsume(AsyncIDFile, IDFileConsume):
+    """
+    asyncio counterpart of IDFileConsume, the idfile gets rewritten with the missing IDs or deleted
+    """
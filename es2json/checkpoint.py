@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import es2json.helperscripts as helperscripts
+import es2json.output as output
+
+
+class Checkpoint:
+    """
+    persists the progress of a dump: the search_after cursor of every slice and the offset of the output file,
+    so a failed dump can be resumed where it stopped without duplicating or losing records
+    """
+    def __init__(self, path, sink=None, interval=30, tiebreaker="_id"):
+        """
+        Creates a new Checkpoint Object, an existing checkpoint file gets loaded for resuming
+        :param path: path of the checkpoint file
+        :param sink: the writer of the dump, needs sync() and tell() like output.NDJSONWriter, optional
+                     without a sink only the cursors get saved and the caller has to care about the output
+        :param interval: save the checkpoint at most every interval seconds, default is 30
+        :param tiebreaker: unique field the dump gets sorted by last, so the saved cursors stay valid for resuming,
+                           best a keyword field with doc values holding a copy of the ID, default is '_id',
+                           sorting by _id loads the _id fielddata onto the heap, deprecated in Elasticsearch 7
+                           and disabled by default in 8 (indices.id_field_data.enabled)
+        """
+        self.path = path
+        self.sink = sink
+        self.interval = interval
+        self.tiebreaker = tiebreaker
+        self.state = {}
+        if helperscripts.isfile(path):
+            with open(path, "r") as inp:
+                self.state = json.load(inp)
+        self.last_save = time.monotonic()
+
+    def check(self, params):
+        """
+        makes sure we don't resume a different dump
+        :param params: JSON-serializable dict describing the dump, e.g. index and query body
+        """
+        params = json.loads(json.dumps(params))
+        if self.state and self.state.get("params") != params:
+            raise ValueError("checkpoint {} belongs to another dump: {}".format(self.path, self.state.get("params")))
+        self.state["params"] = params
+
+    def cursor(self, slice_id):
+        """
+        returns the saved cursor of the slice: a dict with the search_after value and if the slice is done
+        or None if there is no saved cursor for this slice
+        """
+        return self.state.get("slices", {}).get(str(slice_id))
+
+    @property
+    def count(self):
+        """
+        number of records harvested until the last update
+        """
+        return self.state.get("count", 0)
+
+    def update(self, slice_id, search_after=None, count=0, done=False):
+        """
+        records the progress of a slice after all the records of a page were consumed
+        and saves the checkpoint if the interval has passed
+        """
+        slices = self.state.setdefault("slices", {})
+        if search_after is None and str(slice_id) in slices:
+            search_after = slices[str(slice_id)]["search_after"]
+        slices[str(slice_id)] = {"search_after": search_after, "done": done}
+        self.state["count"] = self.count + count
+        if time.monotonic() - self.last_save >= self.interval:
+            self.save()
+
+    def save(self):
+        """
+        syncs the sink and writes the checkpoint file atomically
+        """
+        if self.sink:
+            self.sink.sync()
+            self.state["offset"] = self.sink.tell()
+        tmp = "{}.tmp".format(self.path)
+        with open(tmp, "w") as outp:
+            json.dump(self.state, outp)
+        os.replace(tmp, self.path)
+        self.last_save = time.monotonic()
+
+    def finish(self):
+        """
+        the dump is complete: syncs the sink and removes the checkpoint file
+        """
+        if self.sink:
+            self.sink.sync()
+        if helperscripts.isfile(self.path):
+            os.remove(self.path)
+        self.state = {}
+
+    def open_output(self, path, **kwargs):
+        """
+        opens the output file of the dump, see output.open_output()
+        when resuming, the file gets truncated to the saved offset and opened for appending
+        """
+        if self.state.get("offset") is not None and helperscripts.isfile(path):
+            os.truncate(path, self.state["offset"])
+            return output.open_output(path, "ab", **kwargs)
+        return output.open_output(path, "wb", **kwargs)
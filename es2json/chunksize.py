@@ -0,0 +1,182 @@
+import re
+import json
+import time
+import threading
+import contextvars
+import elasticsearch
+import es2json.helperscripts as helperscripts
+
+
+UNITS = {"b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "ms": 0.001, "s": 1}
+
+# switched off by AdaptiveChunksize.call() for its requests, per thread and asyncio task
+retry_timeouts = contextvars.ContextVar("retry_timeouts", default=True)
+
+
+class TimeoutRetries:
+    """
+    mixin for an elasticsearch transport class whose retries of timed out requests can be switched off per request,
+    the client keeps retrying timeouts for all the requests not sent by AdaptiveChunksize.call()
+    """
+    @property
+    def retry_on_timeout(self):
+        return self._retry_on_timeout and retry_timeouts.get()
+
+    @retry_on_timeout.setter
+    def retry_on_timeout(self, value):
+        self._retry_on_timeout = value
+
+
+class AdaptiveTransport(TimeoutRetries, elasticsearch.Transport):
+    """
+    elasticsearch.Transport for the clients of generators with an adaptive chunksize, see TimeoutRetries
+    """
+
+
+def is_overloaded(error):
+    """
+    True if the request failed because it was too big for the cluster: a timeout or a rejection (429, e.g. circuit breaker)
+    """
+    if isinstance(error, elasticsearch.exceptions.ConnectionTimeout):
+        return True
+    return isinstance(error, elasticsearch.exceptions.TransportError) and error.status_code == 429
+
+
+def estimate_bytes(items, samples=8):
+    """
+    estimates the size of the items as JSON from a few evenly spread samples,
+    so we don't have to serialize every single hit of a page again
+    :param items: list of the raw hits/docs of a response
+    :param samples: number of items to measure, default is 8
+    """
+    if not items:
+        return 0
+    step = max(1, len(items) // samples)
+    sample = items[::step]
+    return sum(len(json.dumps(item)) for item in sample) * len(items) // len(sample)
+
+
+class AdaptiveChunksize:
+    """
+    chunksize which adjusts itself at runtime, so every page/chunk gets about the target response size or latency
+    shared by all the requests of a harvest (thread-safe), the size only grows by step per page
+    a request which times out or gets rejected is sent again with half the size, and the size never grows back
+    to a size which failed before, a client with an AdaptiveTransport doesn't retry it with the same size before
+    """
+    def __init__(self, target_bytes=None, target_seconds=None, initial=1000, minimum=10, maximum=10000, step=2.0):
+        """
+        Creates a new AdaptiveChunksize Object, at least one of target_bytes and target_seconds is needed
+        :param target_bytes: size of a response to aim for, optional
+        :param target_seconds: latency of a request to aim for, optional
+        :param initial: size of the first request, default is 1000
+        :param minimum: smallest size, default is 10
+        :param maximum: biggest size, default is 10000 (the default max_result_window of Elasticsearch)
+        :param step: factor the size may grow by per page, default is 2.0
+        """
+        if not target_bytes and not target_seconds:
+            raise ValueError("AdaptiveChunksize needs target_bytes or target_seconds")
+        self.target_bytes = target_bytes
+        self.target_seconds = target_seconds
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.size = min(max(initial, minimum), maximum)
+        self.doc_bytes = None  # moving averages per hit/doc
+        self.doc_seconds = None
+        self.backoffs = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_target(cls, target, **kwargs):
+        """
+        creates an AdaptiveChunksize from a target string, a size like '5MB' or a latency like '2s' or '500ms'
+        :param kwargs: additional arguments, see __init__()
+        """
+        match = re.fullmatch(r"\s*([0-9.]+)\s*([a-zA-Z]+)\s*", target)
+        if not match or match.group(2).lower() not in UNITS:
+            raise ValueError("invalid target {}, use a size like 5MB or a latency like 2s".format(target))
+        value = float(match.group(1)) * UNITS[match.group(2).lower()]
+        if match.group(2).lower().endswith("b"):
+            return cls(target_bytes=int(value), **kwargs)
+        return cls(target_seconds=value, **kwargs)
+
+    def update(self, items, seconds):
+        """
+        adjusts the size after a successful request
+        :param items: the raw hits/docs of the response
+        :param seconds: the latency of the request
+        """
+        if not items:
+            return
+        nbytes = estimate_bytes(items)
+        with self.lock:
+            self.doc_bytes = self.average(self.doc_bytes, nbytes / len(items))
+            self.doc_seconds = self.average(self.doc_seconds, seconds / len(items))
+            sizes = [self.size * self.step, self.maximum]
+            if self.target_bytes and self.doc_bytes:
+                sizes.append(self.target_bytes / self.doc_bytes)
+            if self.target_seconds and self.doc_seconds:
+                sizes.append(self.target_seconds / self.doc_seconds)
+            self.size = max(int(min(sizes)), self.minimum)
+
+    @staticmethod
+    def average(old, new, weight=0.5):
+        if old is None:
+            return new
+        return old + weight * (new - old)
+
+    def backoff(self, error, size):
+        """
+        halves the size after a request of size failed, returns False if the error is no overload or the size can't shrink
+        """
+        if not is_overloaded(error) or size <= self.minimum:
+            return False
+        with self.lock:
+            self.maximum = max(self.minimum, min(self.maximum, size - 1))
+            self.size = max(self.minimum, min(self.size, size // 2))  # concurrent failures of the same size only halve once
+            self.backoffs += 1
+        helperscripts.eprint("request of {} hits/docs failed ({}), retrying with chunksize {}".format(size, error, self.size))
+        return True
+
+    def call(self, request, items):
+        """
+        calls request(size) with the current size, halves the size and calls it again if it fails because of an overload
+        returns the size used, the response and its hits/docs
+        :param request: function sending the request for size hits/docs, returns the response
+        :param items: function returning the list of hits/docs of a response
+        """
+        while True:
+            size = self.size
+            start = time.perf_counter()
+            token = retry_timeouts.set(False)
+            try:
+                response = request(size)
+            except elasticsearch.exceptions.TransportError as e:
+                if self.backoff(e, size):
+                    continue
+                raise
+            finally:
+                retry_timeouts.reset(token)
+            hits = items(response)
+            self.update(hits, time.perf_counter() - start)
+            return size, response, hits
+
+    async def acall(self, request, items):
+        """
+        async version of call(), request(size) returns an awaitable
+        """
+        while True:
+            size = self.size
+            start = time.perf_counter()
+            token = retry_timeouts.set(False)
+            try:
+                response = await request(size)
+            except elasticsearch.exceptions.TransportError as e:
+                if self.backoff(e, size):
+                    continue
+                raise
+            finally:
+                retry_timeouts.reset(token)
+            hits = items(response)
+            self.update(hits, time.perf_counter() - start)
+            return size, response, hits
@@ -1,12 +1,11 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import re
 import argparse
-import json
 import es2json.helperscripts as helperscripts
-from es2json import ESGenerator
-from es2json import IDFile
-from es2json import IDFileConsume
+import es2json.output as output
+from es2json.checkpoint import Checkpoint
 
 def run(argv=None):
     """
@@ -17,7 +16,8 @@ def run(argv=None):
                                      formatter_class=argparse.RawTextHelpFormatter)
     parser.add_argument('-server', type=str, help="use http://host:port/index/type/id.\n"
                         "host:port - hostname or IP with port of the elasticsearch node to query\n"
-                        "            default: localhost:9200\n"
+                        "            default: localhost:9200, several nodes get comma separated,\n"
+                        "            e.g. http://es1:9200,es2:9200/index, the requests go round-robin\n"
                         "index     - index to query\n"
                         "            default: None → queries across all available indices\n"
                         "type      - elasticsearch doctype to use (optional)\n"
@@ -30,7 +30,8 @@ def run(argv=None):
                         'or return a python slice, e.g. 2:10 returns a list\n'
                         'from the 2nd including the 9th element of the search\n'
                         'only works with the ESGenerator\n'
-                        'Note: Not all slice variants may be supported')
+                        'slices ending after -chunksize get paged through with a point in time\n'
+                        '(scroll if not supported), also beyond the 10000 hits of max_result_window')
     parser.add_argument('-timeout', type=int, default=10,
                         help='Set the time in seconds after when a ReadTimeoutError can occur.\n'
                         'Default is 10 seconds. Raise for big/difficult querys ')
@@ -40,23 +41,120 @@ def run(argv=None):
                         help="exclude following _source field(s) from the _source object")
     parser.add_argument("-headless", action='store_true',
                         help="don't print Elasticsearch metadata")
+    parser.add_argument("-passthrough", action='store_true',
+                        help="only with -headless: write the documents exactly as Elasticsearch sends\n"
+                        "them, without encoding them again for the output. The responses still get\n"
+                        "decoded and need more memory. Faster for big documents,\n"
+                        "doesn't work with -pretty, -idfile or -idfile_consume")
     parser.add_argument('-body', type=helperscripts.jsonstring_or_file,
                         help='Elasticsearch Query object that can be in the form of\n'
                         '1) a JSON string (e.g. \'{"query": {"match": {"name": "foo"}}}\')\n'
                         '2) a file containing the upper query string')
     parser.add_argument('-idfile', type=str,
-                        help="path to a file with \\n-delimited IDs to process")
+                        help="path to a file with \\n-delimited IDs to process\n"
+                        "- reads the IDs from STDIN, FILE.gz gets decompressed")
     parser.add_argument('-idfile_consume', type=str,
-                        help="path to a file with \\n-delimited IDs to process")
+                        help="path to a file with \\n-delimited IDs to process,\n"
+                        "afterwards it only contains the IDs not found, FILE.gz stays compressed")
+    parser.add_argument('-batched', action='store_true',
+                        help="only with -body and -idfile/-idfile_consume: search all IDs of a chunk\n"
+                        "with one ids-filtered query instead of one search per ID")
     parser.add_argument('-missing_behaviour', type=str, choices=['print', 'yield'], default='print',
                         help="If IDs from an idfile are missing: 'print' or 'yield'\n"
                         "and json dict containing the ID, default is 'print'")
+    parser.add_argument('-transform', type=str, action='append', metavar="SPEC",
+                        help="transform the records before the output, can be given several times:\n"
+                        "module:function - a python function (the module has to be importable)\n"
+                        "                  returning the transformed record or None to drop it\n"
+                        "JSON or FILE    - a projection spec, e.g. '{\"select\": {\"title\": \"_source.title\"}}',\n"
+                        "                  with where, drop, select and flatten, see es2json.Projection\n"
+                        "runs in a process pool, page by page. Doesn't work with -passthrough or -checkpoint")
+    parser.add_argument('-transform_processes', type=int, default=None, metavar="N",
+                        help="number of processes for -transform, default is the number of CPUs,\n"
+                        "0 transforms in the main process")
+    parser.add_argument('-transform_unordered', action='store_true',
+                        help="write the pages of -transform as they are done, not in the order of the harvest")
     parser.add_argument('-pretty', action='store_true',
                         help="prettyprint the json output")
+    parser.add_argument('-output', type=str, metavar="FILE",
+                        help="write the output into FILE instead of STDOUT\n"
+                        "FILE.gz and FILE.zst get compressed in parallel (.zst needs the zstandard package)\n"
+                        "a FILE with an {index} placeholder, e.g. backup/{index}.ldj.gz, exports every\n"
+                        "index of -server (a comma separated list or a wildcard, default: all) into\n"
+                        "its own file, the largest indices first")
+    parser.add_argument('-concurrency', type=int, default=4, metavar="N",
+                        help="number of indices exported at once with an {index} -output, default is 4")
+    parser.add_argument('-tag_index', action='store_true',
+                        help="add the _index to the -headless records of an {index} -output")
+    parser.add_argument('-shards', type=int, default=None, metavar="N",
+                        help="write the output into N files, FILE-00000 … FILE-0000N-1, at once,\n"
+                        "every one with its own writer (and compression) thread. Needs -output")
+    parser.add_argument('-partition', type=str, default="roundrobin", metavar="KEY",
+                        help="how the records get distributed over the -shards:\n"
+                        "roundrobin - one after another (default)\n"
+                        "_id        - by a hash of the _id, doesn't work with -headless\n"
+                        "FIELD      - by a hash of a field of the _source, e.g. author.name")
+    parser.add_argument('-roll_size', type=helperscripts.size2bytes, default=None, metavar="SIZE",
+                        help="start a new file (per shard) after SIZE bytes of JSON, e.g. 1GB,\n"
+                        "the files get numbered: FILE-SHARD-PART. Needs -output")
+    parser.add_argument('-roll_count', type=int, default=None, metavar="N",
+                        help="start a new file (per shard) after N records. Needs -output")
+    parser.add_argument('-checkpoint', type=str, metavar="FILE",
+                        help="save the progress of the dump into FILE to resume it if it fails,\n"
+                        "just run the same command again for resuming. Needs -output\n"
+                        "and point in time support, only works with the ESGenerator.\n"
+                        "The dump gets sorted by _id last, costly on big indices, see -tiebreaker")
+    parser.add_argument('-tiebreaker', type=str, metavar="FIELD", default="_id",
+                        help="unique field to sort a -checkpoint dump by last, best a keyword field with\n"
+                        "doc values holding a copy of the ID. Default is _id, which loads the _id\n"
+                        "fielddata onto the heap, deprecated in Elasticsearch 7 and off by default in 8")
+    parser.add_argument('-metrics', type=str, metavar="FILE",
+                        help="write metrics of the dump (request latencies, bytes, pages, docs/s, retries,\n"
+                        "missing IDs, time spent in return_doc and waiting on the network) into FILE\n"
+                        "FILE.json gets JSON, any other FILE the Prometheus text format")
+    parser.add_argument('-encoder', type=str, choices=output.ENCODERS, default='json',
+                        help="JSON encoder to use for the output:\n"
+                        "json   - python standard library (default)\n"
+                        "orjson - faster, compact and not ASCII-escaped, needs the orjson package\n"
+                        "auto   - orjson if installed, else json")
+    parser.add_argument('-format', type=str, choices=['json', 'parquet'], default='json',
+                        help="output format:\n"
+                        "json    - line-delimited JSON (default)\n"
+                        "parquet - a Parquet file, columnar and compressed, needs -output\n"
+                        "          and the pyarrow package. Doesn't work with -passthrough,\n"
+                        "          -checkpoint, -shards, -roll_size, -roll_count or an {index} -output")
+    parser.add_argument('-schema', type=str, choices=['infer', 'mapping'], default='infer',
+                        help="schema of the -format parquet output:\n"
+                        "infer   - from the first -chunksize records (default),\n"
+                        "          fields showing up only later get left out\n"
+                        "mapping - from the mapping of the index, the first records tell which fields are arrays")
     parser.add_argument('-verbose', action='store_true',
-                        help="print progress for large dumps")
+                        help="print progress, throughput and ETA for large dumps")
     parser.add_argument('-chunksize', type=int, default=1000,
                         help="chunksize of the search window to use")
+    parser.add_argument('-adaptive', type=str, default=None, metavar="TARGET",
+                        help="adjust the chunksize at runtime toward TARGET, a response size\n"
+                        "like 5MB or a latency like 2s, -chunksize is the size to start with.\n"
+                        "Timed out pages/chunks get requested again with half the size.\n"
+                        "Use it with -paginator pit or -idfile, a scroll keeps its first size")
+    parser.add_argument('-parallel', type=int, default=None, metavar="N",
+                        help="harvest the index with N concurrent slices (sliced scroll)\n"
+                        "the output order is not preserved\n"
+                        "with -idfile/-idfile_consume: request N chunks of IDs concurrently")
+    parser.add_argument('-prefetch', type=int, default=None, metavar="K",
+                        help="fetch up to K pages/chunks ahead in a background thread\n"
+                        "while the current one gets written, memory grows with K × chunksize")
+    parser.add_argument('-sniff', action='store_true',
+                        help="ask the cluster for its nodes and spread the requests over all of them,\n"
+                        "they have to be reachable at their published addresses")
+    parser.add_argument('-maxsize', type=int, default=None, metavar="N",
+                        help="number of connections kept open per node,\n"
+                        "default is enough for -parallel/-concurrency")
+    parser.add_argument('-paginator', type=str, choices=['scroll', 'pit'], default='scroll',
+                        help="deep-paging engine to use for large dumps:\n"
+                        "scroll - one scroll context open for the whole dump (default)\n"
+                        "pit    - point in time + search_after with short keep-alives,\n"
+                        "         falls back to scroll if the cluster doesn't support it")
     parser.add_argument("-auth", type=str, nargs="?", const="ENV", metavar="USER",
                         help='Provide authentication, this can be done using:\n'
                         '1) set environment variables E2J_USER and E2J_PASSWD. In\n'
@@ -64,17 +162,23 @@ def run(argv=None):
                         '2) as a string "username". The password is then asked interactively\n'
                         '3) as "username:password" (not recommended)')
     args = parser.parse_args(argv)
+    # imported after parsing, so -h and wrong arguments don't wait for elasticsearch
+    from es2json.es2json import ESGenerator, IDFile, IDFileConsume
+    from es2json.metrics import Metrics
+    from es2json.chunksize import AdaptiveChunksize
+    from es2json.scheduler import MultiIndexExport
+    from es2json.transform import Transformer, load_transform
     es_kwargs = {}                              # dict to collect kwargs for ESgenerator
-    #parsing server                             # http://server.de:1234/index/_doc/101
-    slashsplit = args.server.split("/")         # → [http:, , server.de:1234, index, _doc, 101]
-    es_kwargs["host"] = slashsplit[2].rsplit(":")[0]
-    es_kwargs["port"] = int(args.server.split(":")[2].rsplit("/")[0]) # raise Error if port not castable to int
-    if len(slashsplit) > 3:
-        es_kwargs["index"] = slashsplit[3]
-    if len(slashsplit) > 4:
-        es_kwargs["type_"] = slashsplit[4]
-    if len(slashsplit) > 5:
-        es_kwargs["id_"] = slashsplit[5]
+    #parsing server                             # http://es1.de:1234,es2.de:1234/index/_doc/101
+    hosts, _, path = re.sub("https?://", "", args.server).partition("/")  # → es1.de:1234,es2.de:1234  index/_doc/101
+    es_kwargs["host"] = hosts                   # parsed by es2json.parse_hosts(), the port defaults to 9200
+    slashsplit = path.split("/") if path else []
+    if len(slashsplit) > 0:
+        es_kwargs["index"] = slashsplit[0]
+    if len(slashsplit) > 1:
+        es_kwargs["type_"] = slashsplit[1]
+    if len(slashsplit) > 2:
+        es_kwargs["id_"] = slashsplit[2]
 
     if args.auth:
         raise NotImplementedError("authentication not yet implemented")
@@ -106,6 +210,12 @@ def run(argv=None):
         es_kwargs["headless"] = args.headless
         es_kwargs["source"] = not args.ign_source
 
+    if args.passthrough:
+        if not args.headless or args.pretty or args.idfile or args.idfile_consume:
+            helperscripts.eprint("ERROR! -passthrough needs -headless and doesn't work with -pretty, -idfile or -idfile_consume!")
+            exit(-1)
+        es_kwargs["passthrough"] = True
+
     if args.pretty:
         tabbing = 4
     else:
@@ -122,20 +232,117 @@ def run(argv=None):
         es_kwargs["body"] = args.body
     if args.timeout:
         es_kwargs["timeout"] = args.timeout
-    if args.verbose:
-        es_kwargs["verbose"] = args.verbose
+    es_kwargs["verbose"] = args.verbose  # the generators print progress by default
+    if args.parallel:
+        es_kwargs["parallel"] = args.parallel
+    if args.paginator:
+        es_kwargs["paginator"] = args.paginator
+    if args.prefetch:
+        es_kwargs["prefetch"] = args.prefetch
+    if args.sniff:
+        es_kwargs["sniff"] = True
+    if args.maxsize:
+        es_kwargs["maxsize"] = args.maxsize
+    if args.adaptive:
+        try:
+            es_kwargs["adaptive"] = AdaptiveChunksize.from_target(args.adaptive, initial=args.chunksize)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.checkpoint:
+        if not args.output or args.idfile or args.idfile_consume or args.size:
+            helperscripts.eprint("ERROR! -checkpoint needs -output and doesn't work with -idfile, -idfile_consume or -size!")
+            exit(-1)
+        es_kwargs["checkpoint"] = Checkpoint(args.checkpoint, tiebreaker=args.tiebreaker)
+    partitioned = args.shards or args.roll_size or args.roll_count
+    if partitioned and (not args.output or args.checkpoint):
+        helperscripts.eprint("ERROR! -shards, -roll_size and -roll_count need -output and don't work with -checkpoint!")
+        exit(-1)
+    if args.partition == "_id" and args.headless:
+        helperscripts.eprint("ERROR! -partition _id doesn't work with -headless!")
+        exit(-1)
+    if args.transform:
+        if args.passthrough or args.checkpoint:
+            helperscripts.eprint("ERROR! -transform doesn't work with -passthrough or -checkpoint!")
+            exit(-1)
+        try:
+            transforms = [load_transform(spec) for spec in args.transform]
+        except (ValueError, ImportError, AttributeError) as e:
+            parser.error("invalid -transform: {}".format(e))
+    if args.format == "parquet":
+        if not args.output or "{index}" in args.output or args.passthrough or args.checkpoint or partitioned:
+            helperscripts.eprint("ERROR! -format parquet needs -output and doesn't work with -passthrough, -checkpoint,\n"
+                                 "-shards, -roll_size, -roll_count or an {index} -output!")
+            exit(-1)
+        from es2json.columnar import ParquetWriter, mapping_schema, check_pyarrow
+        try:
+            check_pyarrow()
+        except ImportError as e:
+            parser.error(str(e))
+    if args.metrics:
+        es_kwargs["metrics"] = Metrics()
+    if args.output and "{index}" in args.output:
+        if args.checkpoint or partitioned or args.idfile or args.idfile_consume or args.transform or "id_" in es_kwargs:
+            helperscripts.eprint("ERROR! an {index} -output doesn't work with -checkpoint, -shards, -roll_size, -roll_count,\n"
+                                 "-idfile, -idfile_consume, -transform or a document id in -server!")
+            exit(-1)
+        es_kwargs.pop("type_", None)
+        export = MultiIndexExport(es_kwargs.pop("index", None) or "*", args.output, concurrency=args.concurrency,
+                                  tag=args.tag_index, encoder=args.encoder, indent=tabbing, **es_kwargs)
+        try:
+            export.run()
+        finally:
+            if args.metrics:
+                es_kwargs["metrics"].write(args.metrics)
+        return
     if args.missing_behaviour and (args.idfile or args.idfile_consume):
         es_kwargs["missing_behaviour"] = args.missing_behaviour
+    if args.batched and (args.idfile or args.idfile_consume):
+        es_kwargs["batched"] = args.batched
     if args.idfile:
         es_kwargs["idfile"] = args.idfile
-        ESGeneratorFunction = IDFile(**es_kwargs).generator()
+        generator = IDFile(**es_kwargs)
     elif args.idfile_consume:
         es_kwargs["idfile"] = args.idfile_consume
-        ESGeneratorFunction = IDFileConsume(**es_kwargs).generator()
+        generator = IDFileConsume(**es_kwargs)
+    else:
+        generator = ESGenerator(**es_kwargs)
+    ESGeneratorFunction = generator.generator()
+    if args.transform:
+        # the workers also encode the records, unless a PartitionedWriter needs them for partitioning
+        # or they go into a Parquet file
+        encoder = None if partitioned or args.format == "parquet" else args.encoder
+        transformer = Transformer(transforms, processes=args.transform_processes, ordered=not args.transform_unordered,
+                                  batchsize=args.chunksize, encoder=encoder, indent=tabbing)
+        ESGeneratorFunction = transformer.transform(ESGeneratorFunction)
+    checkpoint = es_kwargs.get("checkpoint")
+    fileobj = None  # STDOUT
+    if args.format == "parquet":
+        schema = None
+        if args.schema == "mapping":
+            def schema(sample):
+                return mapping_schema(generator.es, generator.index, generator.headless, sample)
+        writer = ParquetWriter(args.output, schema=schema, batchsize=args.chunksize)
+    elif partitioned:
+        writer = output.PartitionedWriter(args.output, args.shards or 1, partition=args.partition, headless=args.headless,
+                                          encoder=args.encoder, indent=tabbing, batchsize=args.chunksize,
+                                          roll_size=args.roll_size, roll_count=args.roll_count)
     else:
-        ESGeneratorFunction = ESGenerator(**es_kwargs).generator()
-    for json_record in ESGeneratorFunction:
-        print(json.dumps(json_record, indent=tabbing))
+        if checkpoint:
+            fileobj = checkpoint.open_output(args.output)
+        elif args.output:
+            fileobj = output.open_output(args.output)
+        writer = output.NDJSONWriter(fileobj, encoder=args.encoder, indent=tabbing, batchsize=args.chunksize)
+    try:
+        with writer:
+            if checkpoint:
+                checkpoint.sink = writer
+            for json_record in ESGeneratorFunction:
+                writer.write(json_record)
+    finally:
+        if args.metrics:
+            es_kwargs["metrics"].write(args.metrics)  # also for failed dumps, to see what went wrong
+    if fileobj:
+        fileobj.close()
 
 
 if __name__ == "__main__":
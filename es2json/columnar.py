@@ -0,0 +1,329 @@
+import os
+import json
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, needed for the columnar output
+    pyarrow = None
+
+
+FORMATS = ("json", "parquet")
+SCHEMAS = ("infer", "mapping")
+
+# elasticsearch field types → arrow types, dates stay strings since the _source has them as they were indexed
+ES_TYPES = {
+    "keyword": "string", "constant_keyword": "string", "wildcard": "string", "text": "string",
+    "match_only_text": "string", "ip": "string", "version": "string", "date": "string", "date_nanos": "string",
+    "binary": "string", "long": "int64", "integer": "int32", "short": "int16", "byte": "int8", "unsigned_long": "uint64",
+    "double": "float64", "scaled_float": "float64", "float": "float32", "half_float": "float32", "boolean": "bool_",
+}
+
+
+def check_pyarrow():
+    if pyarrow is None:
+        raise ImportError("the columnar output needs the pyarrow package: pip install es2json[parquet]")
+
+
+def without_nulls(type_):
+    """
+    returns the arrow type with the null types (fields which were always null or empty lists) replaced by strings,
+    so later values still fit
+    """
+    if pyarrow.types.is_null(type_):
+        return pyarrow.string()
+    if pyarrow.types.is_struct(type_):
+        return pyarrow.struct([field.with_type(without_nulls(field.type)) for field in type_])
+    if pyarrow.types.is_list(type_) or pyarrow.types.is_large_list(type_):
+        return pyarrow.list_(without_nulls(type_.value_type))
+    return type_
+
+
+def infer_type(values):
+    """
+    infers the arrow type of the values of a field, string if there are none or they don't have a common type,
+    a list type if some of them are lists, elasticsearch doesn't tell single values from arrays
+    """
+    values = [value for value in values if value is not None]
+    if not values:
+        return pyarrow.string()
+    if all(isinstance(value, dict) for value in values):
+        fields = infer_fields(values)
+        return pyarrow.struct(fields) if fields else pyarrow.string()  # parquet has no empty structs
+    if any(isinstance(value, list) for value in values):
+        items = [item for value in values for item in (value if isinstance(value, list) else [value])]
+        return pyarrow.list_(infer_type(items)) if items else pyarrow.list_(pyarrow.string())
+    try:
+        return without_nulls(pyarrow.array(values).type)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        return pyarrow.string()
+
+
+def infer_fields(records, skip=()):
+    """
+    infers the arrow fields of the keys of the records, in the order they show up
+    """
+    names = []
+    for record in records:
+        names.extend(name for name in record if name not in names and name not in skip)
+    return [(name, infer_type([record.get(name) for record in records])) for name in names]
+
+
+def infer_schema(records):
+    """
+    infers the arrow schema from a sample of records, e.g. the first pages of a dump
+    the sort values of the paginators are left out, they aren't part of the documents
+    """
+    check_pyarrow()
+    return pyarrow.schema(infer_fields(records, skip=("sort",)))
+
+
+def field_type(mapping, values):
+    """
+    returns the arrow type of a field of the index mapping,
+    a field with a list in the sample values gets a list type, the mapping doesn't tell about arrays
+    field types not in ES_TYPES, e.g. geo_point, get inferred from the sample values
+    """
+    items = [item for value in values if value is not None for item in (value if isinstance(value, list) else [value])]
+    if mapping.get("properties"):
+        type_ = struct_type(mapping["properties"], [item for item in items if isinstance(item, dict)])
+        if mapping.get("type") == "nested":
+            return pyarrow.list_(type_)
+    elif mapping.get("type") in ES_TYPES:
+        type_ = getattr(pyarrow, ES_TYPES[mapping["type"]])()
+    else:
+        return infer_type(values)
+    if any(isinstance(value, list) for value in values):
+        return pyarrow.list_(type_)
+    return type_
+
+
+def struct_type(properties, sample=()):
+    return pyarrow.struct([(name, field_type(mapping, [record.get(name) for record in sample]))
+                           for name, mapping in properties.items()])
+
+
+def merge_properties(properties, other):
+    """
+    merges the mapping properties of another index into properties, the first index wins on conflicts
+    """
+    for name, mapping in other.items():
+        if name not in properties:
+            properties[name] = mapping
+        elif "properties" in properties[name] and "properties" in mapping:
+            merge_properties(properties[name]["properties"], mapping["properties"])
+    return properties
+
+
+def mapping_properties(es, index):
+    """
+    returns the merged field mapping of the index, a wildcard or a comma separated list of indices
+    """
+    properties = {}
+    for mapping in es.indices.get_mapping(index=index).values():
+        mapping = mapping.get("mappings", {})
+        if "properties" not in mapping:  # with a doc type, elasticsearch < 7
+            mapping = next(iter(mapping.values()), {})
+        merge_properties(properties, mapping.get("properties", {}))
+    return properties
+
+
+def mapping_schema(es, index, headless=False, sample=()):
+    """
+    derives the arrow schema from the mapping of the index
+    :param es: the elasticsearch.Elasticsearch() Object to use
+    :param index: index name, wildcard or comma separated list of indices
+    :param headless: the records are only the _source, default is False
+    :param sample: some records to look up which fields are arrays and the types of unmapped fields, optional
+    """
+    check_pyarrow()
+    source = struct_type(mapping_properties(es, index), [record.get("_source") or {} for record in sample]
+                         if not headless else sample)
+    if headless:
+        return pyarrow.schema(list(source))
+    fields = infer_fields([{"_index": None, "_id": None}] + list(sample), skip=("_source", "sort"))
+    return pyarrow.schema(fields + [("_source", source)])
+
+
+def normalize(value, type_):
+    """
+    fits a value to the arrow type where it's clear how: single values into lists, values into strings
+    and numeric strings into numbers (elasticsearch coerces them the same way)
+    """
+    if value is None:
+        return None
+    if pyarrow.types.is_list(type_):
+        return [normalize(item, type_.value_type) for item in (value if isinstance(value, list) else [value])]
+    if pyarrow.types.is_struct(type_):
+        if not isinstance(value, dict):
+            return value
+        return {field.name: normalize(value.get(field.name), field.type) for field in type_}
+    if pyarrow.types.is_string(type_) and not isinstance(value, str):
+        return json.dumps(value) if isinstance(value, (dict, list)) else str(value).lower() if isinstance(value, bool) else str(value)
+    if isinstance(value, str):
+        try:
+            if pyarrow.types.is_integer(type_):
+                return int(value)
+            if pyarrow.types.is_floating(type_):
+                return float(value)
+        except ValueError:
+            pass
+    return value
+
+
+def to_record_batch(records, schema):
+    """
+    converts a list of records into an arrow RecordBatch of the schema,
+    fields of the records which aren't in the schema get left out, missing ones are null
+    records which don't fit the schema as they are get normalized first, see normalize()
+    """
+    try:
+        return pyarrow.RecordBatch.from_pylist(records, schema=schema)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        pass
+    records = [{field.name: normalize(record.get(field.name), field.type) for field in schema} for record in records]
+    try:
+        return pyarrow.RecordBatch.from_pylist(records, schema=schema)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+        raise ValueError("records don't fit the arrow schema: {}".format(e)) from e
+
+
+class RecordBatcher:
+    """
+    converts records into arrow RecordBatches, the schema is given or gets inferred/derived from the first records
+    fields which first show up after the schema was made get left out, so infer from enough records
+    """
+    def __init__(self, schema=None, infer_rows=1000):
+        """
+        Creates a new RecordBatcher Object
+        :param schema: a pyarrow.Schema, None to infer it from the first records
+                       or a function which returns the schema for the first records, e.g. for mapping_schema()
+        :param infer_rows: number of records to collect before making the schema, default is 1000
+        """
+        check_pyarrow()
+        self.schema = schema
+        self.infer_rows = infer_rows
+        self.sample = []
+
+    def add(self, records):
+        """
+        returns the RecordBatches for a list of records, none while the records for the schema are being collected
+        """
+        if not isinstance(self.schema, pyarrow.Schema):
+            self.sample.extend(records)
+            if len(self.sample) < self.infer_rows:
+                return []
+            return self.flush()
+        return [to_record_batch(records, self.schema)] if records else []
+
+    def flush(self):
+        """
+        makes the schema if not done yet and returns the RecordBatch of the collected records
+        """
+        if isinstance(self.schema, pyarrow.Schema) or not self.sample:
+            return []
+        self.schema = self.schema(self.sample) if callable(self.schema) else infer_schema(self.sample)
+        sample, self.sample = self.sample, []
+        return [to_record_batch(sample, self.schema)]
+
+
+def record_batches(generator, schema="infer", batchsize=None, infer_rows=None):
+    """
+    generator yielding the records of an ESGenerator, IDFile or IDFileConsume as arrow RecordBatches,
+    e.g. for pyarrow.Table.from_batches() or pandas, without JSON in between
+    :param generator: the ESGenerator Object to harvest
+    :param schema: 'infer' (default) from the first records, 'mapping' from the index mapping or a pyarrow.Schema
+    :param batchsize: number of records per RecordBatch, default is the chunksize
+    :param infer_rows: number of records to infer the schema from, default is the batchsize
+    """
+    batchsize = batchsize or generator.chunksize
+    if schema == "mapping":
+        def schema(sample):
+            return mapping_schema(generator.es, generator.index, generator.headless, sample)
+    elif schema == "infer":
+        schema = None
+    batcher = RecordBatcher(schema, infer_rows or batchsize)
+    for batch in generator.iter_batches(batchsize):
+        yield from batcher.add(batch)
+    yield from batcher.flush()
+
+
+class ParquetWriter:
+    """
+    buffered writer for Parquet files, the same interface as output.NDJSONWriter
+    collects the records and writes them batch-wise as row groups
+    """
+    def __init__(self, path, schema=None, batchsize=1000, infer_rows=None, compression="snappy"):
+        """
+        Creates a new ParquetWriter Object
+        :param path: path of the Parquet file, it gets written as path.tmp and renamed when closed
+        :param schema: a pyarrow.Schema, None to infer it from the first records
+                       or a function which returns the schema for the first records, see RecordBatcher
+        :param batchsize: number of records per row group, default is 1000
+        :param infer_rows: number of records to infer the schema from, default is the batchsize
+        :param compression: Parquet compression codec, e.g. 'snappy' (default), 'zstd', 'gzip' or 'none'
+        """
+        check_pyarrow()
+        self.path = path
+        self.batcher = RecordBatcher(schema, infer_rows or batchsize)
+        self.batchsize = batchsize
+        self.compression = compression
+        self.records = []
+        self.writer = None
+
+    def write(self, record):
+        """
+        buffers one record, bytes (passthrough records) aren't supported
+        """
+        if isinstance(record, bytes):
+            raise TypeError("the Parquet output needs the records as dicts, not as JSON bytes")
+        self.records.append(record)
+        if len(self.records) >= self.batchsize:
+            self.write_batches(self.batcher.add(self.records))
+            self.records = []
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        self.flush()
+
+    def write_batches(self, batches):
+        for batch in batches:
+            if self.writer is None:
+                self.writer = pyarrow.parquet.ParquetWriter(self.path + ".tmp", batch.schema, compression=self.compression)
+            self.writer.write_batch(batch)
+
+    def flush(self):
+        """
+        writes the buffered records as row group, also the ones collected for the schema
+        """
+        self.write_batches(self.batcher.add(self.records))
+        self.records = []
+        self.write_batches(self.batcher.flush())
+
+    def close(self):
+        """
+        writes the rest of the buffered records and renames the finished file, an empty dump gives no file
+        """
+        self.flush()
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+            os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        """
+        closes and removes the unfinished file
+        """
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+            os.remove(self.path + ".tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, doc_, value, traceback):
+        if doc_ is None:
+            self.close()
+        else:
+            self.abort()
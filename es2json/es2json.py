@@ -1,8 +1,44 @@
 import os
-import urllib
+import time
+import queue
+import urllib.parse
+import itertools
+import threading
+import collections
+import concurrent.futures
 import elasticsearch
+import elasticsearch.helpers
 import elasticsearch_dsl
 import es2json.helperscripts as helperscripts
+import es2json.idstore as idstore
+from es2json.checkpoint import Checkpoint
+from es2json.metrics import Metrics, MetricsConnection
+from es2json.chunksize import AdaptiveChunksize, AdaptiveTransport
+from es2json.passthrough import raw_client, raw_line
+from es2json.progress import Progress
+
+
+def parse_hosts(host, port=9200):
+    """
+    returns the nodes for the Elasticsearch client, e.g. [{"host": "es1", "port": 9200}, {"host": "es2", "port": 9201}]
+    :param host: a host, a list of hosts or a comma separated string of them, e.g. 'es1,es2:9201',
+                 a host can also be an URL (the protocol gets dropped) or already a dict like above
+    :param port: port of the hosts which don't have one, default is 9200
+    """
+    if isinstance(host, str):
+        host = host.split(",")
+    nodes = []
+    for name in host:
+        if isinstance(name, dict):
+            nodes.append(name)
+            continue
+        name = name.strip()
+        if name:
+            url = urllib.parse.urlparse(name if "://" in name else "//" + name)
+            nodes.append({"host": url.hostname, "port": url.port or port})
+    if not nodes:
+        raise ValueError("no Elasticsearch host given")
+    return nodes
 
 
 class ESGenerator:
@@ -23,11 +59,22 @@ class ESGenerator:
                  chunksize=1000,
                  timeout=10,
                  verbose=True,
-                 slice_=None):
+                 slice_=None,
+                 parallel=None,
+                 paginator="scroll",
+                 keep_alive=None,
+                 checkpoint=None,
+                 prefetch=None,
+                 metrics=None,
+                 adaptive=None,
+                 passthrough=False,
+                 sniff=False,
+                 maxsize=None):
         """
         Construct a new ESGenerator Object.
-        :param host: Elasticsearch host to use, default is localhost
-        :param port: Elasticsearch port to use, default is 9200
+        :param host: Elasticsearch host to use, default is localhost, can be a list or a comma separated string of hosts,
+                     e.g. 'es1:9200,es2:9200', the requests go round-robin to the nodes, see parse_hosts()
+        :param port: Elasticsearch port to use for the hosts without one, default is 9200
         :param index: Elasticsearch Index to use, optional, if no parameter given, ESGenerator uses ALL the indices
         :param es: Don't use the host/port/timeout setting, use your own elasticsearch.Elasticsearch() Object
         :param type_: Elasticsearch doc_type to use, optional, deprecated after Elasticsearch>=7.0.0
@@ -41,16 +88,29 @@ class ESGenerator:
         :param verbose: print out progress information on /dev/stderr, default is True, optional
         :param slice_: only return records defined by a python slice() object
                       free earworm when working with python slices: https://youtu.be/Nlnoa67MUJU
+        :param parallel: number of slices to harvest concurrently via sliced scroll, optional, default is a single scroll
+                         IDFile: number of chunks to request concurrently, the order of the records is kept
+        :param paginator: deep-paging engine to use, 'scroll' or 'pit' (point in time + search_after) or a Paginator class,
+                          'pit' falls back to 'scroll' on clusters not supporting point in time, default is 'scroll'
+        :param keep_alive: how long the cluster keeps the search context between two pages, default depends on the paginator
+        :param checkpoint: path of a checkpoint file or a checkpoint.Checkpoint() Object to make the harvest resumable, optional
+                           needs point in time support, so the paginator is always 'pit' with a checkpoint
+        :param prefetch: number of pages a background thread fetches ahead while the current page gets consumed, optional,
+                         memory stays capped at about prefetch × chunksize records, default is no prefetching
+        :param metrics: a metrics.Metrics() Object or a callback function(event, data) to collect metrics of the harvest, optional
+                        the latency, size and retries of the requests are only measured if the generator creates the connection
+        :param adaptive: adjust the chunksize at runtime, a chunksize.AdaptiveChunksize() Object or a target string,
+                         a response size like '5MB' or a latency like '2s', chunksize is the size to start with, optional
+                         pages/chunks which time out get requested again with half the size,
+                         only point in time and idfiles can change the size of every page, a scroll keeps its first size
+        :param passthrough: only with headless: yield the _source of every record as UTF-8 encoded JSON bytes, exactly as
+                            Elasticsearch sent it, so it doesn't get encoded again for the output, default is False
+                            the responses still get decoded, see passthrough.loads_raw_sources()
+                            fields of the query body don't get merged into the records, only supported by the ESGenerator
+        :param sniff: ask the cluster for its nodes at the start and when a node fails, and use all of them, default is False
+                      only works if the nodes publish addresses reachable from here, e.g. not behind a load balancer or NAT
+        :param maxsize: number of connections kept open per node, default is enough for all the parallel slices/chunks
         """
-        if es:
-            self.es = es
-        else:
-            if "://" in host:  # we don't want the hostname to start with the protocoll
-                host = urllib.parse.urlparse(host).hostname
-            self.es = elasticsearch_dsl.connections.create_connection(
-                               host=host, port=port, timeout=timeout,
-                               max_retries=10, retry_on_timeout=True,
-                               http_compress=True)
         self.id_ = id_
         self.source = source
         self.chunksize = chunksize
@@ -62,6 +122,57 @@ class ESGenerator:
         self.body = body
         self.verbose = verbose
         self.slice_ = slice_
+        self.parallel = parallel
+        self.paginator = paginator
+        self.keep_alive = keep_alive
+        if isinstance(checkpoint, str):
+            checkpoint = Checkpoint(checkpoint)
+        self.checkpoint = checkpoint
+        if checkpoint:
+            self.paginator = "pit"
+        self.prefetch = prefetch
+        if metrics is not None and not isinstance(metrics, Metrics):
+            metrics = Metrics([metrics])
+        self.metrics = metrics
+        if isinstance(adaptive, str):
+            adaptive = AdaptiveChunksize.from_target(adaptive, initial=chunksize)
+        self.adaptive = adaptive
+        if passthrough and not headless:
+            raise ValueError("passthrough only works with headless")
+        self.passthrough = passthrough
+        self.sniff = sniff
+        self.maxsize = maxsize
+        if es:
+            self.es = es
+        else:
+            self.es = self.connect(parse_hosts(host, port), timeout)
+        self.raw_es = raw_client(self.es) if passthrough else None  # same connections, but the _source stays raw JSON
+        self.meta_plans = {}  # cache for return_raw_doc(): layout of the raw hit → layout of the returned doc
+        self.progress = None
+
+    def connect(self, hosts, timeout):
+        """
+        creates the Elasticsearch client used if no es Object was given
+        the requests go round-robin to the nodes, every node gets a connection pool of its own,
+        by default big enough for all the parallel slices/chunks
+        with an adaptive chunksize, the timeouts of the pages/chunks aren't retried by the client but with a smaller
+        chunksize, all the other requests (scrolls, point in times, ...) are retried as usual
+        """
+        return elasticsearch_dsl.connections.create_connection(hosts=hosts, timeout=timeout, **self.client_kwargs())
+
+    def client_kwargs(self):
+        """
+        returns the arguments of the Elasticsearch client besides the hosts and the timeout
+        """
+        kwargs = {"max_retries": 10, "retry_on_timeout": True, "http_compress": True,
+                  "maxsize": self.maxsize or max(10, self.parallel or 0)}
+        if self.adaptive:
+            kwargs["transport_class"] = AdaptiveTransport
+        if self.sniff:
+            kwargs.update(sniff_on_start=True, sniff_on_connection_fail=True, sniffer_timeout=60)
+        if self.metrics:
+            kwargs.update(connection_class=MetricsConnection, metrics=self.metrics)
+        return kwargs
 
     def return_doc(self, hit):
         """
@@ -92,6 +203,69 @@ class ESGenerator:
 
             return meta
 
+    def return_raw_doc(self, hit, skip_empty=False):
+        """
+        fast path of return_doc() for the raw hit dicts returned by elasticsearch.Elasticsearch(),
+        returns exactly the same record as return_doc() would for the elasticsearch_dsl-object
+        but without building Hit/Document/AttrDict objects for every single record
+        :param hit: the raw hit/document dict as returned by Elasticsearch
+        :param skip_empty: drop empty values from _source like elasticsearch_dsl.Document.to_dict() does,
+                           needed for the output of get/mget calls, default is False
+        """
+        if self.headless and not self.source:
+            return {}
+        source = hit.get("_source")
+        if source is None:
+            source = {}
+        if skip_empty:
+            source = {key: value for key, value in source.items() if value not in ([], {}, None)}
+        elif "fields" in hit:
+            source.update(hit["fields"])  # elasticsearch_dsl.response.Hit merges fields into the data
+        if self.headless:
+            return source
+        keys = tuple(hit)
+        plan = self.meta_plans.get(keys)
+        if plan is None:
+            plan = self.meta_plans[keys] = self.meta_plan(keys)
+        doc = {key: hit[raw_key] for key, raw_key in plan}
+        if self.source:
+            doc["_source"] = source
+        else:
+            doc["_source"] = {}
+        return doc
+
+    @staticmethod
+    def meta_plan(keys):
+        """
+        replays the renaming of elasticsearch_dsl.response.HitMeta and return_doc() for the keys of a raw hit,
+        so return_raw_doc() gets the same keys in the same order
+        returns a tuple of (key of the returned doc, key of the raw hit) pairs
+        :param keys: the keys of the raw hit
+        """
+        meta = collections.OrderedDict()
+        for key in keys:
+            if key not in ("_source", "_fields"):
+                meta[key[1:] if key.startswith("_") else key] = key
+        if "type" in meta:
+            meta["doc_type"] = meta.pop("type")
+        for key in elasticsearch_dsl.utils.META_FIELDS:
+            if key in meta:
+                meta["_{}".format(key)] = meta.pop(key)
+        if "doc_type" in meta:
+            meta["_type"] = meta.pop("doc_type")
+        return tuple(meta.items())
+
+    def return_passthrough_doc(self, hit):
+        """
+        passthrough version of return_raw_doc() for headless dumps, the hit has to come from self.raw_es
+        returns the _source of the hit as one line of UTF-8 encoded JSON bytes, exactly as Elasticsearch sent it
+        :param hit: the raw hit/document dict, with the _source as raw JSON text
+        """
+        source = hit.get("_source")
+        if not self.source or source is None:
+            return b"{}"
+        return raw_line(source)
+
     def __enter__(self):
         """
         function needed for with-statement
@@ -109,32 +283,626 @@ class ESGenerator:
     def generator(self):
         """
         main generator function which harvests from the Elasticsearch-Cluster after all init and argument stuff is done
+        yields the records one by one, see iter_pages()
+        """
+        for page in self.iter_pages():
+            for record in page:
+                yield record
+
+    def iter_pages(self):
         """
+        generator yielding the records page by page, as a list per response of Elasticsearch,
+        for batch consumers like bulk indexers or DataFrame builders, without a generator step per record
+        """
+        es = self.raw_es or self.es
         if self.id_:
-            s = elasticsearch_dsl.Document.get(using=self.es,
-                                               index=self.index,
-                                               id=self.id_,
-                                               _source_excludes=self.source_excludes,
-                                               _source_includes=self.source_includes,
-                                               _source=self.source)
-            yield self.return_doc(s)
+            doc = es.get(index=self.index,
+                         id=self.id_,
+                         _source_excludes=self.source_excludes,
+                         _source_includes=self.source_includes,
+                         _source=self.source)
+            if self.passthrough:
+                yield [self.return_passthrough_doc(doc)]
+            else:
+                yield [self.return_raw_doc(doc, skip_empty=True)]
+            if self.metrics:
+                self.metrics.finish()
             return
+        s = self.search()
+        resumed = self.checkpoint.count if self.checkpoint else 0  # records already harvested by an interrupted run
+        # the paginators take the total from their first responses, no extra count request
+        progress = self.progress = Progress(self.chunksize, resumed) if self.verbose else None
+        if self.slice_:
+            pages = self.window_pages(s)
+        else:
+            pages = self.scan_pages(s.to_dict())
+        metrics = self.metrics
+        return_doc = self.return_passthrough_doc if self.passthrough else self.return_raw_doc
+        for page in pages:
+            if metrics:
+                start = time.perf_counter()
+                records = [return_doc(hit) for hit in page]
+                metrics.doc(time.perf_counter() - start, len(records))
+            else:
+                records = [return_doc(hit) for hit in page]
+            if progress:
+                progress.update(progress.count + len(records))
+            yield records
+        if progress:
+            progress.finish()
+        if metrics:
+            metrics.finish()
+
+    def iter_batches(self, size=None):
+        """
+        generator yielding the records in lists of exactly size records, only the last one can be smaller,
+        pages of the right size are passed on as they are, see iter_pages()
+        :param size: number of records per list, default is the chunksize
+        """
+        size = size or self.chunksize
+        batch = []
+        for page in self.iter_pages():
+            if not batch and len(page) == size:
+                yield page
+                continue
+            batch.extend(page)
+            if len(batch) >= size:
+                full = len(batch) - len(batch) % size
+                for start in range(0, full, size):
+                    yield batch[start:start + size]
+                batch = batch[full:]
+        if batch:
+            yield batch
+
+    def window_pages(self, s):
+        """
+        yields the hits of the python slice slice_ of the elasticsearch_dsl.Search s, page by page
+        a slice ending within the first page is a single from/size request, a deeper one, e.g. slice(500000, 600000),
+        gets harvested with a point in time (scroll if not supported), which skips the hits before it and pages through it
+        in chunksize steps, so neither the memory nor the cost of a request grow with the offset or hit max_result_window
+        a chunksize above max_result_window gets capped at PITPaginator.skip_size, the default max_result_window
+        """
+        sliced = s[self.slice_]  # raises a ValueError for negative slices
+        start, stop = self.slice_.start or 0, self.slice_.stop
+        size = min(self.chunksize, PITPaginator.skip_size)
+        if stop is None or stop <= size:
+            es = self.raw_es or self.es
+            hits = es.search(index=self.index, doc_type=self.type_, body=sliced.to_dict())["hits"]["hits"]
+            if self.progress:
+                self.progress.add_total(len(hits))
+            yield hits
+            return
+        step = self.slice_.step or 1
+        if self.progress:
+            self.progress.add_total(len(range(start, stop, step)))
+        body = s.to_dict()
+        if "sort" not in body:
+            body["sort"] = [{"_score": "desc"}, {"_shard_doc": "asc"}]  # the order of a from/size request
+        paginator = self.get_paginator(body, paginator=PITPaginator, skip=start, progress=None, size=size)
+        pages = paginator.pages()
+        n = start  # position of the first hit of the next page in the search
+        try:
+            for page in self.metered(pages, len) if self.metrics else pages:
+                hits = page[:stop - n][(start - n) % step::step]
+                n += len(page)
+                if hits:
+                    yield hits
+                if n >= stop:
+                    return
+        finally:
+            pages.close()  # the hits after the slice aren't needed, release the point in time now
+
+    def metered(self, items, size):
+        """
+        yields the items, e.g. pages, and reports every one to the metrics with the time the generator waited for it
+        :param items: iterable of the items
+        :param size: function returning the number of hits of an item, None for items which are no page
+        """
+        items = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            hits = size(item)
+            if hits is not None:
+                self.metrics.page(hits, time.perf_counter() - start)
+            yield item
+
+    def search(self):
+        """
+        returns the elasticsearch_dsl.Search for the index, source filtering and query body of this generator
+        """
         s = elasticsearch_dsl.Search(using=self.es,
                                      index=self.index,
                                      doc_type=self.type_).source(excludes=self.source_excludes,
                                                                     includes=self.source_includes)
         if self.body:
             s = s.update_from_dict(self.body)
-        if self.verbose:
-            hits_total = s.count()
-        if self.slice_:
-            hits = s[self.slice_].execute()
+        return s
+
+    def get_paginator(self, body, paginator=None, **kwargs):
+        """
+        returns an instance of the configured paginator for the query body
+        :param body: the query body to paginate
+        :param paginator: use this paginator class instead of the configured one, optional
+        :param kwargs: additional arguments for the paginator, e.g. slice_id, slice_max, pit_id, skip or size
+        """
+        if not paginator:
+            paginator = PAGINATORS.get(self.paginator, self.paginator)
+        kwargs.setdefault("progress", self.progress)
+        kwargs.setdefault("size", self.chunksize)
+        return paginator(es=self.raw_es or self.es,
+                         index=self.index,
+                         doc_type=self.type_,
+                         body=body,
+                         keep_alive=self.keep_alive,
+                         adaptive=self.adaptive,
+                         **kwargs)
+
+    def scan(self, body):
+        """
+        harvests all hits of the query body, yields them one by one, see scan_pages()
+        :param body: the query body to harvest
+        """
+        for page in self.scan_pages(body):
+            for hit in page:
+                yield hit
+
+    def scan_pages(self, body):
+        """
+        harvests all hits of the query body with the configured paginator and yields them page by page,
+        split into concurrently harvested slices if parallel is set, the next pages get fetched ahead if prefetch is set
+        with a checkpoint, the progress gets saved page by page and an interrupted harvest gets resumed
+        :param body: the query body to harvest
+        """
+        if self.checkpoint:
+            body = self.checkpoint_body(body)
+        if self.parallel and self.parallel > 1:
+            pages = self.parallel_pages(body)
         else:
-            hits = s.params(scroll='12h', size=self.chunksize).scan()  # in scroll context, size = pagesize, still all records will be returned
-        for n, hit in enumerate(hits):
-            yield self.return_doc(hit)
-            if self.verbose and ((n+1) % self.chunksize == 0 or n+1 == hits_total):
-                helperscripts.eprint("{}/{}".format(n+1, hits_total))
+            pages = self.slice_pages(body)
+            if self.prefetch:
+                pages = threaded_merge([pages], maxsize=self.prefetch)
+        if self.metrics:
+            pages = self.metered(pages, lambda item: None if item[1] is None else len(item[1]))
+        try:
+            for slice_id, page in pages:
+                if page is None:  # the slice is done
+                    if self.checkpoint:
+                        self.checkpoint.update(slice_id, done=True)
+                    continue
+                yield page
+                if self.checkpoint:
+                    self.checkpoint.update(slice_id, search_after=page[-1]["sort"], count=len(page))
+        except Exception:
+            if self.checkpoint:
+                self.checkpoint.save()  # every record of the pages recorded in the checkpoint has been consumed
+            raise
+        if self.checkpoint:
+            self.checkpoint.finish()
+
+    def checkpoint_body(self, body):
+        """
+        prepares the query body for a resumable harvest and checks that the checkpoint belongs to it
+        the sort needs a unique tiebreaker, the tiebreaker of the checkpoint, since the search_after values
+        have to stay valid even when the point in time has to be opened again for resuming
+        """
+        body = dict(body)
+        sort = body.get("sort", [])
+        if not isinstance(sort, list):
+            sort = [sort]
+        tiebreaker = self.checkpoint.tiebreaker
+        if not any(item == tiebreaker or isinstance(item, dict) and tiebreaker in item for item in sort):
+            sort = sort + [{tiebreaker: "asc"}]
+        body["sort"] = sort
+        self.checkpoint.check({"index": self.index, "type": self.type_, "body": body, "parallel": self.parallel or 1})
+        return body
+
+    def slice_pages(self, body, slice_id=0, slice_max=None, **kwargs):
+        """
+        yields the pages of one slice as (slice_id, page) tuples and finally (slice_id, None) when the slice is done
+        with a checkpoint, the slice continues after its saved cursor
+        :param body: the query body to harvest
+        :param slice_id: the slice to harvest, default is 0
+        :param slice_max: the number of slices, optional
+        :param kwargs: additional arguments for get_paginator()
+        """
+        if self.checkpoint:
+            cursor = self.checkpoint.cursor(slice_id)
+            if cursor and cursor["done"]:
+                return
+            if cursor:
+                kwargs["search_after"] = cursor["search_after"]
+            kwargs["fallback"] = False  # scroll can't be resumed
+        paginator = self.get_paginator(body, slice_id=slice_id, slice_max=slice_max, **kwargs)
+        for page in paginator.pages():
+            yield slice_id, page
+        yield slice_id, None
+
+    def parallel_pages(self, body):
+        """
+        sliced scroll/point in time: every slice gets harvested by its own thread,
+        the pages of all slices are merged into one stream of (slice_id, page) tuples
+        :param body: the query body to slice
+        """
+        paginator = PAGINATORS.get(self.paginator, self.paginator)
+        pit_id = None
+        if issubclass(paginator, PITPaginator):
+            # all the slices have to share the same point in time
+            try:
+                pit_id = paginator.open(self.es, self.index, self.keep_alive or paginator.keep_alive)
+            except elasticsearch.exceptions.TransportError as e:
+                if self.checkpoint or not pit_unsupported(e, opening=True):
+                    raise
+                helperscripts.eprint("point in time not supported by the cluster, falling back to scroll: {}".format(e))
+                paginator = ScrollPaginator
+        slices = [self.slice_pages(body,
+                                   slice_id=n,
+                                   slice_max=self.parallel,
+                                   paginator=paginator,
+                                   pit_id=pit_id) for n in range(self.parallel)]
+        try:
+            for page in threaded_merge(slices, maxsize=self.prefetch or self.parallel):
+                yield page
+        finally:
+            if pit_id:
+                PITPaginator.close(self.es, pit_id)
+
+
+def threaded_merge(iterables, maxsize=0):
+    """
+    iterates over every iterable in its own thread and yields the items as they arrive
+    exceptions raised in a thread get re-raised in the consuming thread
+    if the consumer stops early, the threads stop after their current item and close their iterables
+    :param iterables: list of iterables to merge
+    :param maxsize: how many items may be queued before the threads have to wait for the consumer, 0 means unbounded
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(iterable):
+        try:
+            for item in iterable:
+                if not put((None, item)):
+                    break
+        except Exception as e:
+            put((e, None))
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+            put((None, done))
+
+    threads = [threading.Thread(target=worker, args=(iterable,), daemon=True) for iterable in iterables]
+    for thread in threads:
+        thread.start()
+    running = len(threads)
+    try:
+        while running:
+            error, item = items.get()
+            if error:
+                raise error
+            if item is done:
+                running -= 1
+                continue
+            yield item
+    finally:
+        stop.set()
+
+
+def pit_unsupported(error, opening=False):
+    """
+    True if the error means the cluster doesn't support point in time, not e.g. a missing index or a malformed query
+    :param error: the exception of the request
+    :param opening: the request opened the point in time, Elasticsearch < 7.10 answers it with a 400/405,
+                    else it was a search, which only fails on the _shard_doc sort (Elasticsearch 7.10 and 7.11)
+    """
+    if not isinstance(error, elasticsearch.exceptions.TransportError):
+        return False
+    if opening:
+        return error.status_code in (400, 405) and error.error != "index_not_found_exception"
+    return error.status_code == 400 and "_shard_doc" in str(error.info)
+
+
+def hits_total(response):
+    """
+    returns the total number of hits of a search response
+    """
+    total = response["hits"]["total"]
+    if isinstance(total, dict):  # Elasticsearch >= 7.0.0
+        total = total["value"]
+    return total
+
+
+class Paginator:
+    """
+    base class for the deep-paging engines
+    a paginator harvests all hits of one query body and yields them page by page as lists of raw hits
+    """
+    keep_alive = None
+
+    def __init__(self, es, index=None, doc_type=None, body=None, size=1000, keep_alive=None,
+                 slice_id=None, slice_max=None, pit_id=None, search_after=None, adaptive=None, progress=None, skip=0):
+        """
+        Creates a new Paginator Object
+        :param es: the elasticsearch.Elasticsearch() Object to use
+        :param index: Elasticsearch Index to use, optional
+        :param doc_type: Elasticsearch doc_type to use, optional
+        :param body: Query body to paginate, optional
+        :param size: pagesize to use, default is 1000
+        :param keep_alive: how long the cluster keeps the search context between two pages, optional
+        :param slice_id: the slice to harvest if the search gets split up into slices, optional
+        :param slice_max: the number of slices, optional
+        :param pit_id: an already opened point in time to use, only used by the PITPaginator, optional
+        :param search_after: sort values of the last hit already harvested to continue after, optional,
+                             only supported by the PITPaginator
+        :param adaptive: chunksize.AdaptiveChunksize() Object to take the pagesize from instead of size, optional
+        :param progress: progress.Progress() Object to report the total number of hits of the first response to, optional
+        :param skip: number of hits to skip before the first page, default is 0
+        """
+        self.es = es
+        self.index = index
+        self.doc_type = doc_type
+        self.body = dict(body or {})
+        self.size = size
+        if keep_alive:
+            self.keep_alive = keep_alive
+        if slice_max and slice_max > 1:
+            self.body["slice"] = {"id": slice_id, "max": slice_max}
+        self.pit_id = pit_id
+        self.search_after = search_after
+        self.adaptive = adaptive
+        if adaptive:
+            self.size = adaptive.size
+        self.progress = progress
+        self.skip = skip
+
+    def trim(self, hits):
+        """
+        drops the hits of a page which are still to be skipped, for paginators which can't skip on the cluster
+        """
+        if self.skip:
+            skipped = min(self.skip, len(hits))
+            self.skip -= skipped
+            hits = hits[skipped:]
+        return hits
+
+    def track_total(self, body):
+        """
+        lets the first request count all the hits for the progress, not just up to 10000
+        """
+        if self.progress:
+            body["track_total_hits"] = True
+        return body
+
+    def report_total(self, response):
+        """
+        reports the total number of hits of the first response to the progress
+        """
+        if self.progress:
+            self.progress.add_total(hits_total(response))
+
+    def pages(self):
+        """
+        generator yielding the hits page by page
+        """
+        raise NotImplementedError
+
+
+class ScrollPaginator(Paginator):
+    """
+    classic scroll, keeps one search context open on the cluster for the whole harvest
+    """
+    keep_alive = "12h"
+
+    def first_body(self):
+        """
+        returns the body of the initial search request
+        sorted by _doc, the fastest order, same as elasticsearch.helpers.scan does,
+        but a paginator skipping hits keeps the sort of the body, so it skips the same hits as a from/size request,
+        without _shard_doc which only works with a point in time
+        """
+        if self.search_after is not None:
+            raise ValueError("a scroll can't continue after search_after values")
+        body = dict(self.body)
+        sort = []
+        if self.skip:
+            sort = body.get("sort") or []
+            sort = [key for key in (sort if isinstance(sort, list) else [sort])
+                    if key != "_shard_doc" and not (isinstance(key, dict) and "_shard_doc" in key)]
+        body["sort"] = sort or "_doc"
+        return self.track_total(body)
+
+    @staticmethod
+    def check_shards(response):
+        """
+        raises a ScanError if not all the shards answered, same as elasticsearch.helpers.scan does
+        """
+        shards = response["_shards"]
+        if shards["successful"] + shards["skipped"] < shards["total"]:
+            raise elasticsearch.helpers.ScanError(response.get("_scroll_id"),
+                                                  "Scroll request has only succeeded on {} (+{} skipped) shards out of {}."
+                                                  .format(shards["successful"], shards["skipped"], shards["total"]))
+
+    def pages(self):
+        body = self.first_body()
+        response = self.es.search(index=self.index, doc_type=self.doc_type, body=body,
+                                  scroll=self.keep_alive, size=self.size)
+        self.report_total(response)
+        scroll_id = response.get("_scroll_id")
+        try:
+            while scroll_id and response["hits"]["hits"]:
+                self.check_shards(response)
+                hits = self.trim(response["hits"]["hits"])
+                if hits:
+                    yield hits
+                response = self.es.scroll(body={"scroll_id": scroll_id, "scroll": self.keep_alive})
+                scroll_id = response.get("_scroll_id")
+        finally:
+            if scroll_id:
+                self.es.clear_scroll(body={"scroll_id": [scroll_id]}, ignore=(404,))
+
+
+class PITPaginator(Paginator):
+    """
+    point in time + search_after, the search context only lives for keep_alive between two pages
+    falls back to the ScrollPaginator on clusters without point in time support (Elasticsearch < 7.12), see pit_unsupported()
+    """
+    keep_alive = "5m"
+    skip_size = 10000  # hits per request for skipping, the default max_result_window
+    scroll_class = ScrollPaginator  # to fall back to
+
+    def __init__(self, *args, fallback=True, **kwargs):
+        """
+        Creates a new PITPaginator Object, see Paginator
+        :param fallback: fall back to the ScrollPaginator if the cluster doesn't support point in time, default is True
+        """
+        super().__init__(*args, **kwargs)
+        self.fallback = fallback
+
+    @staticmethod
+    def open(es, index, keep_alive):
+        """
+        opens a new point in time and returns its id
+        """
+        return es.open_point_in_time(index=index or "_all", keep_alive=keep_alive)["id"]
+
+    @staticmethod
+    def close(es, pit_id):
+        """
+        closes the point in time, missing point in times are ignored
+        """
+        es.close_point_in_time(body={"id": pit_id}, ignore=(404,))
+
+    def first_body(self):
+        """
+        returns the body of the first search request, without the point in time
+        """
+        body = dict(self.body)
+        body.pop("search_after", None)
+        if self.search_after is not None:
+            body["search_after"] = self.search_after
+        if "sort" not in body:
+            body["sort"] = [{"_shard_doc": "asc"}]  # fastest order and an unique tiebreaker for search_after
+        body["size"] = self.size
+        return self.track_total(body)
+
+    def skip_body(self, body, size):
+        """
+        returns the body of a request for skipping size hits, which only returns their sort values
+        """
+        body = {key: value for key, value in body.items()
+                if key not in ("aggs", "aggregations", "highlight", "script_fields", "docvalue_fields", "fields")}
+        body.update(size=size, _source=False, stored_fields="_none_", track_total_hits=False)
+        return body
+
+    def skip_request(self, body):
+        """
+        skips up to skip_size of the hits to skip, moves the search_after of body behind them
+        returns False if the search has no hits left
+        """
+        size = min(self.skip, self.skip_size)
+        response = self.es.search(body=self.skip_body(body, size), filter_path="pit_id,hits.hits.sort")
+        return self.skipped(body, size, response)
+
+    def skipped(self, body, size, response):
+        hits = response.get("hits", {}).get("hits", [])
+        body["pit"] = {"id": response.get("pit_id", body["pit"]["id"]), "keep_alive": self.keep_alive}
+        if hits:
+            body["search_after"] = hits[-1]["sort"]
+        self.skip -= size
+        return len(hits) == size
+
+    def request(self, body):
+        """
+        searches the next page, with the current adaptive chunksize as size if set
+        returns the size used and the response
+        """
+        if not self.adaptive:
+            return self.size, self.es.search(body=body)
+        size, response, _ = self.adaptive.call(lambda size: self.es.search(body=dict(body, size=size)),
+                                               lambda response: response["hits"]["hits"])
+        return size, response
+
+    def fall_back(self, error, opening=False):
+        """
+        True if the harvest falls back to a scroll after the error, if it means the cluster doesn't support point in time
+        """
+        if not self.fallback or self.search_after is not None or not pit_unsupported(error, opening):
+            return False
+        helperscripts.eprint("point in time not supported by the cluster, falling back to scroll: {}".format(error))
+        return True
+
+    def scroll_paginator(self):
+        """
+        returns the ScrollPaginator to fall back to, for the hits still to skip
+        """
+        return self.scroll_class(self.es, self.index, self.doc_type, self.body, self.size,
+                                 progress=self.progress, skip=self.skip)
+
+    def pages(self):
+        body = self.first_body()
+        pit_id = self.pit_id
+        if not pit_id:
+            try:
+                pit_id = self.open(self.es, self.index, self.keep_alive)
+            except elasticsearch.exceptions.TransportError as e:
+                if not self.fall_back(e, opening=True):
+                    raise
+                for page in self.scroll_paginator().pages():
+                    yield page
+                return
+        body["pit"] = {"id": pit_id, "keep_alive": self.keep_alive}
+        more = True
+        try:
+            while self.skip and more:
+                more = self.skip_request(body)
+            if more:
+                size, response = self.request(body)
+        except elasticsearch.exceptions.TransportError as e:
+            if not self.pit_id:
+                self.close(self.es, body["pit"]["id"])
+            if not self.fall_back(e):
+                raise
+            for page in self.scroll_paginator().pages():
+                yield page
+            return
+        if not more:  # no hits left after the skipped ones
+            if not self.pit_id:
+                self.close(self.es, body["pit"]["id"])
+            return
+        pit_id = body["pit"]["id"]  # the skip requests can have changed it
+        self.report_total(response)
+        body["track_total_hits"] = False  # the next pages don't need to count the hits again
+        try:
+            while True:
+                pit_id = response.get("pit_id", pit_id)  # the id of the point in time can change between requests
+                hits = response["hits"]["hits"]
+                if hits:
+                    yield hits
+                if len(hits) < size:
+                    break
+                body["pit"] = {"id": pit_id, "keep_alive": self.keep_alive}
+                body["search_after"] = hits[-1]["sort"]
+                size, response = self.request(body)
+        finally:
+            if not self.pit_id:
+                self.close(self.es, pit_id)
+
+
+PAGINATORS = {"scroll": ScrollPaginator,
+              "pit": PITPaginator}
 
 
 class IDFile(ESGenerator):
@@ -142,36 +910,50 @@ class IDFile(ESGenerator):
     wrapper for esgenerator() to submit a list of ids or a file with ids
     to reduce the searchwindow on
     """
+    max_batch = 10000  # IDs per ids-filtered search of batched, the default max_result_window
     
-    def __init__(self,  idfile, missing_behaviour='print', **kwargs):
+    def __init__(self,  idfile, missing_behaviour='print', batched=False, max_memory_ids=1000000, **kwargs):
         """
         Creates a new IDFile Object
-        :param idfile: the path of the file containing the IDs or an iterable containing the IDs
+        :param idfile: the path of the file containing the IDs, '-' for STDIN, .gz files get decompressed,
+                       or an iterable containing the IDs
         :param missing_behaviour: What should we do with missing IDs? 'print' or 'yield' an dict containing the ID
+        :param batched: only used together with body: search all the IDs of a chunk with one ids-filtered query
+                        instead of one search per ID, default is False
+        :param max_memory_ids: number of IDs kept in memory for de-duplication, more IDs move into
+                               a temporary database on disk, default is 1000000
         """
+        if kwargs.get("passthrough"):
+            raise ValueError("passthrough is only supported by the ESGenerator")
         super().__init__(**kwargs)
         self.idfile = idfile  # string containing the path to the idfile, or an iterable containing all the IDs
-        self.ids = []  # an iterable containing all the IDs from idfile, going to be reduced during runtime
+        self.batched = batched
+        self.max_memory_ids = max_memory_ids
+        self.ids = iter(())  # the pending, de-duplicated IDs from idfile, read lazily chunk by chunk
         self.missing_behaviour = missing_behaviour # what to do with missing records? print or yield an dict containing the ID? default is print
         self.read_file()
 
     def read_file(self):
         """
         determining weather self.idfile is an iterable or a file,
-        harvests the IDs out of it and saves them in a set (for de-duplication)
+        the IDs get streamed out of it while harvesting and de-duplicated on the fly,
+        so the memory usage doesn't depend on the size of the idfile
         """
-        ids_set = set()
-        if isinstance(self.idfile, str) and helperscripts.isfile(self.idfile):
-            with open(self.idfile, "r") as inp:
-                for ppn in inp:
-                    ids_set.add(ppn.rstrip())
+        if isinstance(self.idfile, str) and (self.idfile == "-" or helperscripts.isfile(self.idfile)):
+            pass
         elif helperscripts.isiter(self.idfile) and not isinstance(self.idfile, str) and not helperscripts.isfile(self.idfile):
-            for ppn in self.idfile:
-                ids_set.add(ppn.rstrip())
+            pass
         else:
             raise AttributeError
-        self.iterable = list(ids_set)
-        self.ids = list(ids_set)
+        self.ids = idstore.unique(idstore.read_ids(self.idfile), self.max_memory_ids)
+
+    @property
+    def iterable(self):
+        """
+        list of all the de-duplicated IDs from idfile, kept for compatibility,
+        reads the whole idfile into memory, so it doesn't work with STDIN or an iterator which gets consumed
+        """
+        return list(idstore.unique(idstore.read_ids(self.idfile), self.max_memory_ids))
 
     def write_file(self, missing):
         """
@@ -192,58 +974,250 @@ class IDFile(ESGenerator):
         searching with an set of IDs can take quite long time
         better would be to reduce the set of documents to a pure idlist, this is quite fast over mget
         often, its needed to do it with a search, therefore both ways work
+        yields the records one by one, see iter_pages()
+        """
+        for page in self.iter_pages():
+            for record in page:
+                yield record
+
+    def iter_pages(self):
+        """
+        generator yielding the records chunk by chunk, as a list per chunk of IDs, see ESGenerator.iter_pages()
+        the missing IDs follow at the end, in lists of chunksize, if they get yielded
+        with prefetch, a background thread already gets the next chunks while the current one gets consumed
+        with parallel, a pool of threads gets several chunks at once
         """
-        missing = []  # an iterable containing missing ids
-        while len(self.ids) > 0:
-            if self.body:
-                ms = elasticsearch_dsl.MultiSearch(using=self.es, index=self.index, doc_type=self.type_)  # setting up MultiSearch
-                this_iter_ids = self.ids[:self.chunksize]  # an ID List per iteration, so we can check if all the IDs of this chunksize are found at the end.
-                for _id in this_iter_ids:  # add a search per ID
-                    ms = ms.add(elasticsearch_dsl.Search().source(excludes=self.source_excludes,
-                                                                  includes=self.source_includes).from_dict(self.body).query("match", _id=_id))
-                responses = ms.execute()
-                for response in responses:
-                    for hit in response:
-                        _id = hit.meta.to_dict()["id"]
-                        yield self.return_doc(hit)
-                        del self.ids[self.ids.index(_id)]
-                        del this_iter_ids[this_iter_ids.index(_id)]
-                for _id in this_iter_ids:
-                    """
-                    unfortunately MultiSearch doesn't throw an exception for non-Found-IDs, so we have manually check for missing ids
-                    so we again iterate over the helper_list with the IDs per chunk size (simply doing self.dis[:self.chunksize] would give us a new set)
-                    and we put all the IDs who are still in there in our missing list and delete them from self.ids and this_iter_ids
-                    """
-                    missing.append(_id)
-                    del self.ids[self.ids.index(_id)]
-                    del this_iter_ids[this_iter_ids.index(_id)]
+        with idstore.Spool() as missing:  # the missing ids, spooled to a temporary file
+            if self.parallel and self.parallel > 1:
+                chunks = self.parallel_chunks()
             else:
-                try:
-                    s = elasticsearch_dsl.Document.mget(docs=self.ids[:self.chunksize],
-                                                        using=self.es,
-                                                        index=self.index,
-                                                        _source_excludes=self.source_excludes,
-                                                        _source_includes=self.source_includes,
-                                                        _source=self.source,
-                                                        missing='raise')
-                except elasticsearch.exceptions.NotFoundError as e:
-                    for doc in e.info['docs']:  # we got some missing ids and harvest the missing ids from the Elasticsearch NotFoundError Exception
-                        missing.append(doc['_id'])
-                        del self.ids[self.ids.index(doc['_id'])]
-                else:  # only gets called if we don't run into an exception
-                    for hit in s:
-                        _id = hit.meta.to_dict()["id"]
-                        yield self.return_doc(hit)
-                        del self.ids[self.ids.index(_id)]
-            if not self.ids:
-                """
-                if we delete the last item from ids,
-                ids turns to None and then the while(len(list()))
-                would throw an exception, since None isn't an iterable
-                """
-                self.ids = []
-        for item in self.write_file(missing):
-            yield item
+                chunks = (self.get_chunk(ids) for ids in self.chunks())
+                if self.prefetch:
+                    chunks = threaded_merge([chunks], maxsize=self.prefetch)
+            if self.metrics:
+                chunks = self.metered(chunks, lambda item: len(item[0]))
+            for records, chunk_missing in chunks:
+                if records:
+                    yield records
+                missing.extend(chunk_missing)
+                if self.metrics:
+                    self.metrics.missing(len(chunk_missing))
+            items = self.write_file(missing)
+            while True:
+                page = list(itertools.islice(items, self.chunksize))
+                if not page:
+                    break
+                yield page
+        if self.metrics:
+            self.metrics.finish()
+
+    def chunks(self):
+        """
+        takes the pending IDs out of self.ids chunk by chunk,
+        yields every chunk as OrderedDict with the IDs as keys
+        with an adaptive chunksize, every chunk gets the size current at the time it's taken
+        """
+        while True:
+            size = self.adaptive.size if self.adaptive else self.chunksize
+            ids = collections.OrderedDict.fromkeys(itertools.islice(self.ids, size))
+            if not ids:
+                return
+            yield ids
+
+    def parallel_chunks(self):
+        """
+        gets up to parallel (+ prefetch) chunks concurrently on a thread pool,
+        yields the results of get_chunk() in the order of the chunks
+        the Elasticsearch client is thread-safe, so all the workers share its connection pool
+        """
+        pending = self.chunks()
+        futures = collections.deque()  # the chunks in flight, in order
+        with concurrent.futures.ThreadPoolExecutor(self.parallel) as pool:
+            try:
+                while True:
+                    for ids in itertools.islice(pending, self.parallel + (self.prefetch or 0) - len(futures)):
+                        futures.append(pool.submit(self.get_chunk, ids))
+                    if not futures:
+                        return
+                    yield futures.popleft().result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def get_chunk(self, ids):
+        """
+        gets the IDs of one chunk, returns a list of the records found and a list of the missing IDs
+        :param ids: OrderedDict with the IDs of the chunk as keys
+        """
+        if self.body:
+            if self.batched:
+                return self.search_result(ids, self.batch_search(ids))
+            return self.search_result(ids, self.multi_search(ids))
+        return self.mget_result(self.mget(ids))
+
+    def search_result(self, ids, hits):
+        """
+        returns the records and the missing IDs of a chunk searched with the query body
+        :param ids: OrderedDict with the IDs of the chunk as keys
+        :param hits: the raw hits of the searches
+        """
+        records = []
+        start = time.perf_counter()
+        for hit in hits:
+            records.append(self.return_raw_doc(hit))
+            ids.pop(hit["_id"], None)
+        if self.metrics:
+            self.metrics.doc(time.perf_counter() - start, len(records))
+        """
+        unfortunately searches don't throw an exception for non-Found-IDs, so we have manually check for missing ids
+        all the IDs of the chunk which are still in there are missing
+        """
+        return records, list(ids)
+
+    def mget_result(self, docs):
+        """
+        returns the records and the missing IDs of a chunk got via mget
+        :param docs: the raw docs of the mget response
+        """
+        records = []
+        missing = []
+        start = time.perf_counter()
+        for doc in docs:
+            if doc.get("found"):
+                records.append(self.return_raw_doc(doc, skip_empty=True))
+            else:
+                missing.append(doc["_id"])
+        if self.metrics:
+            self.metrics.doc(time.perf_counter() - start, len(records))
+        return records, missing
+
+    def mget(self, ids):
+        """
+        gets the IDs via mget, returns the raw docs of the response, found or not
+        :param ids: the IDs to get
+        """
+        if self.adaptive:
+            return self.adaptive_requests(ids, self.mget_request, self.mget_docs)
+        return self.mget_docs(self.mget_request(ids))
+
+    def mget_request(self, ids):
+        """
+        sends a mget request for the IDs, returns the response (an awaitable with the AsyncElasticsearch client)
+        """
+        return self.es.mget(body={"docs": [{"_id": _id} for _id in ids]},
+                            index=self.index,
+                            _source_excludes=self.source_excludes,
+                            _source_includes=self.source_includes,
+                            _source=self.source)
+
+    def adaptive_requests(self, ids, request, items):
+        """
+        sends the IDs of a chunk in parts of the adaptive chunksize, returns the hits/docs of all the responses
+        a chunk only gets split up if the chunksize got smaller while it was waiting, e.g. after a timeout
+        :param ids: the IDs of the chunk
+        :param request: function sending the request for a list of IDs, returns the response
+        :param items: function returning the list of hits/docs of a response
+        """
+        ids = list(ids)
+        result = []
+        while ids:
+            size, _, hits = self.adaptive.call(lambda size: request(ids[:size]), items)
+            result.extend(hits)
+            ids = ids[size:]
+        return result
+
+    @staticmethod
+    def mget_docs(response):
+        """
+        returns the raw docs of a mget response, raises a RequestError for docs which couldn't be get
+        """
+        error_docs = [doc for doc in response["docs"] if doc.get("error")]
+        if error_docs:  # same behaviour as elasticsearch_dsl.Document.mget()
+            raise elasticsearch.exceptions.RequestError(400, "Required routing not provided for documents {}."
+                                                             .format(", ".join(doc["_id"] for doc in error_docs)), error_docs)
+        return response["docs"]
+
+    def multi_search(self, ids):
+        """
+        searches the IDs with the query body, one search per ID bundled into one MultiSearch
+        returns the raw hits of all the searches
+        :param ids: the IDs to search for
+        """
+        if self.adaptive:
+            return self.adaptive_requests(ids, self.multi_search_request,
+                                          lambda response: list(self.multi_search_hits(response["responses"])))
+        return self.multi_search_hits(self.multi_search_request(ids)["responses"])
+
+    def multi_search_request(self, ids):
+        """
+        sends a MultiSearch request for the IDs, returns the response (an awaitable with the AsyncElasticsearch client)
+        """
+        return self.es.msearch(body=self.multi_search_body(ids), index=self.index, doc_type=self.type_)
+
+    def multi_search_body(self, ids):
+        """
+        returns the body of a MultiSearch with one search per ID
+        """
+        body = []
+        for _id in ids:  # add a search per ID
+            body.append({})
+            body.append(elasticsearch_dsl.Search().source(excludes=self.source_excludes,
+                                                          includes=self.source_includes).from_dict(self.body).query("match", _id=_id).to_dict())
+        return body
+
+    @staticmethod
+    def multi_search_hits(responses):
+        """
+        yields the raw hits of all the responses of a MultiSearch, raises a TransportError for failed searches
+        """
+        for response in responses:
+            if response.get("error", False):  # same behaviour as elasticsearch_dsl.MultiSearch.execute()
+                raise elasticsearch.exceptions.TransportError("N/A", response["error"]["type"], response["error"])
+            for hit in response["hits"]["hits"]:
+                yield hit
+
+    def batch_search(self, ids):
+        """
+        searches the IDs with the query body, with an ids filter, in searches of at most max_batch IDs
+        returns the raw hits of the searches
+        :param ids: the IDs to search for
+        """
+        ids = list(ids)
+        hits = []
+        for start in range(0, len(ids), self.max_batch):
+            hits.extend(self.batch_request(ids[start:start + self.max_batch]))
+        return hits
+
+    def batch_request(self, ids):
+        """
+        searches the IDs with the query body, all of them in one search with an ids filter, see batch_search()
+        returns the raw hits of the search
+        :param ids: the IDs to search for
+        """
+        s = self.search().filter("ids", values=ids)
+        # count all the hits, by default hits.total stops at 10000 and the rest would go unnoticed
+        response = self.es.search(index=self.index, doc_type=self.type_,
+                                  body=s[:len(ids)].extra(track_total_hits=True).to_dict())
+        hits = response["hits"]["hits"]
+        if hits_total(response) > len(hits):
+            # the same ID can exist in several indices, so we have to get the rest of the hits via a plain scroll
+            for page in self.get_paginator(self.rest_body(s, hits), paginator=ScrollPaginator, progress=None).pages():
+                hits.extend(page)
+        return hits
+
+    @staticmethod
+    def rest_body(s, hits):
+        """
+        returns the query body of the search for the hits not received yet, the received ones are excluded per index
+        :param s: the elasticsearch_dsl.Search of the IDs
+        :param hits: the hits already received
+        """
+        received = collections.defaultdict(list)
+        for hit in hits:
+            received[hit["_index"]].append(hit["_id"])
+        return s.filter("bool", must_not=[elasticsearch_dsl.Q("bool", filter=[elasticsearch_dsl.Q("term", _index=index),
+                                                                             elasticsearch_dsl.Q("ids", values=ids)])
+                                          for index, ids in received.items()]).to_dict()
 
 
 class IDFileConsume(IDFile):
@@ -258,24 +1232,27 @@ class IDFileConsume(IDFile):
 
     def read_file(self):
         """
-        no more iterables here, only files
+        no more iterables or STDIN here, only files
         """
-        ids_set = set()
-        with open(self.idfile, "r") as inp:
-            for ppn in inp:
-                ids_set.add(ppn.rstrip())
-        self.ids = list(ids_set)
+        if not helperscripts.isfile(self.idfile):
+            raise FileNotFoundError("idfile {} not found".format(self.idfile))
+        super().read_file()
 
     def write_file(self, missing):
         """
         overwriting write_file so this outputs a idfile of the consume generator with the missing ids
+        the new idfile gets written next to the old one and replaces it atomically when it's complete,
+        .gz idfiles stay compressed
         if no IDs are missing, that file gets deleted
         """
         if missing:
-            with open(self.idfile, "w") as outp:
+            tmp = "{}.tmp".format(self.idfile)
+            with idstore.open_idfile(tmp, "wt", compressed=self.idfile.endswith(".gz")) as outp:
                 for item in missing:
                     print(item, file=outp)
-                    if self.missing_behaviour == 'yield':
-                        yield {"_id": item, 'found': False}
+            os.replace(tmp, self.idfile)
+            if self.missing_behaviour == 'yield':
+                for item in missing:
+                    yield {"_id": item, 'found': False}
         else:  # no ids missing in the cluster? alright, we clean up
             os.remove(self.idfile)
@@ -1,7 +1,6 @@
 import json
 import sys
 import os
-from httplib2 import Http  # needed for put_dict
 from argparse import ArgumentTypeError
 
 
@@ -59,6 +58,22 @@ def str2bool(v):
         raise ArgumentTypeError('Boolean value expected.')
 
 
+def size2bytes(v):
+    """
+    parses a size like 1000, 500KB, 1.5GB or 2G into a number of bytes, for argparse
+    """
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    number = v.strip().upper().rstrip("B")
+    unit = number[-1:] if number[-1:] in units else ""
+    try:
+        size = int(float(number[:len(number) - len(unit)]) * units[unit])
+    except ValueError:
+        raise ArgumentTypeError('Size like 1000, 500KB or 1.5GB expected.')
+    if size <= 0:
+        raise ArgumentTypeError('Size must be positive.')
+    return size
+
+
 def isint(num):
     '''
     check if num is a int without throwing an exception
@@ -111,6 +126,7 @@ def put_dict(url, dictionary):
     Pass the whole dictionary as a json body to the url.
     Make sure to use a new Http object each time for thread safety.
     """
+    from httplib2 import Http  # not imported with the module, it's slow and only needed here
     http_obj = Http()
     resp, content = http_obj.request(
         uri=url,
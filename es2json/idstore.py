@@ -0,0 +1,144 @@
+import sys
+import gzip
+import sqlite3
+import tempfile
+
+
+def open_idfile(path, mode="rt", compressed=None):
+    """
+    opens an idfile as text file
+    :param path: path of the idfile, '-' means STDIN for reading and STDOUT for writing
+    :param mode: 'rt' for reading or 'wt' for writing, default is 'rt'
+    :param compressed: use gzip, default is True for paths ending with .gz
+    """
+    if path == "-":
+        stream = sys.stdin if "r" in mode else sys.stdout
+        return open(stream.fileno(), mode, closefd=False)  # closing it doesn't close STDIN/STDOUT
+    if compressed is None:
+        compressed = path.endswith(".gz")
+    if compressed:
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def read_ids(source):
+    """
+    yields the IDs of an idfile or an iterable one by one, empty lines are skipped
+    :param source: path of the idfile (see open_idfile()) or an iterable containing the IDs
+    """
+    if isinstance(source, str):
+        with open_idfile(source) as inp:
+            for line in inp:
+                line = line.rstrip()
+                if line:
+                    yield line
+    else:
+        for item in source:
+            item = item.rstrip()
+            if item:
+                yield item
+
+
+def unique(items, max_memory=1000000):
+    """
+    yields every item of the iterable only once, in the order of their first appearance
+    :param items: iterable of strings
+    :param max_memory: number of items kept in memory before they move into a temporary database, see IDSet
+    """
+    seen = IDSet(max_memory)
+    try:
+        for item in items:
+            if seen.add(item):
+                yield item
+    finally:
+        seen.close()
+
+
+class IDSet:
+    """
+    set of strings for de-duplicating IDs
+    once it holds more than max_memory items, everything moves into a private temporary SQLite database on disk,
+    so the memory usage stays bounded however big the idfile is
+    """
+    def __init__(self, max_memory=1000000):
+        """
+        Creates a new IDSet Object
+        :param max_memory: number of items kept in a python set before moving to the database, default is 1000000
+        """
+        self.max_memory = max_memory
+        self.memory = set()
+        self.db = None
+
+    def add(self, item):
+        """
+        adds the item, returns True if it is new and False if it was already in the set
+        """
+        if self.db is not None:
+            return self.db.execute("INSERT OR IGNORE INTO ids VALUES (?)", (item,)).rowcount == 1
+        if item in self.memory:
+            return False
+        self.memory.add(item)
+        if len(self.memory) > self.max_memory:
+            self.spill()
+        return True
+
+    def __contains__(self, item):
+        if self.db is not None:
+            return self.db.execute("SELECT 1 FROM ids WHERE id = ?", (item,)).fetchone() is not None
+        return item in self.memory
+
+    def spill(self):
+        """
+        moves the items from memory into the database
+        an empty filename gives a private on-disk database, which SQLite deletes on close
+        the set may get filled and read from different threads, but never concurrently
+        """
+        self.db = sqlite3.connect("", check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=OFF")
+        self.db.execute("PRAGMA synchronous=OFF")
+        self.db.execute("CREATE TABLE ids (id TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.db.executemany("INSERT INTO ids VALUES (?)", ((item,) for item in self.memory))
+        self.memory = set()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        self.memory = set()
+
+
+class Spool:
+    """
+    append-only list of strings which lives in a temporary file instead of the memory, e.g. for missing IDs
+    iterate over it only after all the items were appended
+    """
+    def __init__(self):
+        self.file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.length = 0
+
+    def append(self, item):
+        self.file.write(item)
+        self.file.write("\n")
+        self.length += 1
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        self.file.flush()
+        self.file.seek(0)
+        for line in self.file:
+            yield line[:-1]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, doc_, value, traceback):
+        self.close()
@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import threading
+import elasticsearch
+try:
+    from elasticsearch import AIOHttpConnection
+except ImportError:  # optional, only with aiohttp installed
+    AIOHttpConnection = None
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RETRY_STATUS = (502, 503, 504)  # default retry_on_status of elasticsearch.Transport
+
+
+class Metrics:
+    """
+    collects the metrics of a harvest, the generators and the MetricsConnection call the hooks
+    every hook calls the callbacks as callback(event, data) with the event name and a dict of its values:
+        'request' - one HTTP request: url, seconds, bytes, status
+        'retry'   - a failed HTTP request the transport retries: url, seconds, error
+        'page'    - one page/chunk got fetched: size (number of hits), seconds waited for it
+        'missing' - IDs of an idfile were not found: count
+        'done'    - the harvest is complete: the dict of to_dict()
+    """
+    def __init__(self, callbacks=None):
+        """
+        Creates a new Metrics Object
+        :param callbacks: list of functions to call for every event, optional
+        """
+        self.callbacks = list(callbacks or [])
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.end = None
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)  # non-cumulative counts, the last bucket is +Inf
+        self.bytes_received = 0
+        self.retries = 0
+        self.pages = 0
+        self.hits = 0
+        self.wait_seconds = 0.0
+        self.docs = 0
+        self.return_doc_seconds = 0.0
+        self.missing_ids = 0
+
+    def emit(self, event, data):
+        for callback in self.callbacks:
+            callback(event, data)
+
+    def request(self, url, seconds, size, status=200):
+        """
+        hook for every HTTP request, called by MetricsConnection
+        """
+        with self.lock:
+            self.requests += 1
+            self.request_seconds += seconds
+            self.bytes_received += size
+            for n, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.latency_buckets[n] += 1
+                    break
+        if self.callbacks:
+            self.emit("request", {"url": url, "seconds": seconds, "bytes": size, "status": status})
+
+    def retry(self, url, seconds, error):
+        """
+        hook for every failed HTTP request the transport is going to retry, called by MetricsConnection
+        """
+        with self.lock:
+            self.retries += 1
+        if self.callbacks:
+            self.emit("retry", {"url": url, "seconds": seconds, "error": repr(error)})
+
+    def page(self, size, seconds=0.0):
+        """
+        hook for every page/chunk the generator got, with the time the generator waited for it
+        """
+        with self.lock:
+            self.pages += 1
+            self.hits += size
+            self.wait_seconds += seconds
+        if self.callbacks:
+            self.emit("page", {"size": size, "seconds": seconds})
+
+    def doc(self, seconds, count=1):
+        """
+        hook for the records built by return_doc, with the time it took
+        """
+        with self.lock:
+            self.docs += count
+            self.return_doc_seconds += seconds
+
+    def missing(self, count):
+        """
+        hook for IDs of an idfile which were not found
+        """
+        if not count:
+            return
+        with self.lock:
+            self.missing_ids += count
+        if self.callbacks:
+            self.emit("missing", {"count": count})
+
+    def finish(self):
+        """
+        marks the harvest as complete
+        """
+        self.end = time.monotonic()
+        if self.callbacks:
+            self.emit("done", self.to_dict())
+
+    @property
+    def elapsed(self):
+        return (self.end or time.monotonic()) - self.start
+
+    def to_dict(self):
+        """
+        returns all the metrics as JSON-serializable dict
+        """
+        with self.lock:
+            elapsed = self.elapsed
+            buckets = {}
+            count = 0
+            for bound, n in zip(LATENCY_BUCKETS, self.latency_buckets):
+                count += n
+                buckets[str(bound)] = count
+            buckets["+Inf"] = self.requests
+            return {"elapsed_seconds": elapsed,
+                    "requests": self.requests,
+                    "request_seconds": self.request_seconds,
+                    "request_latency_buckets": buckets,
+                    "bytes_received": self.bytes_received,
+                    "retries": self.retries,
+                    "pages": self.pages,
+                    "hits": self.hits,
+                    "average_page_size": self.hits / self.pages if self.pages else 0.0,
+                    "wait_seconds": self.wait_seconds,
+                    "docs": self.docs,
+                    "docs_per_second": self.docs / elapsed if elapsed else 0.0,
+                    "return_doc_seconds": self.return_doc_seconds,
+                    "missing_ids": self.missing_ids,
+                    "done": self.end is not None}
+
+    def prometheus(self, prefix="es2json"):
+        """
+        returns all the metrics in the Prometheus text format, e.g. for the textfile collector of the node exporter
+        """
+        metrics = self.to_dict()
+        lines = []
+
+        def add(name, kind, helptext, value, labels=""):
+            lines.append("# HELP {}_{} {}".format(prefix, name, helptext))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            lines.append("{}_{}{} {}".format(prefix, name, labels, value))
+
+        add("elapsed_seconds", "gauge", "Seconds since the harvest started.", metrics["elapsed_seconds"])
+        lines.append("# HELP {}_request_duration_seconds Latency of the HTTP requests to Elasticsearch.".format(prefix))
+        lines.append("# TYPE {}_request_duration_seconds histogram".format(prefix))
+        for bound, count in metrics["request_latency_buckets"].items():
+            lines.append('{}_request_duration_seconds_bucket{{le="{}"}} {}'.format(prefix, bound, count))
+        lines.append("{}_request_duration_seconds_sum {}".format(prefix, metrics["request_seconds"]))
+        lines.append("{}_request_duration_seconds_count {}".format(prefix, metrics["requests"]))
+        add("response_bytes_total", "counter", "Size of the response bodies received from Elasticsearch.", metrics["bytes_received"])
+        add("retries_total", "counter", "Failed HTTP requests which got retried.", metrics["retries"])
+        add("pages_total", "counter", "Pages/chunks fetched.", metrics["pages"])
+        add("hits_total", "counter", "Hits of all the pages/chunks fetched.", metrics["hits"])
+        add("wait_seconds_total", "counter", "Seconds the generator waited for pages/chunks.", metrics["wait_seconds"])
+        add("docs_total", "counter", "Records returned by the generator.", metrics["docs"])
+        add("docs_per_second", "gauge", "Records returned per second.", metrics["docs_per_second"])
+        add("return_doc_seconds_total", "counter", "Seconds spent in return_doc.", metrics["return_doc_seconds"])
+        add("missing_ids_total", "counter", "IDs of the idfile not found.", metrics["missing_ids"])
+        add("done", "gauge", "1 if the harvest is complete.", int(metrics["done"]))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        writes the metrics atomically into the file path, as JSON for .json files, else in the Prometheus text format
+        """
+        tmp = "{}.tmp".format(path)
+        with open(tmp, "w") as outp:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), outp, indent=2)
+            else:
+                outp.write(self.prometheus())
+        os.replace(tmp, path)
+
+
+def is_retried(error):
+    """
+    True if elasticsearch.Transport retries a request failing with this error
+    """
+    if isinstance(error, elasticsearch.exceptions.ConnectionError):
+        return True
+    return isinstance(error, elasticsearch.exceptions.TransportError) and error.status_code in RETRY_STATUS
+
+
+def response_size(data):
+    """
+    returns the size of the response body in bytes, a decoded one gets encoded the same way the connection decoded it
+    """
+    if not data:
+        return 0
+    if isinstance(data, bytes) or data.isascii():
+        return len(data)
+    return len(data.encode("utf-8", "surrogatepass"))
+
+
+class MetricsConnection(elasticsearch.Urllib3HttpConnection):
+    """
+    the default connection of the elasticsearch client, reporting the latency, size and retries of every request to a Metrics Object
+    """
+    def __init__(self, *args, metrics=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+        start = time.perf_counter()
+        try:
+            status, headers, data = super().perform_request(method, url, params, body, timeout, ignore, headers)
+        except Exception as e:
+            if is_retried(e):
+                self.metrics.retry(url, time.perf_counter() - start, e)
+            raise
+        self.metrics.request(url, time.perf_counter() - start, response_size(data), status)
+        return status, headers, data
+
+
+if AIOHttpConnection:
+    class AsyncMetricsConnection(AIOHttpConnection):
+        """
+        async version of MetricsConnection
+        """
+        def __init__(self, *args, metrics=None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.metrics = metrics
+
+        async def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+            start = time.perf_counter()
+            try:
+                status, headers, data = await super().perform_request(method, url, params, body, timeout, ignore, headers)
+            except Exception as e:
+                if is_retried(e):
+                    self.metrics.retry(url, time.perf_counter() - start, e)
+                raise
+            self.metrics.request(url, time.perf_counter() - start, response_size(data), status)
+            return status, headers, data
+else:
+    AsyncMetricsConnection = None
@@ -1,4 +1,4 @@
-from es2json import *
+from es2json.es2json import ESGenerator, IDFile, IDFileConsume
 
 """
 wrapper functions for deprecated es2json API calls
@@ -43,9 +43,8 @@ def esgenerator(**kwargs):
 
 def esfatgenerator(**kwargs):
     """
-    HIGHLY DEPRECATED !!! do not use !!!
-    this is an workaround function for the old esfatgenerator
-    the performance-boost was an illusion
+    DEPRECATED, use ESGenerator.iter_batches()
+    workaround function for the old esfatgenerator, yields the records in lists of chunksize records
     only kept in here to not break old python tools
     """
     for k, v in _map_args.items():
@@ -54,12 +53,6 @@ def esfatgenerator(**kwargs):
     kwargs["headless"] = False
     if not kwargs.get("chunksize"):
         kwargs["chunksize"] = 1000
-    chunks = []
     with ESGenerator(**kwargs) as generator:
-        for record in generator.generator():
-            chunks.append(record)
-            if len(chunks) == kwargs["chunksize"]:
-                yield chunks
-                chunks = []
-    if chunks:
-        yield chunks
+        for batch in generator.iter_batches():
+            yield batch
@@ -0,0 +1,507 @@
+import io
+import os
+import sys
+import json
+import zlib
+import queue
+import itertools
+import threading
+import collections
+import concurrent.futures
+try:
+    import orjson
+except ImportError:  # optional, faster encoder
+    orjson = None
+try:
+    import zstandard
+except ImportError:  # optional, needed for .zst output
+    zstandard = None
+
+
+ENCODERS = ("json", "orjson", "auto")
+
+
+def get_encoder(name="json", indent=None):
+    """
+    returns a function which encodes one record to one line of UTF-8 encoded bytes (without the newline)
+    :param name: the encoder backend: 'json' (python stdlib, default), 'orjson' or 'auto' (orjson if installed)
+                 the stdlib output is byte-identical to json.dumps(), orjson writes compact, non-ASCII-escaped JSON
+    :param indent: indentation for pretty printing, orjson only supports an indentation of 2
+    """
+    if name not in ENCODERS:
+        raise ValueError("unknown encoder {}, use one of {}".format(name, ", ".join(ENCODERS)))
+    if name == "auto":
+        name = "orjson" if orjson and indent in (None, 2) else "json"
+    encoder = json.JSONEncoder(indent=indent)
+    if name == "json":
+        def encode(record):
+            return encoder.encode(record).encode("utf-8")
+        return encode
+    if not orjson:
+        raise ImportError("encoder 'orjson' needs the orjson package: pip install orjson")
+    if indent not in (None, 2):
+        raise ValueError("encoder 'orjson' only supports an indentation of 2")
+    option = orjson.OPT_INDENT_2 if indent else 0
+
+    def encode(record):
+        try:
+            return orjson.dumps(record, option=option)
+        except TypeError:  # e.g. integers > 64 bit, the stdlib can encode those
+            return encoder.encode(record).encode("utf-8")
+    return encode
+
+
+class NDJSONWriter:
+    """
+    buffered writer for line-delimited JSON
+    collects the encoded lines and writes them batch-wise, e.g. page by page,
+    so we don't need a print() call and a write syscall per record
+    """
+    def __init__(self, fileobj=None, encoder="json", indent=None, batchsize=1000):
+        """
+        Creates a new NDJSONWriter Object
+        :param fileobj: binary file object to write to, default is sys.stdout.buffer
+        :param encoder: name of the encoder backend, see get_encoder(), default is 'json'
+        :param indent: indentation for pretty printing, optional
+        :param batchsize: number of lines to collect before writing them, default is 1000
+        """
+        if fileobj is None:
+            sys.stdout.flush()  # don't mix up the order with anything already printed
+            fileobj = getattr(sys.stdout, "buffer", sys.stdout)
+        self.fileobj = fileobj
+        self.text = isinstance(fileobj, io.TextIOBase)
+        self.encode = get_encoder(encoder, indent)
+        self.batchsize = batchsize
+        self.lines = []
+
+    def write(self, record):
+        """
+        encodes and buffers one record, bytes are taken as already encoded JSON, e.g. from ESGenerator(passthrough=True)
+        """
+        self.lines.append(record if isinstance(record, bytes) else self.encode(record))
+        if len(self.lines) >= self.batchsize:
+            self.flush()
+
+    def write_all(self, records):
+        """
+        writes all the records of an iterable, e.g. ESGenerator.generator()
+        """
+        for record in records:
+            self.write(record)
+        self.flush()
+
+    def flush(self):
+        """
+        writes the buffered lines to the file object
+        """
+        if self.lines:
+            self.lines.append(b"")
+            data = b"\n".join(self.lines)
+            self.lines = []
+            self.fileobj.write(data.decode("utf-8") if self.text else data)
+        self.fileobj.flush()
+
+    def sync(self):
+        """
+        writes the buffered lines and makes sure the file object has written out everything it got so far,
+        e.g. a BlockCompressor compresses its buffered rest
+        """
+        self.flush()
+        if hasattr(self.fileobj, "sync"):
+            self.fileobj.sync()
+
+    def tell(self):
+        """
+        position in the file object, only meaningful after sync()
+        """
+        return self.fileobj.tell()
+
+    def close(self):
+        """
+        writes the rest of the buffered lines, the file object stays open
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, doc_, value, traceback):
+        self.close()
+
+
+PARTITIONS = ("roundrobin", "_id")
+
+
+def partitioner(partition, shards, headless=False):
+    """
+    returns a function which returns the number of the shard a record goes to
+    :param partition: 'roundrobin', '_id' (hash of the _id), the name of a field of the _source to hash,
+                      dotted for fields in objects, e.g. 'author.name', or a function returning the value to hash for a record
+    :param shards: number of shards
+    :param headless: the records are only the _source, default is False
+    the hash is crc32, not hash(), so the same value goes to the same shard in every run
+    """
+    if partition == "roundrobin":
+        counter = itertools.count()
+
+        def shard(record):
+            return next(counter) % shards
+        return shard
+    if partition == "_id":
+        if headless:
+            raise ValueError("partitioning by _id needs the metadata, it doesn't work with headless records")
+
+        def key(record):
+            return record["_id"]
+    elif callable(partition):
+        key = partition
+    else:
+        path = partition.split(".")
+
+        def key(record):
+            value = record if headless else record.get("_source", {})
+            for name in path:
+                value = value.get(name) if isinstance(value, dict) else None
+            return value
+
+    def shard(record):
+        if isinstance(record, bytes):  # already encoded, e.g. a passthrough record, we need the value
+            record = json.loads(record)
+        value = key(record)
+        if not isinstance(value, str):
+            value = json.dumps(value, sort_keys=True)
+        return zlib.crc32(value.encode("utf-8")) % shards
+    return shard
+
+
+def shard_path(path, shard, part=None):
+    """
+    returns the path of a shard of the output path
+    'dump.ldj.gz' → 'dump-00003.ldj.gz' for the shard 3, or 'dump-00003-00001.ldj.gz' for its part 1 when rolling,
+    paths with {shard} and {part} placeholders get formatted instead, e.g. 'dump/part-{shard:05d}-{part}.ldj'
+    """
+    if "{shard" in path:
+        return path.format(shard=shard, part=part or 0)
+    root, extension = os.path.splitext(path)
+    if extension in COMPRESSIONS:
+        root, inner = os.path.splitext(root)
+        extension = inner + extension
+    root = "{}-{:05d}".format(root, shard)
+    if part is not None:
+        root = "{}-{:05d}".format(root, part)
+    return root + extension
+
+
+class ShardWriter(threading.Thread):
+    """
+    writer thread of one shard of a PartitionedWriter, encodes, (compresses) and writes the batches of records it gets
+    rolls over into a new part file after roll_size bytes (uncompressed) or roll_count records
+    """
+    def __init__(self, path, shard, encoder="json", indent=None, roll_size=None, roll_count=None, maxsize=4, **kwargs):
+        """
+        Creates a new ShardWriter Object
+        :param path: the output path, see shard_path()
+        :param shard: number of the shard
+        :param encoder: name of the encoder backend, see get_encoder(), default is 'json'
+        :param indent: indentation for pretty printing, optional
+        :param roll_size: start a new part file after this many bytes, optional
+        :param roll_count: start a new part file after this many records, optional
+        :param maxsize: number of batches queued before the producer has to wait, default is 4
+        :param kwargs: additional arguments for open_output()
+        """
+        super().__init__(daemon=True)
+        self.path = path
+        self.shard = shard
+        self.encode = get_encoder(encoder, indent)
+        self.roll_size = roll_size
+        self.roll_count = roll_count
+        self.kwargs = kwargs
+        self.batches = queue.Queue(maxsize)
+        self.error = None
+        self.paths = []  # the files written so far
+        self.fileobj = None
+
+    def put(self, batch):
+        """
+        hands over a batch of records, None closes the shard, re-raises errors of the thread
+        """
+        while self.error is None:
+            try:
+                self.batches.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise self.error
+
+    def open(self):
+        part = len(self.paths) if self.roll_size or self.roll_count else None
+        path = shard_path(self.path, self.shard, part)
+        self.paths.append(path)
+        self.fileobj = open_output(path, **self.kwargs)
+        self.size = self.count = 0
+
+    def roll(self, lines):
+        """
+        writes the lines and closes the current part
+        """
+        self.fileobj.write(b"".join(lines))
+        self.fileobj.close()
+        self.fileobj = None
+
+    def run(self):
+        try:
+            self.open()  # every shard gets a file, even without records
+            while True:
+                batch = self.batches.get()
+                if batch is None:
+                    break
+                lines = []
+                for record in batch:
+                    if self.fileobj is None:
+                        self.open()
+                    line = (record if isinstance(record, bytes) else self.encode(record)) + b"\n"
+                    lines.append(line)
+                    self.size += len(line)
+                    self.count += 1
+                    if (self.roll_size and self.size >= self.roll_size) or (self.roll_count and self.count >= self.roll_count):
+                        self.roll(lines)
+                        lines = []
+                if lines:
+                    self.fileobj.write(b"".join(lines))
+                    self.fileobj.flush()
+            if self.fileobj:
+                self.fileobj.close()
+        except Exception as e:
+            self.error = e
+            while True:  # unblock the producer
+                try:
+                    self.batches.get_nowait()
+                except queue.Empty:
+                    break
+
+
+class PartitionedWriter:
+    """
+    writes line-delimited JSON into several shard files at once, e.g. as input for Spark or multiprocessing jobs
+    the records get partitioned round-robin or by a hash of the _id or of a field,
+    every shard has its own writer thread, which also compresses .gz/.zst shards
+    usable like an NDJSONWriter: PartitionedWriter("dump.ldj.gz", 4).write_all(ESGenerator(...).generator())
+    """
+    def __init__(self, path, shards, partition="roundrobin", headless=False, encoder="json", indent=None, batchsize=1000,
+                 roll_size=None, roll_count=None, threads=None, **kwargs):
+        """
+        Creates a new PartitionedWriter Object
+        :param path: the output path, the shards get the number appended, see shard_path()
+        :param shards: number of shards
+        :param partition: 'roundrobin' (default), '_id', a field of the _source or a function, see partitioner()
+        :param headless: the records are only the _source, default is False
+        :param encoder: name of the encoder backend, see get_encoder(), default is 'json'
+        :param indent: indentation for pretty printing, optional
+        :param batchsize: number of records handed over to a writer thread at once, default is 1000
+        :param roll_size: start a new part file of a shard after this many bytes (uncompressed), optional
+        :param roll_count: start a new part file of a shard after this many records, optional
+        :param threads: number of compression threads per shard, default is the number of CPUs divided by the shards
+        :param kwargs: additional arguments for open_output()
+        """
+        self.partition = partitioner(partition, shards, headless)
+        self.batchsize = batchsize
+        threads = threads or max(1, (os.cpu_count() or 1) // shards)
+        self.shards = [ShardWriter(path, shard, encoder, indent, roll_size, roll_count, threads=threads, **kwargs)
+                       for shard in range(shards)]
+        self.batches = [[] for _ in range(shards)]
+        for shard in self.shards:
+            shard.start()
+
+    def write(self, record):
+        """
+        hands the record over to the writer thread of its shard, batch-wise
+        """
+        shard = self.partition(record)
+        batch = self.batches[shard]
+        batch.append(record)
+        if len(batch) >= self.batchsize:
+            self.shards[shard].put(batch)
+            self.batches[shard] = []
+
+    def write_all(self, records):
+        """
+        writes all the records of an iterable, e.g. ESGenerator.generator(), and closes the shards
+        """
+        for record in records:
+            self.write(record)
+        self.close()
+
+    def flush(self):
+        """
+        hands over the pending records of every shard
+        """
+        for shard, batch in zip(self.shards, self.batches):
+            if batch:
+                shard.put(batch)
+        self.batches = [[] for _ in self.shards]
+
+    @property
+    def paths(self):
+        """
+        all the files written so far
+        """
+        return [path for shard in self.shards for path in shard.paths]
+
+    def close(self):
+        """
+        writes the rest, closes all the shard files and stops the writer threads, re-raises errors of the threads
+        """
+        if not self.batches:
+            return
+        self.flush()
+        self.batches = None
+        for shard in self.shards:
+            try:
+                shard.put(None)
+            except Exception:
+                pass  # raised below, after all the other shards are closed
+        for shard in self.shards:
+            shard.join()
+        for shard in self.shards:
+            if shard.error:
+                raise shard.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, doc_, value, traceback):
+        self.close()
+
+
+def gzip_compress(data, level=6):
+    """
+    compresses data into one complete gzip member
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 → gzip header and trailer
+    return compressor.compress(data) + compressor.flush()
+
+
+def zstd_compress(data, level=3):
+    """
+    compresses data into one complete zstd frame
+    """
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+COMPRESSIONS = {".gz": (gzip_compress, 6),
+                ".zst": (zstd_compress, 3)}
+
+
+class BlockCompressor:
+    """
+    binary file object which compresses everything written to it in independent blocks on a thread pool
+    every block becomes a complete gzip member/zstd frame, and concatenated gzip members/zstd frames
+    are still one valid gzip/zstd stream, so e.g. zcat or zstdcat can read the output as usual
+    """
+    def __init__(self, fileobj, compress=gzip_compress, level=None, blocksize=4*1024*1024, threads=None):
+        """
+        Creates a new BlockCompressor Object
+        :param fileobj: binary file object to write the compressed blocks to
+        :param compress: function compressing one block, default is gzip_compress
+        :param level: compression level, default is the default of the compress function
+        :param blocksize: uncompressed size of a block, default is 4 MiB
+        :param threads: number of compression threads, default is the number of CPUs
+        """
+        self.fileobj = fileobj
+        self.compress = compress
+        self.level = level
+        self.blocksize = blocksize
+        self.threads = threads or os.cpu_count() or 1
+        self.pool = concurrent.futures.ThreadPoolExecutor(self.threads)
+        self.pending = collections.deque()  # futures of the compressed blocks, in output order
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.blocksize:
+            block = bytes(self.buffer[:self.blocksize])
+            del self.buffer[:self.blocksize]
+            self.submit(block)
+        return len(data)
+
+    def submit(self, block):
+        """
+        compresses the block in the background, writes out finished blocks
+        while more than two blocks per thread are pending to keep memory bounded
+        """
+        if self.level is None:
+            self.pending.append(self.pool.submit(self.compress, block))
+        else:
+            self.pending.append(self.pool.submit(self.compress, block, self.level))
+        while len(self.pending) > 2 * self.threads:
+            self.fileobj.write(self.pending.popleft().result())
+
+    def flush(self):
+        """
+        writes out all the compressed blocks which are already complete,
+        the uncompressed rest stays buffered, so small writes don't end up in tiny blocks
+        """
+        while self.pending and self.pending[0].done():
+            self.fileobj.write(self.pending.popleft().result())
+        self.fileobj.flush()
+
+    def sync(self):
+        """
+        compresses the buffered rest as a block of its own and writes out everything,
+        afterwards the file contains a complete stream of all the data written so far
+        """
+        if self.buffer:
+            self.submit(bytes(self.buffer))
+            self.buffer = bytearray()
+        while self.pending:
+            self.fileobj.write(self.pending.popleft().result())
+        self.fileobj.flush()
+
+    def tell(self):
+        """
+        position in the compressed file, only meaningful after sync()
+        """
+        return self.fileobj.tell()
+
+    def close(self):
+        self.sync()
+        self.pool.shutdown()
+        self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, doc_, value, traceback):
+        self.close()
+
+
+def open_output(path, mode="wb", level=None, threads=None, blocksize=4*1024*1024):
+    """
+    opens a binary output file, files ending with .gz or .zst get compressed in parallel by a BlockCompressor
+    :param path: path of the output file
+    :param mode: 'wb' to (over)write or 'ab' to append, default is 'wb'
+    :param level: compression level, optional
+    :param threads: number of compression threads, default is the number of CPUs
+    :param blocksize: uncompressed size of a compressed block, default is 4 MiB
+    """
+    extension = os.path.splitext(path)[1]
+    if extension not in COMPRESSIONS:
+        return open(path, mode)
+    compress, default_level = COMPRESSIONS[extension]
+    if compress is zstd_compress and not zstandard:
+        raise ImportError("writing .zst files needs the zstandard package: pip install zstandard")
+    return BlockCompressor(open(path, mode), compress, level or default_level, blocksize, threads)
+
+
+def dump(records, path, encoder="json", indent=None, batchsize=1000, **kwargs):
+    """
+    writes the records of an iterable, e.g. ESGenerator.generator(), as line-delimited JSON into the file path
+    :param records: iterable of records
+    :param path: path of the output file, .gz or .zst files get compressed
+    :param encoder: name of the encoder backend, see get_encoder(), default is 'json'
+    :param indent: indentation for pretty printing, optional
+    :param batchsize: number of lines to collect before writing them, default is 1000
+    :param kwargs: additional arguments for open_output()
+    """
+    with open_output(path, **kwargs) as fileobj:
+        NDJSONWriter(fileobj, encoder, indent, batchsize).write_all(records)
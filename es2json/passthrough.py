@@ -0,0 +1,82 @@
+import re
+import copy
+import json
+from elasticsearch.serializer import Deserializer, JSONSerializer
+from elasticsearch.exceptions import SerializationError
+
+
+SOURCE_KEY = '"_source"'
+KEY_END = re.compile(r"\s*:\s*")
+DECODER = json.JSONDecoder()
+
+
+def loads_raw_sources(text):
+    """
+    decodes a JSON response of Elasticsearch, but keeps every _source object as the raw JSON text,
+    so the (possibly big) documents don't have to be encoded again for the output
+    outside of the _source objects, a '"_source"' followed by a colon can only be the key, since quotes in strings
+    are escaped, so we just have to search for it
+    the C decoder of the json module finds the end of a _source faster than any scanning in python could,
+    so every _source still gets decoded once, the decoded value gets dropped
+    the whole response is held in memory as one str, next to the raw texts of the sources
+    """
+    parts = []
+    sources = []
+    pos = last = 0
+    while True:
+        key = text.find(SOURCE_KEY, pos)
+        if key == -1:
+            break
+        pos = key + len(SOURCE_KEY)
+        colon = KEY_END.match(text, pos)
+        if colon and text.startswith("{", colon.end()):
+            start = colon.end()
+            pos = DECODER.raw_decode(text, start)[1]
+            parts.append(text[last:start])
+            parts.append(str(len(sources)))  # placeholder, replaced by the raw text after decoding
+            sources.append(text[start:pos])
+            last = pos
+    if not sources:
+        return json.loads(text)
+    parts.append(text[last:])
+
+    def object_hook(obj):
+        if type(obj.get("_source")) is int:  # not bool
+            obj["_source"] = sources[obj["_source"]]
+        return obj
+    return json.loads("".join(parts), object_hook=object_hook)
+
+
+class RawSourceSerializer(JSONSerializer):
+    """
+    JSONSerializer which keeps the _source objects as raw JSON text, see loads_raw_sources()
+    """
+    def loads(self, s):
+        try:
+            return loads_raw_sources(s)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(s, e)
+
+
+def raw_client(es):
+    """
+    returns a copy of the elasticsearch.Elasticsearch() client which shares its connections, retries and settings,
+    but the responses of its searches keep the _source of every hit as raw JSON text
+    """
+    client = copy.copy(es)
+    client.transport = copy.copy(es.transport)
+    serializers = dict(es.transport.deserializer.serializers)
+    serializers[JSONSerializer.mimetype] = RawSourceSerializer()
+    client.transport.deserializer = Deserializer(serializers)
+    return client
+
+
+def raw_line(source):
+    """
+    returns the raw JSON text of a _source as one line of UTF-8 encoded bytes
+    Elasticsearch returns the _source exactly as it got indexed, so pretty printed documents can contain line breaks,
+    which can only be whitespace in valid JSON
+    """
+    if "\n" in source or "\r" in source:
+        source = source.replace("\r", " ").replace("\n", " ")
+    return source.encode("utf-8", "surrogatepass")  # the same way the connection decoded it
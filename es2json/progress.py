@@ -0,0 +1,74 @@
+import time
+import threading
+import es2json.helperscripts as helperscripts
+
+
+def format_duration(seconds):
+    """
+    formats seconds for humans, e.g. 1h02m03s, 4m05s or 6s
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "{}h{:02d}m{:02d}s".format(hours, minutes, seconds)
+    if minutes:
+        return "{}m{:02d}s".format(minutes, seconds)
+    return "{}s".format(seconds)
+
+
+class Progress:
+    """
+    progress of a harvest on /dev/stderr: records done of the total, throughput and ETA
+    the total isn't counted with an extra request, the paginators add up the hits.total of their first responses,
+    one per slice, so it can be unknown ('?') or still growing at the start of a parallel harvest
+    """
+    def __init__(self, every=1000, resumed=0):
+        """
+        Creates a new Progress Object
+        :param every: print the progress every that many records, default is 1000
+        :param resumed: records already harvested by an interrupted run, default is 0
+        """
+        self.every = every
+        self.count = resumed
+        self.resumed = resumed
+        self.total = None
+        self.reported = None
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add_total(self, total):
+        """
+        adds the total number of hits of a paginator/slice
+        """
+        with self.lock:
+            self.total = (self.total or 0) + total
+
+    def update(self, count):
+        """
+        sets the number of records done, prints the progress every every records and when the total is reached
+        """
+        previous, self.count = self.count, count
+        if count // self.every > previous // self.every or count == self.total:
+            self.report()
+
+    def finish(self):
+        """
+        prints the final progress if the last update didn't
+        """
+        if self.reported != self.count:
+            self.report()
+
+    def report(self):
+        self.reported = self.count
+        helperscripts.eprint(self.line())
+
+    def line(self):
+        """
+        returns the progress as text, e.g. '20000/50000 4000 docs/s ETA 7s'
+        """
+        elapsed = time.perf_counter() - self.start
+        rate = (self.count - self.resumed) / elapsed if elapsed > 0 else 0.0
+        text = "{}/{} {:.0f} docs/s".format(self.count, "?" if self.total is None else self.total, rate)
+        if self.total and rate and self.count < self.total:
+            text += " ETA {}".format(format_duration((self.total - self.count) / rate))
+        return text
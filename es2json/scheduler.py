@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import threading
+import concurrent.futures
+import es2json.helperscripts as helperscripts
+import es2json.output as output
+from es2json.es2json import ESGenerator
+
+
+def resolve_indices(es, indices):
+    """
+    resolves index names and wildcards into the open indices of the cluster, largest first
+    returns a list of (index, size in bytes, number of docs) tuples
+    :param es: the elasticsearch.Elasticsearch() Object to use
+    :param indices: list of index names/wildcards or a comma separated string of them, e.g. 'logs-*,users'
+    """
+    if not isinstance(indices, str):
+        indices = ",".join(indices)
+    rows = es.cat.indices(index=indices, format="json", bytes="b", h="index,docs.count,store.size", expand_wildcards="open")
+    result = [(row["index"], int(row.get("store.size") or 0), int(row.get("docs.count") or 0)) for row in rows]
+    return sorted(result, key=lambda row: (-row[1], -row[2], row[0]))
+
+
+def tag_index(record, index):
+    """
+    adds the _index to a headless record, also to the JSON bytes of a passthrough record
+    """
+    if isinstance(record, bytes):
+        tag = '{{"_index":{}'.format(json.dumps(index)).encode("utf-8")
+        rest = record[1:].lstrip()
+        return tag + (b"" if rest.startswith(b"}") else b",") + rest
+    if "_index" in record:
+        return record
+    tagged = {"_index": index}
+    tagged.update(record)
+    return tagged
+
+
+class MultiIndexExport:
+    """
+    exports a list of indices or wildcards concurrently, every index into its own output file
+    the indices get resolved via _cat/indices and the largest ones are started first, so they don't end up as the long tail
+    at most concurrency indices are exported at once, all of them share one Elasticsearch client
+    """
+    def __init__(self, indices, output_path, concurrency=4, tag=False,
+                 host='localhost', port=9200, es=None, timeout=10, encoder="json", indent=None, verbose=True, **kwargs):
+        """
+        Creates a new MultiIndexExport Object
+        :param indices: list of index names/wildcards or a comma separated string of them, e.g. 'logs-*,users'
+        :param output_path: path of the output files with an {index} placeholder, e.g. 'backup/{index}.ldj.gz',
+                            .gz and .zst files get compressed
+        :param concurrency: number of indices exported at once, default is 4
+        :param tag: add the _index to headless records, default is False
+        :param host: Elasticsearch host to use, default is localhost, can be several hosts, see ESGenerator
+        :param port: Elasticsearch port to use for the hosts without one, default is 9200
+        :param es: Don't use the host/port/timeout setting, use your own elasticsearch.Elasticsearch() Object
+        :param timeout: Elasticsearch timeout parameter, default is 10 (seconds)
+        :param encoder: name of the JSON encoder backend, see output.get_encoder(), default is 'json'
+        :param indent: indentation for pretty printing, optional
+        :param verbose: print out the progress per index on /dev/stderr, default is True
+        :param kwargs: additional arguments for the generators, e.g. body, headless, paginator or parallel
+        """
+        if "{index}" not in output_path:
+            raise ValueError("the output path needs an {index} placeholder")
+        if kwargs.get("checkpoint") or kwargs.get("index") or kwargs.get("id_"):
+            raise ValueError("checkpoint, index and id_ don't work with a MultiIndexExport")
+        self.indices = indices
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.tag = tag
+        self.encoder = encoder
+        self.indent = indent
+        self.verbose = verbose
+        self.kwargs = kwargs
+        if not es:
+            # a client like the generators create it, with a connection pool big enough for all the concurrent exports
+            es = ESGenerator(host=host, port=port, timeout=timeout, verbose=False, metrics=kwargs.get("metrics"),
+                             parallel=concurrency * (kwargs.get("parallel") or 1), adaptive=kwargs.get("adaptive"),
+                             sniff=kwargs.get("sniff"), maxsize=kwargs.get("maxsize")).es
+        self.es = es
+        self.lock = threading.Lock()
+        self.done = 0
+
+    def export_index(self, index):
+        """
+        exports one index into its output file, returns the number of records
+        the file gets written under a temporary name and renamed when it's complete, so a failed export leaves no partial file
+        """
+        path = self.output_path.format(index=index)
+        root, extension = os.path.splitext(path)
+        tmp = "{}.part{}".format(root, extension)  # same extension, for the compression
+        start = time.perf_counter()
+        count = 0
+        generator = ESGenerator(es=self.es, index=index, verbose=False, **self.kwargs)
+        fileobj = output.open_output(tmp)
+        try:
+            with output.NDJSONWriter(fileobj, encoder=self.encoder, indent=self.indent) as writer:
+                for record in generator.generator():
+                    writer.write(tag_index(record, index) if self.tag else record)
+                    count += 1
+        except BaseException:
+            fileobj.close()
+            os.remove(tmp)
+            raise
+        fileobj.close()
+        os.replace(tmp, path)
+        with self.lock:
+            self.done += 1
+            if self.verbose:
+                helperscripts.eprint("{}: {} records in {:.1f}s ({}/{} indices done)"
+                                     .format(index, count, time.perf_counter() - start, self.done, self.total))
+        return count
+
+    def run(self):
+        """
+        exports all the indices, returns a dict of index → number of records
+        a failing index doesn't stop the others, if any failed, a RuntimeError gets raised after all the others are done
+        """
+        indices = [row[0] for row in resolve_indices(self.es, self.indices)]
+        self.total = len(indices)
+        results = {}
+        errors = {}
+        with concurrent.futures.ThreadPoolExecutor(self.concurrency) as pool:
+            futures = {pool.submit(self.export_index, index): index for index in indices}  # largest first
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    errors[index] = e
+                    helperscripts.eprint("{}: export failed: {!r}".format(index, e))
+        if errors:
+            raise RuntimeError("export of {} of {} indices failed: {}".format(len(errors), len(indices), ", ".join(sorted(errors))))
+        return results
@@ -0,0 +1,225 @@
+import os
+import importlib
+import itertools
+import collections
+import concurrent.futures
+import es2json.helperscripts as helperscripts
+import es2json.output as output
+
+
+MISSING = object()
+
+
+def get_path(record, path):
+    """
+    returns the value of a dotted path, e.g. '_source.author.name', MISSING if it isn't there
+    """
+    value = record
+    for name in path.split("."):
+        if not isinstance(value, dict) or name not in value:
+            return MISSING
+        value = value[name]
+    return value
+
+
+def set_path(record, path, value):
+    """
+    sets the value of a dotted path, missing objects on the way get created
+    """
+    names = path.split(".")
+    for name in names[:-1]:
+        record = record.setdefault(name, {})
+    record[names[-1]] = value
+
+
+def drop_path(record, path):
+    """
+    removes the field of a dotted path if it's there
+    """
+    names = path.split(".")
+    parent = get_path(record, ".".join(names[:-1])) if len(names) > 1 else record
+    if isinstance(parent, dict):
+        parent.pop(names[-1], None)
+
+
+def flatten(record, separator=".", prefix=""):
+    """
+    flattens nested objects into one level, the keys get joined by separator, e.g. {"a": {"b": 1}} → {"a.b": 1}
+    lists stay as they are
+    """
+    result = {}
+    for key, value in record.items():
+        if isinstance(value, dict) and value:
+            result.update(flatten(value, separator, prefix + key + separator))
+        else:
+            result[prefix + key] = value
+    return result
+
+
+class Projection:
+    """
+    declarative transform of a record, configured by a spec dict (e.g. from a JSON file), applied in this order:
+        "where":   {"path": value or [values], ...} only keep the records with one of the values, drop the others
+        "drop":    ["path", ...] remove these fields
+        "select":  {"name": "path", ...} only keep these fields, renamed to name (dotted names create objects)
+        "flatten": "." flatten nested objects into keys joined by the separator
+    paths are dotted, e.g. "_source.author.name" or just "author.name" for headless records
+    """
+    KEYS = ("where", "drop", "select", "flatten")
+
+    def __init__(self, spec):
+        """
+        Creates a new Projection Object
+        :param spec: the spec dict, see above
+        """
+        unknown = set(spec) - set(self.KEYS)
+        if unknown:
+            raise ValueError("unknown keys {} in the projection spec, use {}".format(", ".join(sorted(unknown)),
+                                                                                    ", ".join(self.KEYS)))
+        self.where = {path: value if isinstance(value, list) else [value] for path, value in spec.get("where", {}).items()}
+        self.drop = spec.get("drop", [])
+        self.select = spec.get("select")
+        separator = spec.get("flatten")
+        self.separator = "." if separator is True else separator
+
+    def __call__(self, record):
+        for path, values in self.where.items():
+            if get_path(record, path) not in values:
+                return None
+        for path in self.drop:
+            drop_path(record, path)
+        if self.select is not None:
+            selected = {}
+            for name, path in self.select.items():
+                value = get_path(record, path)
+                if value is not MISSING:
+                    set_path(selected, name, value)
+            record = selected
+        if self.separator:
+            record = flatten(record, self.separator)
+        return record
+
+
+class Pipeline:
+    """
+    applies transforms one after another, a transform returning None drops the record
+    """
+    def __init__(self, transforms):
+        """
+        Creates a new Pipeline Object
+        :param transforms: a callable, a projection spec dict or a list of them, see load_transform()
+        """
+        if callable(transforms) or isinstance(transforms, dict):
+            transforms = [transforms]
+        self.transforms = [Projection(transform) if isinstance(transform, dict) else transform for transform in transforms]
+
+    def __call__(self, record):
+        for transform in self.transforms:
+            record = transform(record)
+            if record is None:
+                return None
+        return record
+
+
+def load_transform(spec):
+    """
+    returns the transform for a spec of the cmdline tool:
+    'module:function' for a python function, e.g. 'mytransforms:rename_fields' (the module has to be importable),
+    or a projection spec as JSON string or JSON file, see Projection
+    """
+    if helperscripts.isfile(spec) or spec.lstrip().startswith("{"):
+        return Projection(helperscripts.jsonstring_or_file(spec))
+    module, _, name = spec.partition(":")
+    if not module or not name:
+        raise ValueError("invalid transform {}, use module:function or a JSON projection spec".format(spec))
+    return getattr(importlib.import_module(module), name)
+
+
+_encoders = {}
+
+
+def apply_batch(pipeline, batch, encoder=None, indent=None):
+    """
+    transforms a batch of records, in a worker process, and drops the records filtered out
+    if encoder is set, the records get encoded to JSON lines there as well, so the main process only has to write them
+    """
+    records = [record for record in map(pipeline, batch) if record is not None]
+    if not encoder:
+        return records
+    if (encoder, indent) not in _encoders:
+        _encoders[encoder, indent] = output.get_encoder(encoder, indent)
+    encode = _encoders[encoder, indent]
+    return [encode(record) for record in records]
+
+
+def ready():
+    """
+    does nothing, for starting the workers of a process pool
+    """
+
+
+class Transformer:
+    """
+    runs a transform pipeline over the records of a generator, e.g. ESGenerator.generator(), batch by batch in a
+    process pool, so the transforms run in parallel to the harvest and to each other
+    the workers can encode the transformed records to JSON too, so they only get serialized once more for the pool
+    """
+    def __init__(self, transforms, processes=None, ordered=True, batchsize=1000, encoder=None, indent=None):
+        """
+        Creates a new Transformer Object
+        :param transforms: a callable, a projection spec dict or a list of them, applied one after another,
+                           a callable returns the transformed record or None to drop it,
+                           it has to be picklable for the process pool, e.g. a function of a module, no lambda
+        :param processes: number of worker processes, default is the number of CPUs, 0 transforms in this process
+        :param ordered: keep the order of the records, default is True, else the batches are yielded as they're done
+        :param batchsize: number of records per batch, e.g. the chunksize, default is 1000
+        :param encoder: name of an encoder backend (see output.get_encoder()) to encode the records in the workers,
+                        the transformed records are yielded as JSON bytes then, e.g. for output.NDJSONWriter, optional
+        :param indent: indentation for pretty printing the encoded records, optional
+        """
+        self.pipeline = Pipeline(transforms)
+        self.processes = os.cpu_count() if processes is None else processes
+        self.ordered = ordered
+        self.batchsize = batchsize
+        self.encoder = encoder
+        self.indent = indent
+        if encoder:
+            output.get_encoder(encoder, indent)  # fail now on a wrong encoder, not in a worker
+
+    def transform(self, records):
+        """
+        generator yielding the transformed records of the iterable records
+        """
+        records = iter(records)
+        batches = iter(lambda: list(itertools.islice(records, self.batchsize)), [])
+        if not self.processes:
+            for batch in batches:
+                yield from apply_batch(self.pipeline, batch, self.encoder, self.indent)
+            return
+        pool = concurrent.futures.ProcessPoolExecutor(self.processes)
+        pending = collections.deque()
+        try:
+            pool.submit(ready).result()  # start the workers before the harvest starts its threads
+            for batch in batches:
+                pending.append(pool.submit(apply_batch, self.pipeline, batch, self.encoder, self.indent))
+                while len(pending) >= 2 * self.processes:  # enough to keep the workers busy, limits the memory
+                    for result in self.completed(pending):
+                        yield from result
+            while pending:
+                for result in self.completed(pending):
+                    yield from result
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown()
+
+    def completed(self, pending):
+        """
+        removes and returns the results of the next batches done, the oldest one if ordered
+        """
+        if self.ordered:
+            return [pending.popleft().result()]
+        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+        return [future.result() for future in done]
@@ -25,7 +25,13 @@ setup(name='es2json',
           'elasticsearch_dsl>=7.0.0,<8.0.0',
           'httplib2>=0.17.0'
       ],
-      python_requires=">=3.5,<4",
+      extras_require={
+          'orjson': ['orjson>=3.0.0'],
+          'zstd': ['zstandard>=0.13.0'],
+          'async': ['aiohttp>=3,<4'],
+          'parquet': ['pyarrow>=8.0.0']
+      },
+      python_requires=">=3.7,<4",
       entry_points={
           "console_scripts": ["es2json=es2json.cli:run"]
           }
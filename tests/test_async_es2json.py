@@ -0,0 +1,197 @@
+import es2json
+import asyncio
+import pytest
+import elasticsearch
+import uuid
+import os
+from copy import deepcopy
+from generate_testdata import MAX
+from test_es2json_esfunctions import default_kwargs, call_object, fake_es
+
+
+def collect(object, **kwargs):
+    """
+    help function which runs the async generator of the Object and returns all its records
+    """
+    async def run():
+        async with object(**kwargs) as es:
+            return [record async for record in es.generator()]
+    return asyncio.run(run())
+
+
+def by_id(records):
+    for record in records:
+        record.pop("sort", None)  # depends on the paginator, we don't care about the sort parameter in these tests
+    return sorted(records, key=lambda k: (k["_id"], k.get("found", True)))
+
+
+def test_async_esgenerator():
+    """
+    AsyncESGenerator test, we test if we get back the same records as from the ESGenerator
+    with every paginator and with and without slices
+    """
+    expected_records = by_id(list(call_object(es2json.ESGenerator, **default_kwargs)))
+    assert len(expected_records) == MAX
+    for paginator in ("scroll", "pit"):
+        for parallel in (None, 4):
+            records = collect(es2json.AsyncESGenerator, paginator=paginator, parallel=parallel, chunksize=100, **default_kwargs)
+            assert by_id(records) == expected_records
+
+
+def test_async_deep_slice():
+    for slize in (slice(5, 20), slice(250, 730, 3)):
+        records = collect(es2json.AsyncESGenerator, slice_=slize, chunksize=100, **default_kwargs)
+        assert records == list(call_object(es2json.ESGenerator, slice_=slize, chunksize=100, **default_kwargs))
+
+
+def test_async_deep_slice_big_chunksize():
+    """
+    AsyncESGenerator test with a chunksize above max_result_window, see test_esgenerator_deep_slice_big_chunksize
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test": fake_es.make_docs(12000)}))
+    kwargs = dict(default_kwargs, port=server.server_address[1], body={"sort": [{"foo": "desc"}]}, chunksize=20000)
+    try:
+        records = collect(es2json.AsyncESGenerator, slice_=slice(500, 11000, 3), **kwargs)
+        assert [record["_id"] for record in records] == [str(11999 - n) for n in range(500, 11000, 3)]
+    finally:
+        server.shutdown()
+
+
+def test_async_deep_slice_scroll_fallback():
+    """
+    without point in time support, the scroll of a deep slice keeps the sort, see test_esgenerator_deep_slice_scroll_fallback
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test": fake_es.make_docs(500)}, pit=False))
+    kwargs = dict(default_kwargs, port=server.server_address[1], body={"sort": [{"foo": "desc"}]},
+                  slice_=slice(250, 400), chunksize=50)
+    try:
+        records = collect(es2json.AsyncESGenerator, **kwargs)
+        assert [record["_id"] for record in records] == [str(n) for n in range(249, 99, -1)]
+    finally:
+        server.shutdown()
+
+
+def test_async_pit_fallback(capsys):
+    """
+    only a cluster without point in time support makes the AsyncPITPaginator fall back, see test_pit_fallback
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test": fake_es.make_docs(50)}, pit=False))
+    try:
+        records = collect(es2json.AsyncESGenerator, **dict(default_kwargs, port=server.server_address[1], paginator="pit"))
+        assert len(records) == 50
+        assert "falling back to scroll" in capsys.readouterr().err
+    finally:
+        server.shutdown()
+    with pytest.raises(elasticsearch.exceptions.NotFoundError):
+        collect(es2json.AsyncESGenerator, **dict(default_kwargs, index="missing", paginator="pit"))
+    assert "falling back" not in capsys.readouterr().err
+
+
+def test_async_esgenerator_get_document():
+    kwargs = deepcopy(default_kwargs)
+    kwargs["id_"] = "7"
+    assert collect(es2json.AsyncESGenerator, **kwargs) == list(call_object(es2json.ESGenerator, **kwargs))
+
+
+def test_async_idfile_missing_ids_yield():
+    """
+    AsyncIDFile test, we test if we get the same found records and missing IDs as from the IDFile,
+    with mget and with query bodies
+    """
+    ids = [str(n) for n in range(MAX-300, MAX+200)]
+    query = {"query": {"prefix": {"baz.keyword": "test9"}}}
+    for kwargs in ({}, {"body": query}, {"body": query, "batched": True}):
+        expected_records = by_id(list(call_object(es2json.IDFile, idfile=ids, missing_behaviour='yield', chunksize=100,
+                                                  **kwargs, **default_kwargs)))
+        records = collect(es2json.AsyncIDFile, idfile=ids, missing_behaviour='yield', chunksize=100, parallel=3,
+                          **kwargs, **default_kwargs)
+        assert by_id(records) == expected_records
+
+
+def test_async_idfile_batched_max_result_window():
+    """
+    AsyncIDFile test in batched mode with chunks bigger than the max_result_window of the cluster
+    """
+    class SmallBatches(es2json.AsyncIDFile):
+        max_batch = 100
+
+    server = fake_es.serve(fake_es.FakeCluster({"test": fake_es.make_docs(500)}, max_result_window=100))
+    ids = [str(n) for n in range(0, 600)]
+    try:
+        records = collect(SmallBatches, idfile=ids, body={"query": {"prefix": {"baz.keyword": "test1"}}}, batched=True,
+                          chunksize=300, parallel=2, missing_behaviour='yield',
+                          **dict(default_kwargs, port=server.server_address[1]))
+    finally:
+        server.shutdown()
+    found = [record["_id"] for record in records if record.get("found") is not False]
+    assert sorted(found) == sorted(id_ for id_ in ids if id_.startswith("1") and int(id_) < 500)
+    assert len(records) == 600
+
+
+def test_async_idfile_batched_several_indices():
+    """
+    AsyncIDFile test in batched mode with IDs which exist in several indices, every hit has to come once
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test1": fake_es.make_docs(300), "test2": fake_es.make_docs(300)}))
+    try:
+        records = collect(es2json.AsyncIDFile, idfile=[str(n) for n in range(200, 400)], body={"query": {"match_all": {}}},
+                          batched=True, chunksize=50, parallel=2, missing_behaviour='yield',
+                          **dict(default_kwargs, index="test1,test2", port=server.server_address[1]))
+    finally:
+        server.shutdown()
+    assert sorted((record["_index"], record["_id"]) for record in records if record.get("found") is not False) == \
+        [(index, str(n)) for index in ("test1", "test2") for n in range(200, 300)]
+
+
+def test_async_idfile_batched_capped_total():
+    """
+    AsyncIDFile test in batched mode with more hits than the cluster counts by default (hits.total with relation gte)
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test1": fake_es.make_docs(300), "test2": fake_es.make_docs(300)},
+                                               track_total_hits=50))
+    try:
+        records = collect(es2json.AsyncIDFile, idfile=[str(n) for n in range(200, 300)], body={"query": {"match_all": {}}},
+                          batched=True, chunksize=50, parallel=2,
+                          **dict(default_kwargs, index="test1,test2", port=server.server_address[1]))
+    finally:
+        server.shutdown()
+    assert sorted((record["_index"], record["_id"]) for record in records) == \
+        [(index, str(n)) for index in ("test1", "test2") for n in range(200, 300)]
+
+
+def test_async_adaptive():
+    """
+    AsyncESGenerator and AsyncIDFile test with an adaptive chunksize
+    """
+    expected_records = by_id(list(call_object(es2json.ESGenerator, **default_kwargs)))
+    records = collect(es2json.AsyncESGenerator, paginator="pit", adaptive="20kb", chunksize=10, **default_kwargs)
+    assert by_id(records) == expected_records
+    ids = [str(n) for n in range(MAX-300, MAX+200)]
+    expected_records = by_id(list(call_object(es2json.IDFile, idfile=ids, missing_behaviour='yield', **default_kwargs)))
+    records = collect(es2json.AsyncIDFile, idfile=ids, missing_behaviour='yield', adaptive="5kb", chunksize=20, parallel=3,
+                      **default_kwargs)
+    assert by_id(records) == expected_records
+
+
+def test_async_idfileconsume_missing_ids():
+    """
+    AsyncIDFileConsume test, the idfile has to contain exactly the missing IDs afterwards
+    """
+    fd = str(uuid.uuid4())
+    with open(fd, "w") as outp:
+        for n in range(MAX-100, MAX+200):
+            print(n, file=outp)
+    records = collect(es2json.AsyncIDFileConsume, idfile=fd, headless=True, chunksize=50, parallel=4, **default_kwargs)
+    assert sorted(record["foo"] for record in records) == list(range(MAX-100, MAX))
+    with open(fd, "r") as inp:
+        assert [line.rstrip() for line in inp] == [str(n) for n in range(MAX, MAX+200)]
+    os.remove(fd)
+
+
+def test_async_iter_batches():
+    async def run():
+        async with es2json.AsyncESGenerator(chunksize=100, parallel=3, **default_kwargs) as es:
+            return [batch async for batch in es.iter_batches(size=300)]
+    batches = asyncio.run(run())
+    assert [len(batch) for batch in batches] == [300] * (MAX // 300) + ([MAX % 300] if MAX % 300 else [])
+    assert sorted(record["_id"] for batch in batches for record in batch) == sorted(str(n) for n in range(MAX))
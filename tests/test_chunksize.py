@@ -0,0 +1,90 @@
+import elasticsearch
+import es2json
+import pytest
+
+
+def test_from_target():
+    assert es2json.AdaptiveChunksize.from_target("5MB").target_bytes == 5 * 1024 ** 2
+    assert es2json.AdaptiveChunksize.from_target("512kb").target_bytes == 512 * 1024
+    assert es2json.AdaptiveChunksize.from_target("2s").target_seconds == 2
+    assert es2json.AdaptiveChunksize.from_target("500ms", initial=50).target_seconds == 0.5
+    for target in ("5", "fast", "2h"):
+        with pytest.raises(ValueError):
+            es2json.AdaptiveChunksize.from_target(target)
+    with pytest.raises(ValueError):
+        es2json.AdaptiveChunksize()
+
+
+def test_update_target_bytes():
+    """
+    the size grows at most by step per page and settles at the target size
+    """
+    adaptive = es2json.AdaptiveChunksize(target_bytes=100000, initial=100)
+    hits = [{"_id": str(n), "_source": {"data": "x" * 80}} for n in range(100)]
+    adaptive.update(hits, 0.01)
+    assert adaptive.size == 200
+    for _ in range(5):
+        adaptive.update(hits, 0.01)
+    doc_bytes = adaptive.doc_bytes
+    assert adaptive.size == int(100000 / doc_bytes)
+    hits = [{"_id": str(n), "_source": {"data": "x" * 8000}} for n in range(100)]  # much bigger docs
+    for _ in range(5):
+        adaptive.update(hits, 0.01)
+    assert adaptive.size < 100000 / doc_bytes / 10
+
+
+def test_update_target_seconds():
+    adaptive = es2json.AdaptiveChunksize(target_seconds=1.0, initial=1000, minimum=10)
+    hits = [{"_id": str(n)} for n in range(1000)]
+    for _ in range(5):
+        adaptive.update(hits, 5.0)
+    assert adaptive.size == 200
+    for _ in range(5):
+        adaptive.update(hits, 100.0)
+    assert adaptive.size == 10
+
+
+def test_call_backoff():
+    """
+    timeouts and rejections get retried with half the size, other errors are raised
+    the size never grows back to a size which failed
+    """
+    adaptive = es2json.AdaptiveChunksize(target_bytes=10 ** 9, initial=800, minimum=100)
+    sizes = []
+
+    def request(size):
+        sizes.append(size)
+        if size >= 400:
+            if len(sizes) == 1:
+                raise elasticsearch.exceptions.ConnectionTimeout("TIMEOUT", "timed out", None)
+            raise elasticsearch.exceptions.TransportError(429, "circuit_breaking_exception", {})
+        return [{"_id": str(n)} for n in range(size)]
+
+    size, response, hits = adaptive.call(request, lambda response: response)
+    assert sizes == [800, 400, 200]
+    assert size == len(hits) == 200
+    assert adaptive.backoffs == 2
+    for _ in range(5):
+        adaptive.call(request, lambda response: response)
+    assert adaptive.size == 399
+
+    def missing_index(size):
+        raise elasticsearch.exceptions.NotFoundError(404, "index_not_found_exception", {})
+
+    with pytest.raises(elasticsearch.exceptions.NotFoundError):
+        adaptive.call(missing_index, lambda response: response)
+    assert adaptive.backoffs == 2
+
+
+def test_adaptive_timeout_retries():
+    """
+    the client of an adaptive generator keeps retrying timeouts, except for the requests of AdaptiveChunksize.call(),
+    those get retried with a smaller size instead
+    """
+    es = es2json.ESGenerator(host="localhost", adaptive="5MB", verbose=False)
+    transport = es.es.transport
+    assert transport.retry_on_timeout is True
+    size, retry, _ = es.adaptive.call(lambda size: transport.retry_on_timeout, lambda response: [])
+    assert retry is False
+    assert transport.retry_on_timeout is True
+    assert es2json.ESGenerator(host="localhost", verbose=False).es.transport.retry_on_timeout is True
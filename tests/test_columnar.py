@@ -0,0 +1,58 @@
+import os
+import pytest
+import es2json
+import es2json.cli
+from generate_testdata import MAX
+from test_es2json_esfunctions import default_kwargs
+
+pyarrow = pytest.importorskip("pyarrow")
+import pyarrow.parquet
+
+
+def test_infer_schema():
+    records = [{"_id": "1", "sort": [1], "_source": {"title": "foo", "tags": "a", "year": 1900, "author": {}}},
+               {"_id": "2", "sort": [2], "_source": {"title": "bar", "tags": ["b", "c"], "year": None}}]
+    schema = es2json.infer_schema(records)
+    assert schema.names == ["_id", "_source"]
+    source = schema.field("_source").type
+    assert source.field("tags").type == pyarrow.list_(pyarrow.string())
+    assert source.field("year").type == pyarrow.int64()
+    assert source.field("author").type == pyarrow.string()  # no empty structs in parquet
+    batch = es2json.to_record_batch(records, schema)
+    assert batch.column("_source").to_pylist()[0]["tags"] == ["a"]
+    assert es2json.to_record_batch([{"_source": {"year": "1901"}}], schema).column("_source").to_pylist()[0]["year"] == 1901
+    with pytest.raises(ValueError):
+        es2json.to_record_batch([{"_source": {"year": "unknown"}}], schema)
+
+
+def test_record_batches():
+    for schema in ("infer", "mapping"):
+        with es2json.ESGenerator(headless=True, chunksize=100, verbose=False, **default_kwargs) as es:
+            batches = list(es2json.record_batches(es, schema=schema, batchsize=300))
+        assert [batch.num_rows for batch in batches] == [300] * (MAX // 300) + ([MAX % 300] if MAX % 300 else [])
+        table = pyarrow.Table.from_batches(batches)
+        assert table.schema.field("foo").type == pyarrow.int64()
+        assert sorted(table.column("foo").to_pylist()) == list(range(MAX))
+
+
+def test_mapping_schema():
+    with es2json.ESGenerator(chunksize=100, verbose=False, **default_kwargs) as es:
+        schema = es2json.mapping_schema(es.es, es.index)
+        assert schema.names == ["_index", "_id", "_source"]
+        assert schema.field("_source").type.field("baz").type == pyarrow.string()
+        headless = es2json.mapping_schema(es.es, es.index, headless=True, sample=[{"foo": [1, 2]}])
+        assert headless.field("foo").type == pyarrow.list_(pyarrow.int64())
+
+
+def test_cli_parquet(tmp_path):
+    for schema in ("infer", "mapping"):
+        path = str(tmp_path / "out-{}.parquet".format(schema))
+        es2json.cli.run(["-server", "http://localhost:9200/test", "-output", path, "-format", "parquet",
+                         "-schema", schema, "-chunksize", "300"])
+        table = pyarrow.parquet.read_table(path)
+        assert table.num_rows == MAX
+        assert "sort" not in table.schema.names
+        assert sorted(int(id_) for id_ in table.column("_id").to_pylist()) == list(range(MAX))
+        assert not os.path.exists(path + ".tmp")
+    with pytest.raises(SystemExit):
+        es2json.cli.run(["-server", "http://localhost:9200/test", "-format", "parquet"])  # no -output
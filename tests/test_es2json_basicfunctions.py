@@ -1,5 +1,8 @@
 import es2json
+import json
 import uuid
+from copy import deepcopy
+import elasticsearch_dsl
 
 
 def test_litter():
@@ -52,3 +55,25 @@ def test_ArrayOrSingleValue():
     assert es2json.ArrayOrSingleValue([{"foo": "bar"}, {"bar": "foo"}]) == [{"foo": "bar"}, {"bar": "foo"}]
     assert es2json.ArrayOrSingleValue({}) is None
     assert es2json.ArrayOrSingleValue([]) is None
+
+
+raw_hits = [
+    {"_index": "test", "_type": "_doc", "_id": "1", "_score": None, "_source": {"foo": 1, "bar": [], "baz": None}, "sort": [1]},
+    {"_index": "test", "_type": "_doc", "_id": "2", "_score": 1.0, "_source": {"foo": 2}, "fields": {"qux": [2]}, "_ignored": ["baz"]},
+    {"_index": "test", "_type": "_doc", "_id": "3", "_score": 1.0, "_routing": "a", "highlight": {"foo": ["<em>3</em>"]}},
+    {"_index": "test", "_type": "_doc", "_id": "4", "_version": 1, "_seq_no": 4, "_primary_term": 1, "found": True,
+     "_source": {"foo": 4, "bar": {}, "baz": 0, "qux": False}},
+]
+
+
+def test_return_raw_doc():
+    """
+    return_raw_doc() has to return byte-identical records to return_doc() on elasticsearch_dsl objects
+    """
+    for headless, source in ((False, True), (False, False), (True, True), (True, False)):
+        generator = es2json.ESGenerator(es=object(), headless=headless, source=source)
+        for hit in raw_hits:
+            expected = generator.return_doc(elasticsearch_dsl.response.Hit(deepcopy(hit)))
+            assert json.dumps(generator.return_raw_doc(deepcopy(hit))) == json.dumps(expected)
+            expected = generator.return_doc(elasticsearch_dsl.Document.from_es(deepcopy(hit)))
+            assert json.dumps(generator.return_raw_doc(deepcopy(hit), skip_empty=True)) == json.dumps(expected)
@@ -2,11 +2,16 @@ import es2json
 import json
 import uuid
 import os
+import sys
 import gzip
 import pytest
+import elasticsearch
 from copy import deepcopy
 from generate_testdata import MAX
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+import fake_es  # noqa: E402
+
 
 default_kwargs = {
     "host": "localhost",
@@ -95,7 +100,136 @@ def test_esgenerator(**kwargs):
             records.append(dict(sorted(record.items())))
         assert sorted(expected_records, key=lambda k: k["_id"]) == sorted(records, key=lambda k: k["_id"])
 
-    
+
+def test_esgenerator_parallel():
+    """
+    ESGenerator test with sliced scroll, we test if we get back the full test-index exactly once
+    """
+    expected_records = []
+    for n, record in enumerate(testdata):
+        retrecord = deepcopy(default_returnrecord)
+        retrecord["_source"] = record
+        retrecord["_id"] = str(n)
+        expected_records.append(dict(sorted(retrecord.items())))
+    for boolean in (True, False):
+        records = []
+        for record in call_object(es2json.ESGenerator, use_with=boolean, parallel=4, chunksize=100, **default_kwargs):
+            record.pop("sort")  # different behaviour between es6 and es7 and tbh, we don't care about the sort parameter in this test
+            records.append(dict(sorted(record.items())))
+        assert sorted(expected_records, key=lambda k: k["_id"]) == sorted(records, key=lambda k: k["_id"])
+
+
+def test_esgenerator_pit():
+    """
+    ESGenerator test with point in time + search_after pagination, with and without slices
+    we test if we get back the full test-index exactly once
+    """
+    expected_records = []
+    for n, record in enumerate(testdata):
+        retrecord = deepcopy(default_returnrecord)
+        retrecord["_source"] = record
+        retrecord["_id"] = str(n)
+        expected_records.append(dict(sorted(retrecord.items())))
+    for parallel in (None, 4):
+        records = []
+        for record in call_object(es2json.ESGenerator, paginator="pit", parallel=parallel, chunksize=100, **default_kwargs):
+            record.pop("sort")  # different behaviour between es6 and es7 and tbh, we don't care about the sort parameter in this test
+            records.append(dict(sorted(record.items())))
+        assert sorted(expected_records, key=lambda k: k["_id"]) == sorted(records, key=lambda k: k["_id"])
+
+
+def test_esgenerator_prefetch():
+    """
+    ESGenerator test with pages fetched ahead in a background thread, with both paginators
+    we test if we get back the full test-index exactly once and in the same order as without prefetching
+    """
+    for paginator in ("scroll", "pit"):
+        expected_records = list(call_object(es2json.ESGenerator, paginator=paginator, chunksize=100, **default_kwargs))
+        records = list(call_object(es2json.ESGenerator, paginator=paginator, prefetch=3, chunksize=100, **default_kwargs))
+        assert len(records) == MAX
+        assert records == expected_records
+
+
+def test_esgenerator_adaptive():
+    """
+    ESGenerator test with an adaptive chunksize, we test if we get back the full test-index exactly once
+    and in the same order as with a fixed chunksize, while the pagesize changes
+    """
+    expected_records = list(call_object(es2json.ESGenerator, paginator="pit", chunksize=100, **default_kwargs))
+    for target in ("20kb", es2json.AdaptiveChunksize(target_bytes=20000, initial=10, minimum=5)):
+        generator = es2json.ESGenerator(paginator="pit", chunksize=100, adaptive=target, **default_kwargs)
+        assert list(generator.generator()) == expected_records
+        assert generator.adaptive.doc_bytes and generator.adaptive.size != 100
+
+
+def test_esgenerator_passthrough():
+    """
+    ESGenerator test with headless passthrough, we test if we get the same documents as JSON bytes
+    as the decoded records of a headless dump, for every paginator, slices, -size and single documents
+    """
+    for kwargs in ({}, {"paginator": "pit", "parallel": 4}, {"slice_": slice(5, 20)}, {"id_": "7"}):
+        expected_records = list(call_object(es2json.ESGenerator, headless=True, chunksize=100, **kwargs, **default_kwargs))
+        records = list(call_object(es2json.ESGenerator, headless=True, passthrough=True, chunksize=100, **kwargs, **default_kwargs))
+        assert all(isinstance(record, bytes) and b"\n" not in record for record in records)
+        records = [json.loads(record) for record in records]
+        if kwargs.get("parallel"):  # the order of parallel slices isn't deterministic
+            records, expected_records = sorted(records, key=lambda k: k["foo"]), sorted(expected_records, key=lambda k: k["foo"])
+        assert records == expected_records
+    with pytest.raises(ValueError):
+        es2json.ESGenerator(passthrough=True, **default_kwargs)
+    with pytest.raises(ValueError):
+        es2json.IDFile(idfile=["1"], headless=True, passthrough=True, **default_kwargs)
+
+
+def test_esgenerator_metrics():
+    """
+    ESGenerator test with metrics, we test if requests, pages and docs get counted
+    """
+    for parallel in (None, 4):
+        events = []
+        metrics = es2json.Metrics([lambda event, data: events.append(event)])
+        records = list(call_object(es2json.ESGenerator, metrics=metrics, parallel=parallel, chunksize=100, **default_kwargs))
+        result = metrics.to_dict()
+        assert result["docs"] == result["hits"] == len(records) == MAX
+        assert result["pages"] >= MAX // 100  # slices end with partial pages
+        assert result["requests"] > result["pages"]
+        assert result["bytes_received"] > 0
+        assert result["done"] and events[-1] == "done"
+
+
+def test_esgenerator_checkpoint():
+    """
+    ESGenerator test with a checkpoint, we interrupt the harvest, resume it
+    and test if we get back the full test-index exactly once, with _id and with a field as tiebreaker
+    """
+    for parallel, tiebreaker in ((None, "_id"), (4, "_id"), (4, "foo")):
+        fd = str(uuid.uuid4()) + ".ldj"
+        checkpoint_fd = str(uuid.uuid4()) + ".checkpoint"
+        checkpoint = es2json.Checkpoint(checkpoint_fd, interval=0, tiebreaker=tiebreaker)
+        fileobj = checkpoint.open_output(fd)
+        writer = es2json.NDJSONWriter(fileobj)
+        checkpoint.sink = writer
+        for n, record in enumerate(es2json.ESGenerator(checkpoint=checkpoint, parallel=parallel, chunksize=100, **default_kwargs).generator()):
+            writer.write(record)
+            if n == MAX // 2:
+                break  # the buffered records of the writer get lost, like in a crash
+        fileobj.close()
+        assert es2json.isfile(checkpoint_fd)
+        checkpoint = es2json.Checkpoint(checkpoint_fd, interval=0, tiebreaker=tiebreaker)
+        assert 0 < checkpoint.count <= MAX // 2
+        assert checkpoint.state["params"]["body"]["sort"] == [{tiebreaker: "asc"}]
+        with checkpoint.open_output(fd) as fileobj:
+            with es2json.NDJSONWriter(fileobj) as writer:
+                checkpoint.sink = writer
+                for record in es2json.ESGenerator(checkpoint=checkpoint, parallel=parallel, chunksize=100, **default_kwargs).generator():
+                    writer.write(record)
+        assert es2json.isfile(checkpoint_fd) is False
+        with open(fd) as inp:
+            records = [json.loads(line)["_source"] for line in inp]
+        assert sorted(testdata, key=lambda k: k["foo"]) == sorted(records, key=lambda k: k["foo"])
+        os.remove(fd)
+
+
 def test_esgenerator_get_document():
     """
     ESGenerator test, we test if we get a single record defined over a query, without the meta fields
@@ -149,6 +283,75 @@ def test_esgenerator_slice(**kwargs):
         assert sorted(expected_records, key=lambda k: k["_id"]) == sorted(records, key=lambda k: k["_id"])
 
 
+def test_esgenerator_deep_slice():
+    """
+    ESGenerator test with slices deeper than a page: they get harvested with a point in time in chunksize steps,
+    we test if we get back the same window in the same order as from a single from/size request
+    """
+    window = [record["_id"] for record in call_object(es2json.ESGenerator, slice_=slice(0, MAX), chunksize=MAX,
+                                                      **default_kwargs)]
+    for slize in (slice(250, 730), slice(10, 900, 7), slice(MAX-50, MAX+500), slice(MAX+10, MAX+500)):
+        records = list(call_object(es2json.ESGenerator, slice_=slize, chunksize=100, **default_kwargs))
+        assert [record["_id"] for record in records] == window[slize]
+
+
+def test_esgenerator_deep_slice_big_chunksize():
+    """
+    ESGenerator test with a chunksize above max_result_window, the slice still gets paged with a point in time
+    in steps of at most max_result_window, not requested at once
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test": fake_es.make_docs(12000)}))
+    kwargs = dict(default_kwargs, port=server.server_address[1], body={"sort": [{"foo": "desc"}]}, chunksize=20000)
+    try:
+        for slize in (slice(0, 10500), slice(500, 11000, 3)):
+            records = list(call_object(es2json.ESGenerator, slice_=slize, **kwargs))
+            assert [record["_id"] for record in records] == [str(11999 - n) for n in range(12000)][slize]
+    finally:
+        server.shutdown()
+
+
+def test_esgenerator_deep_slice_scroll_fallback():
+    """
+    without point in time support, a deep slice gets harvested with a scroll, which has to keep the sort of the query,
+    we test if we get back the same window as from a single from/size request, with and without a sort
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test": fake_es.make_docs(500)}, pit=False))
+    kwargs = dict(default_kwargs, port=server.server_address[1])
+    try:
+        es = elasticsearch.Elasticsearch([{"host": "127.0.0.1", "port": kwargs["port"]}])
+        for body in ({"sort": [{"foo": "desc"}]}, None):
+            window = es.search(index="test", body=dict(body or {}, size=150, **{"from": 250}))["hits"]["hits"]
+            records = list(call_object(es2json.ESGenerator, slice_=slice(250, 400), chunksize=50, body=body, **kwargs))
+            assert [record["_id"] for record in records] == [hit["_id"] for hit in window]
+    finally:
+        server.shutdown()
+
+
+def test_pit_fallback(capsys):
+    """
+    the PITPaginator only falls back to a scroll if the cluster doesn't support point in time,
+    a missing index or a malformed query raise right away
+    """
+    malformed = {"query": {"fuzzy": {"baz": "test"}}}  # the fake answers it with a 400, like Elasticsearch a malformed one
+    for cluster in (fake_es.FakeCluster({"test": fake_es.make_docs(50)}, pit=False),
+                    fake_es.FakeCluster({"test": fake_es.make_docs(50)}, shard_doc=False)):
+        server = fake_es.serve(cluster)
+        kwargs = dict(default_kwargs, port=server.server_address[1], paginator="pit", chunksize=10)
+        try:
+            assert len(list(call_object(es2json.ESGenerator, **kwargs))) == 50
+            assert "falling back to scroll" in capsys.readouterr().err
+            with pytest.raises(elasticsearch.exceptions.NotFoundError):
+                list(call_object(es2json.ESGenerator, **dict(kwargs, index="missing")))
+            with pytest.raises(elasticsearch.exceptions.RequestError):
+                list(call_object(es2json.ESGenerator, body=malformed, **kwargs))
+        finally:
+            server.shutdown()
+    capsys.readouterr()
+    with pytest.raises(elasticsearch.exceptions.RequestError):
+        list(call_object(es2json.ESGenerator, body=malformed, paginator="pit", **default_kwargs))
+    assert "falling back" not in capsys.readouterr().err
+
+
 def test_esgenerator_NoneSource():
     """
     ESGenerator test, we test if we get back the full test-index, but without the _source field
@@ -236,6 +439,7 @@ def test_esidfilegenerator_iterable():
         for record in call_object(es2json.IDFile, use_with=boolean, idfile=ids, headless=True, **default_kwargs):
             records.append(dict(sorted(record.items())))
         assert sorted(expected_records, key=lambda k: k["foo"]) == sorted(records, key=lambda k: k["foo"])
+    assert es2json.IDFile(idfile=ids + ids, **default_kwargs).iterable == ids
 
 
 def test_esidfilegenerator_file():
@@ -257,6 +461,7 @@ def test_esidfilegenerator_file():
         for record in call_object(es2json.IDFile, use_with=boolean, idfile=fd, headless=True, **default_kwargs):
             records.append(dict(sorted(record.items())))
         assert sorted(expected_records, key=lambda k: k["foo"]) == sorted(records, key=lambda k: k["foo"])
+    assert es2json.IDFile(idfile=fd, **default_kwargs).iterable == [str(n) for n in range(200, 300)]
     os.remove(fd)
 
 
@@ -446,6 +651,203 @@ def test_esidfileconsumegenerator_missing_ids_query():
         os.remove(fd)  # cleanup
 
 
+def test_esidfilegenerator_batched_query_missing_ids_yield():
+    """
+    IDFile test with a query body in batched mode, we test if we get the records matching the query
+    and if all the IDs not found or not matching the query are yielded as missing
+    """
+    expected_records = []
+    expected_missing = []
+    ids = []
+    for n in range(0, MAX+200):
+        ids.append(str(n))
+        if n < MAX and str(n).startswith("9"):
+            retrecord = {}
+            retrecord["foo"] = n
+            retrecord["baz"] = "test{}".format(n)
+            retrecord["bar"] = MAX-n
+            expected_records.append(dict(sorted(retrecord.items())))
+        else:
+            expected_missing.append(str(n))
+    query = {"query": {"prefix": {"baz.keyword": "test9"}}}
+    for boolean in (True, False):
+        records = []
+        missing_ids = []
+        for record in call_object(es2json.IDFile, use_with=boolean, idfile=ids, body=query, batched=True, chunksize=250,
+                                  headless=False, missing_behaviour='yield', **default_kwargs):
+            if record.get("found") is False:
+                missing_ids.append(record["_id"])
+            else:
+                records.append(dict(sorted(record["_source"].items())))
+        assert sorted(expected_records, key=lambda k: k["foo"]) == sorted(records, key=lambda k: k["foo"])
+        assert sorted(missing_ids) == sorted(expected_missing)
+
+
+def test_esidfilegenerator_batched_max_result_window():
+    """
+    IDFile test in batched mode with chunks bigger than the max_result_window of the cluster,
+    the IDs of a chunk have to be split into several searches
+    """
+    class SmallBatches(es2json.IDFile):
+        max_batch = 100
+
+    server = fake_es.serve(fake_es.FakeCluster({"test": fake_es.make_docs(500)}, max_result_window=100))
+    query = {"query": {"prefix": {"baz.keyword": "test1"}}}
+    ids = [str(n) for n in range(0, 600)]
+    try:
+        records, missing_ids = [], []
+        for record in call_object(SmallBatches, idfile=ids, body=query, batched=True, chunksize=300, headless=False,
+                                  missing_behaviour='yield', **dict(default_kwargs, port=server.server_address[1])):
+            if record.get("found") is False:
+                missing_ids.append(record["_id"])
+            else:
+                records.append(record["_id"])
+    finally:
+        server.shutdown()
+    expected = [id_ for id_ in ids if id_.startswith("1") and int(id_) < 500]
+    assert sorted(records) == sorted(expected)
+    assert sorted(missing_ids) == sorted(set(ids) - set(expected))
+
+
+def test_esidfilegenerator_batched_several_indices():
+    """
+    IDFile test in batched mode with IDs which exist in several indices, so a chunk has more hits than IDs,
+    we test if we get every hit once and if the hits of the first search aren't requested again
+    """
+    received = []
+
+    class Cluster(fake_es.FakeCluster):
+        def search(self, index, body, params):
+            status, response = super().search(index, body, params)
+            received.extend((hit["_index"], hit["_id"]) for hit in response.get("hits", {}).get("hits", []))
+            return status, response
+
+        def scroll(self, body):
+            status, response = super().scroll(body)
+            received.extend((hit["_index"], hit["_id"]) for hit in response.get("hits", {}).get("hits", []))
+            return status, response
+
+    server = fake_es.serve(Cluster({"test1": fake_es.make_docs(300), "test2": fake_es.make_docs(300)}))
+    ids = [str(n) for n in range(200, 400)]
+    kwargs = dict(default_kwargs, index="test1,test2", port=server.server_address[1])
+    try:
+        records = [(record["_index"], record["_id"]) for record in
+                   call_object(es2json.IDFile, idfile=ids, body={"query": {"match_all": {}}}, batched=True, chunksize=50,
+                               parallel=4, prefetch=True, headless=False, missing_behaviour='yield', **kwargs)
+                   if record.get("found") is not False]
+    finally:
+        server.shutdown()
+    expected = [(index, str(n)) for index in ("test1", "test2") for n in range(200, 300)]
+    assert sorted(records) == expected
+    assert sorted(received) == expected
+
+
+def test_esidfilegenerator_batched_capped_total():
+    """
+    IDFile test in batched mode with more hits than the cluster counts by default (hits.total with relation gte),
+    we test if we still get all the hits of the IDs which exist in several indices
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test1": fake_es.make_docs(300), "test2": fake_es.make_docs(300)},
+                                               track_total_hits=50))
+    kwargs = dict(default_kwargs, index="test1,test2", port=server.server_address[1])
+    try:
+        records = [(record["_index"], record["_id"]) for record in
+                   call_object(es2json.IDFile, idfile=[str(n) for n in range(200, 300)], body={"query": {"match_all": {}}},
+                               batched=True, chunksize=50, headless=False, **kwargs)]
+    finally:
+        server.shutdown()
+    assert sorted(records) == [(index, str(n)) for index in ("test1", "test2") for n in range(200, 300)]
+
+
+def test_esidfilegenerator_prefetch_missing_ids_yield():
+    """
+    IDFile test with chunks fetched ahead in a background thread,
+    we test if we get the same records and missing IDs in the same order as without prefetching
+    """
+    ids = [str(n) for n in range(MAX-300, MAX+200)]
+    query = {"query": {"prefix": {"baz.keyword": "test9"}}}
+    for kwargs in ({}, {"body": query}):
+        expected_records = list(call_object(es2json.IDFile, idfile=ids, missing_behaviour='yield', chunksize=100, **kwargs, **default_kwargs))
+        records = list(call_object(es2json.IDFile, idfile=ids, missing_behaviour='yield', chunksize=100, prefetch=2, **kwargs, **default_kwargs))
+        assert records == expected_records
+
+
+def test_esidfilegenerator_parallel_missing_ids_yield():
+    """
+    IDFile test with several chunks requested concurrently,
+    we test if we get the same records and missing IDs in the same order as with one chunk at once
+    """
+    ids = [str(n) for n in range(MAX-300, MAX+200)]
+    query = {"query": {"prefix": {"baz.keyword": "test9"}}}
+    for kwargs in ({}, {"body": query}, {"prefetch": 2}):
+        expected_records = list(call_object(es2json.IDFile, idfile=ids, missing_behaviour='yield', chunksize=50, **kwargs, **default_kwargs))
+        records = list(call_object(es2json.IDFile, idfile=ids, missing_behaviour='yield', chunksize=50, parallel=4, **kwargs, **default_kwargs))
+        assert records == expected_records
+        missing_ids = [record["_id"] for record in records if record.get("found") is False]
+        assert len(missing_ids) == len(set(missing_ids)) >= 200  # every missing ID exactly once
+
+
+def test_esidfilegenerator_adaptive_missing_ids_yield():
+    """
+    IDFile test with an adaptive chunksize, we test if we get the same records and missing IDs in the same order
+    as with a fixed chunksize
+    """
+    ids = [str(n) for n in range(MAX-300, MAX+200)]
+    query = {"query": {"prefix": {"baz.keyword": "test9"}}}
+    for kwargs in ({}, {"body": query}, {"parallel": 3}):
+        expected_records = list(call_object(es2json.IDFile, idfile=ids, missing_behaviour='yield', chunksize=50, **kwargs, **default_kwargs))
+        adaptive = es2json.AdaptiveChunksize(target_bytes=5000, initial=20, minimum=5)
+        records = list(call_object(es2json.IDFile, idfile=ids, missing_behaviour='yield', adaptive=adaptive, **kwargs, **default_kwargs))
+        assert records == expected_records
+        assert adaptive.size != 20
+
+
+def test_esidfilegenerator_metrics():
+    """
+    IDFile test with a metrics callback, we test if docs and missing IDs get counted
+    """
+    events = []
+    ids = [str(n) for n in range(MAX-300, MAX+200)]
+    generator = es2json.IDFile(idfile=ids, metrics=lambda event, data: events.append((event, data)), chunksize=100, **default_kwargs)
+    assert len(list(generator.generator())) == 300
+    result = generator.metrics.to_dict()
+    assert result["docs"] == 300
+    assert result["missing_ids"] == 200
+    assert result["pages"] == 5
+    assert sum(data["count"] for event, data in events if event == "missing") == 200
+
+
+def test_esidfilegenerator_gzip_duplicates():
+    """
+    IDFile test with a gzip-compressed idfile full of duplicates, which also gets too big for the in-memory de-duplication
+    we test if we get every record exactly once
+    """
+    fd = str(uuid.uuid4()) + ".gz"
+    with gzip.open(fd, "wt") as outp:
+        for n in range(0, 3 * MAX):
+            print(n % MAX, file=outp)
+    records = [record["foo"] for record in es2json.IDFile(idfile=fd, max_memory_ids=100, headless=True, **default_kwargs).generator()]
+    assert sorted(records) == list(range(MAX))
+    os.remove(fd)
+
+
+def test_esidfileconsumegenerator_gzip_missing_ids():
+    """
+    IDFileConsume test with a gzip-compressed idfile, we test if it gets replaced by a compressed idfile
+    containing exactly the missing IDs
+    """
+    fd = str(uuid.uuid4()) + ".gz"
+    with gzip.open(fd, "wt") as outp:
+        for n in range(MAX-100, MAX+200):
+            print(n, file=outp)
+    records = list(es2json.IDFileConsume(idfile=fd, headless=True, missing_behaviour='yield', **default_kwargs).generator())
+    assert sorted(record["_id"] for record in records if record.get("found") is False) == sorted(str(n) for n in range(MAX, MAX+200))
+    with gzip.open(fd, "rt") as inp:
+        assert [line.rstrip() for line in inp] == [str(n) for n in range(MAX, MAX+200)]
+    assert es2json.isfile(fd + ".tmp") is False
+    os.remove(fd)
+
+
 def test_esfatgenerator():
     """
     old test for deprecated esfatgenerator, which is still used in esmarc
@@ -464,3 +866,43 @@ def test_esfatgenerator():
             record.pop("sort")
             records.append(dict(sorted(record.items())))
     assert sorted(expected_records, key=lambda k: k["_id"]) == sorted(records, key=lambda k: k["_id"])
+
+
+def test_esgenerator_iter_pages():
+    """
+    the pages have the chunksize and concatenated they're the records of the generator
+    """
+    for kwargs in ({}, {"paginator": "pit"}, {"parallel": 3}, {"slice_": slice(150, 730, 3)}):
+        with es2json.ESGenerator(chunksize=100, **kwargs, **default_kwargs) as es:
+            pages = list(es.iter_pages())
+        assert all(0 < len(page) <= 100 for page in pages)
+        if not kwargs.get("parallel") and not kwargs.get("slice_"):
+            assert all(len(page) == 100 for page in pages[:-1])
+        records = [record for page in pages for record in page]
+        expected = list(call_object(es2json.ESGenerator, chunksize=100, **kwargs, **default_kwargs))
+        assert sorted(records, key=lambda k: k["_id"]) == sorted(expected, key=lambda k: k["_id"])
+
+
+def test_esgenerator_iter_batches():
+    """
+    ESGenerator test, we test if iter_batches() regroups the pages of the parallel slices into batches of the given size
+    and if we get back the full test-index exactly once
+    """
+    with es2json.ESGenerator(chunksize=100, parallel=3, **default_kwargs) as es:
+        batches = list(es.iter_batches(size=300))
+    assert [len(batch) for batch in batches] == [300] * (MAX // 300) + ([MAX % 300] if MAX % 300 else [])
+    assert sorted(record["_id"] for batch in batches for record in batch) == sorted(str(n) for n in range(MAX))
+
+
+def test_esidfilegenerator_iter_pages_missing_ids_yield():
+    """
+    IDFile test, we test if iter_pages() yields the records chunk by chunk, no page bigger than the chunksize,
+    and if the IDs not found are yielded as missing in the pages
+    """
+    ids = [str(n) for n in range(MAX-300, MAX+200)]
+    with es2json.IDFile(idfile=ids, missing_behaviour='yield', chunksize=100, **default_kwargs) as es:
+        pages = list(es.iter_pages())
+    assert all(0 < len(page) <= 100 for page in pages)
+    records = [record for page in pages for record in page]
+    assert sorted(record["_id"] for record in records if record.get("found") is not False) == sorted(ids[:300])
+    assert sorted(record["_id"] for record in records if record.get("found") is False) == sorted(ids[300:])
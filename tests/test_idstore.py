@@ -0,0 +1,52 @@
+import es2json.idstore as idstore
+import gzip
+import os
+import sys
+import uuid
+
+
+def test_idset_spill():
+    """
+    IDSet test, the de-duplication has to work the same before and after moving to the database
+    """
+    ids = idstore.IDSet(max_memory=10)
+    assert all(ids.add(str(n)) for n in range(100))
+    assert ids.db is not None
+    assert not any(ids.add(str(n)) for n in range(100))
+    assert "5" in ids and "100" not in ids
+    assert ids.add("100")
+    ids.close()
+
+
+def test_unique():
+    items = [str(n % 30) for n in range(100)]
+    for max_memory in (5, 1000):
+        assert list(idstore.unique(items, max_memory)) == [str(n) for n in range(30)]
+
+
+def test_read_ids_gzip():
+    fd = str(uuid.uuid4()) + ".gz"
+    with gzip.open(fd, "wt") as outp:
+        for n in range(100):
+            print(n, file=outp)
+        print("", file=outp)
+    assert list(idstore.read_ids(fd)) == [str(n) for n in range(100)]
+    os.remove(fd)
+
+
+def test_read_ids_stdin(monkeypatch):
+    read, write = os.pipe()
+    with os.fdopen(write, "w") as outp:
+        outp.write("1\n2 \n\n3\n")
+    with os.fdopen(read) as inp:
+        monkeypatch.setattr(sys, "stdin", inp)
+        assert list(idstore.read_ids("-")) == ["1", "2", "3"]
+
+
+def test_spool():
+    with idstore.Spool() as spool:
+        assert not spool
+        spool.extend(str(n) for n in range(1000))
+        spool.append("ü")
+        assert len(spool) == 1001
+        assert list(spool) == [str(n) for n in range(1000)] + ["ü"]
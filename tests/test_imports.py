@@ -0,0 +1,45 @@
+import sys
+import types
+import importlib
+import subprocess
+import pytest
+import es2json
+
+
+HEAVY = ("elasticsearch", "elasticsearch_dsl", "httplib2", "aiohttp", "pyarrow")
+STAR_MODULES = ("es2json.es2json", "es2json.helperscripts", "es2json.oldapi_calls", "es2json.output",
+                "es2json.async_es2json", "es2json.scheduler")
+
+
+def loaded_modules(code):
+    """ runs code in a fresh interpreter, returns the heavy dependencies it imported """
+    code += "\nimport sys\nprint(','.join(m for m in {!r} if m in sys.modules), file=sys.stderr)".format(HEAVY)
+    result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    return [m for m in result.stderr.splitlines()[-1].split(",") if m]
+
+
+def test_lazy_imports():
+    assert loaded_modules("import es2json") == []
+    assert loaded_modules("import es2json.cli\ntry:\n    es2json.cli.run(['-h'])\nexcept SystemExit:\n    pass") == []
+    assert loaded_modules("import es2json\nes2json.NDJSONWriter") == []
+    assert "httplib2" not in loaded_modules("import es2json\nes2json.ESGenerator")
+
+
+def test_submodules():
+    """ the submodules are still attributes of the package after a plain `import es2json`, in a fresh interpreter """
+    subprocess.run([sys.executable, "-c", "import es2json\nes2json.helperscripts.isint\nes2json.es2json.ESGenerator\n"
+                    "es2json.oldapi_calls.esgenerator"], check=True)
+
+
+def test_public_names():
+    """ every public class/function of the modules which were star-imported is there, as the same object """
+    for name in es2json.__all__:
+        assert name in dir(es2json)
+    for module in map(importlib.import_module, STAR_MODULES):
+        for name, value in vars(module).items():
+            if not name.startswith("_") and getattr(value, "__module__", None) == module.__name__:
+                assert getattr(es2json, name) is value
+    assert isinstance(es2json.output, types.ModuleType)
+    with pytest.raises(AttributeError):
+        es2json.nonexistent
@@ -0,0 +1,87 @@
+import es2json
+import es2json.metrics
+import asyncio
+import json
+import os
+import uuid
+from test_es2json_esfunctions import default_kwargs, fake_es
+
+
+def filled_metrics(events):
+    metrics = es2json.Metrics([lambda event, data: events.append((event, data))])
+    metrics.request("/test/_search", 0.003, 1000)
+    metrics.request("/_search/scroll", 0.2, 500)
+    metrics.retry("/_search/scroll", 10.0, TimeoutError())
+    metrics.page(100, 0.2)
+    metrics.doc(0.01, 100)
+    metrics.missing(3)
+    metrics.missing(0)
+    metrics.finish()
+    return metrics
+
+
+def test_metrics_to_dict():
+    events = []
+    metrics = filled_metrics(events).to_dict()
+    assert metrics["requests"] == 2
+    assert metrics["bytes_received"] == 1500
+    assert metrics["retries"] == 1
+    assert metrics["request_latency_buckets"]["0.005"] == 1
+    assert metrics["request_latency_buckets"]["0.1"] == 1
+    assert metrics["request_latency_buckets"]["0.25"] == 2
+    assert metrics["request_latency_buckets"]["+Inf"] == 2
+    assert metrics["pages"] == 1 and metrics["hits"] == 100 and metrics["average_page_size"] == 100
+    assert metrics["docs"] == 100
+    assert metrics["missing_ids"] == 3
+    assert metrics["done"] is True
+    assert [event for event, data in events] == ["request", "request", "retry", "page", "missing", "done"]
+
+
+def test_metrics_write():
+    metrics = filled_metrics([])
+    fd = str(uuid.uuid4())
+    metrics.write(fd + ".json")
+    with open(fd + ".json") as inp:
+        assert json.load(inp)["requests"] == 2
+    metrics.write(fd + ".prom")
+    with open(fd + ".prom") as inp:
+        lines = inp.read().splitlines()
+    assert 'es2json_request_duration_seconds_bucket{le="+Inf"} 2' in lines
+    assert "es2json_response_bytes_total 1500" in lines
+    assert "es2json_missing_ids_total 3" in lines
+    assert all(line.startswith("#") or len(line.split(" ")) == 2 for line in lines)
+    os.remove(fd + ".json")
+    os.remove(fd + ".prom")
+
+
+def test_response_size():
+    assert es2json.metrics.response_size(None) == 0
+    assert es2json.metrics.response_size('{"a":1}') == 7
+    assert es2json.metrics.response_size('{"a":"äö€"}') == len('{"a":"äö€"}'.encode("utf-8"))
+    assert es2json.metrics.response_size(b"\xc3\xa4") == 2
+
+
+def test_metrics_bytes_non_ascii():
+    """
+    the byte counter gets the UTF-8 bytes sent by the cluster, not the characters of the decoded responses
+    """
+    docs = {str(n): {"name": "Müller-Lüdenscheidt €{}".format(n)} for n in range(300)}
+    cluster = fake_es.FakeCluster({"test": docs})
+    server = fake_es.serve(cluster)
+    kwargs = dict(default_kwargs, port=server.server_address[1], chunksize=100, verbose=False)
+
+    async def harvest(metrics):
+        async with es2json.AsyncESGenerator(metrics=metrics, **kwargs) as es:
+            return [record async for record in es.generator()]
+    try:
+        for harvester in ("sync", "async"):
+            metrics = es2json.Metrics()
+            sent = cluster.bytes_sent
+            if harvester == "sync":
+                with es2json.ESGenerator(metrics=metrics, **kwargs) as es:
+                    assert len(list(es.generator())) == 300
+            else:
+                assert len(asyncio.run(harvest(metrics))) == 300
+            assert metrics.to_dict()["bytes_received"] == cluster.bytes_sent - sent
+    finally:
+        server.shutdown()
@@ -0,0 +1,80 @@
+import os
+import sys
+import asyncio
+import pytest
+import es2json
+import es2json.cli
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+import fake_es  # noqa: E402
+
+
+@pytest.fixture
+def nodes():
+    """
+    a fake cluster of its own served by two nodes, yields their ports and the number of requests each one got
+    """
+    cluster = fake_es.FakeCluster({"test": fake_es.make_docs(500)})
+    servers, requests = [], {}
+    for _ in range(2):
+        server = fake_es.serve(cluster)
+        port = server.server_address[1]
+        requests[port] = 0
+
+        class Counting(server.RequestHandlerClass):
+            def handle_any(self, method, port=port):
+                requests[port] += 1
+                super().handle_any(method)
+        server.RequestHandlerClass = Counting
+        servers.append(server)
+    yield list(requests), requests
+    for server in servers:
+        server.shutdown()
+
+
+def test_parse_hosts():
+    assert es2json.parse_hosts("localhost") == [{"host": "localhost", "port": 9200}]
+    assert es2json.parse_hosts("http://es1:9201, es2", port=9300) == [{"host": "es1", "port": 9201},
+                                                                     {"host": "es2", "port": 9300}]
+    assert es2json.parse_hosts(["es1", {"host": "es2", "port": 1}]) == [{"host": "es1", "port": 9200},
+                                                                        {"host": "es2", "port": 1}]
+    with pytest.raises(ValueError):
+        es2json.parse_hosts("")
+
+
+def test_round_robin(nodes):
+    ports, requests = nodes
+    hosts = ",".join("127.0.0.1:{}".format(port) for port in ports)
+    with es2json.ESGenerator(host=hosts, index="test", parallel=2, chunksize=10, maxsize=2, verbose=False) as es:
+        assert [connection.pool.pool.maxsize for connection in es.es.transport.connection_pool.connections] == [2, 2]
+        assert len(list(es.generator())) == 500
+    assert all(count > 10 for count in requests.values())
+
+
+def test_sniff(nodes):
+    ports, requests = nodes
+    with es2json.ESGenerator(host="127.0.0.1", port=ports[0], index="test", chunksize=10, sniff=True, verbose=False) as es:
+        assert len(es.es.transport.connection_pool.connections) == 2
+        assert len(list(es.generator())) == 500
+    assert all(count > 10 for count in requests.values())
+
+
+def test_async_round_robin(nodes):
+    ports, requests = nodes
+
+    async def run():
+        async with es2json.AsyncESGenerator(host=["127.0.0.1:{}".format(port) for port in ports], index="test",
+                                            parallel=2, chunksize=10, verbose=False) as es:
+            return [record async for record in es.generator()]
+    assert len(asyncio.run(run())) == 500
+    assert all(count > 10 for count in requests.values())
+
+
+def test_cli_nodes(nodes, tmp_path):
+    ports, requests = nodes
+    path = str(tmp_path / "out.ldj")
+    es2json.cli.run(["-server", "http://127.0.0.1:{},http://127.0.0.1:{}/test".format(*ports), "-chunksize", "10",
+                     "-output", path, "-maxsize", "2"])
+    with open(path) as inp:
+        assert len(inp.readlines()) == 500
+    assert all(count > 10 for count in requests.values())
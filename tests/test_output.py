@@ -0,0 +1,153 @@
+import io
+import os
+import gzip
+import json
+import uuid
+import pytest
+import es2json
+
+
+records = [{"foo": 1, "bar": "baz"},
+           {"_id": "2", "_source": {"umlaut": "äöü", "list": [1, 2.5, None, True]}},
+           {"big": 2**70},
+           {}]
+
+
+def test_json_encoder():
+    """ the stdlib encoder has to be byte-identical to json.dumps() """
+    for indent in (None, 4):
+        encode = es2json.get_encoder("json", indent=indent)
+        for record in records:
+            assert encode(record) == json.dumps(record, indent=indent).encode("utf-8")
+
+
+def test_orjson_encoder():
+    """ orjson output differs in formatting, but has to decode to the same records """
+    pytest.importorskip("orjson")
+    encode = es2json.get_encoder("orjson")
+    for record in records:
+        assert json.loads(encode(record)) == record
+    with pytest.raises(ValueError):
+        es2json.get_encoder("orjson", indent=4)
+
+
+def test_unknown_encoder():
+    with pytest.raises(ValueError):
+        es2json.get_encoder("yaml")
+
+
+def test_ndjsonwriter():
+    """ the writer has to produce the same output as print(json.dumps()) per record """
+    for batchsize in (1, 2, 1000):
+        out = io.BytesIO()
+        with es2json.NDJSONWriter(out, batchsize=batchsize) as writer:
+            for record in records:
+                writer.write(record)
+        assert out.getvalue() == "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+
+
+def test_ndjsonwriter_text():
+    """ the writer also works on text file objects """
+    out = io.StringIO()
+    es2json.NDJSONWriter(out).write_all(records)
+    assert out.getvalue() == "".join(json.dumps(record) + "\n" for record in records)
+
+
+def test_ndjsonwriter_bytes():
+    """ bytes are written as they are, e.g. the documents of a passthrough dump """
+    out = io.BytesIO()
+    es2json.NDJSONWriter(out).write_all([b'{"a":1}', {"b": 2}])
+    assert out.getvalue() == b'{"a":1}\n{"b": 2}\n'
+
+
+def test_open_output_gzip():
+    """ the concatenated gzip members of the BlockCompressor have to be one valid gzip stream """
+    fd = str(uuid.uuid4()) + ".ldj.gz"
+    data = [{"n": n, "baz": "test{}".format(n)} for n in range(10000)]
+    es2json.dump(data, fd, blocksize=4096, threads=4)
+    with gzip.open(fd, "rt") as inp:
+        assert [json.loads(line) for line in inp] == data
+    os.remove(fd)
+
+
+def test_open_output_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    fd = str(uuid.uuid4()) + ".ldj.zst"
+    data = [{"n": n, "baz": "test{}".format(n)} for n in range(10000)]
+    es2json.dump(data, fd, blocksize=4096, threads=4)
+    with open(fd, "rb") as inp:
+        reader = zstandard.ZstdDecompressor().stream_reader(inp, read_across_frames=True)
+        assert [json.loads(line) for line in io.TextIOWrapper(reader)] == data
+    os.remove(fd)
+
+
+def test_open_output_plain():
+    fd = str(uuid.uuid4()) + ".ldj"
+    es2json.dump(records, fd)
+    with open(fd) as inp:
+        assert inp.read() == "".join(json.dumps(record) + "\n" for record in records)
+    os.remove(fd)
+
+
+def test_shard_path():
+    assert es2json.shard_path("dump.ldj.gz", 3) == "dump-00003.ldj.gz"
+    assert es2json.shard_path("out/dump.ldj", 3, 1) == "out/dump-00003-00001.ldj"
+    assert es2json.shard_path("part-{shard}-{part:03d}.ldj", 3) == "part-3-000.ldj"
+
+
+def test_partitioner():
+    """ hash partitioning puts the same values into the same shards, in every run """
+    records = [{"_id": str(n), "_source": {"author": {"name": "name{}".format(n % 7)}}} for n in range(100)]
+    by_id = es2json.partitioner("_id", 4)
+    by_field = es2json.partitioner("author.name", 4)
+    assert [by_id(record) for record in records] == [by_id(record) for record in records]
+    assert len({by_id(record) for record in records}) == 4
+    for n in range(7):
+        assert len({by_field(record) for record in records[n::7]}) == 1
+    headless = es2json.partitioner("author.name", 4, headless=True)
+    assert [headless(record["_source"]) for record in records] == [by_field(record) for record in records]
+    roundrobin = es2json.partitioner("roundrobin", 3)
+    assert [roundrobin(record) for record in records[:5]] == [0, 1, 2, 0, 1]
+    with pytest.raises(ValueError):
+        es2json.partitioner("_id", 4, headless=True)
+
+
+def test_partitioned_writer():
+    """
+    every record gets written exactly once, into the shard of its _id, and the shards roll over after roll_count records
+    """
+    fd = str(uuid.uuid4()) + ".ldj.gz"
+    data = [{"_id": str(n), "_source": {"n": n}} for n in range(2500)]
+    by_id = es2json.partitioner("_id", 3)
+    with es2json.PartitionedWriter(fd, 3, partition="_id", batchsize=100, roll_count=500) as writer:
+        for record in data:
+            writer.write(record)
+    written = []
+    for path in writer.paths:
+        with gzip.open(path, "rt") as inp:
+            lines = [json.loads(line) for line in inp]
+        assert 0 < len(lines) <= 500
+        shard = int(path[len(fd) - 7:].split("-")[1])
+        assert all(by_id(record) == shard for record in lines)
+        written.extend(lines)
+        os.remove(path)
+    assert sorted(written, key=lambda record: int(record["_id"])) == data
+    assert len(writer.paths) >= 6
+
+
+def test_partitioned_writer_error():
+    """ errors of the writer threads get raised in the producer """
+    with pytest.raises(FileNotFoundError):
+        with es2json.PartitionedWriter(os.path.join(str(uuid.uuid4()), "dump-{shard}.ldj"), 2) as writer:
+            writer.write({"a": 1})
+    with pytest.raises(TypeError):
+        fd = str(uuid.uuid4()) + "-{shard}.ldj"
+        try:
+            es2json.PartitionedWriter(fd, 2, batchsize=1).write_all([{"a": 1}, {"b": object()}, {"c": 3}])
+        finally:
+            for n in range(2):
+                os.remove(fd.format(shard=n))
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,46 @@
+import es2json
+import es2json.passthrough as passthrough
+import json
+from test_es2json_esfunctions import default_kwargs, fake_es
+
+
+def test_loads_raw_sources():
+    """
+    only the _source objects stay raw JSON text, exactly as sent, also tricky strings and nested _source keys
+    """
+    sources = ['{"title":"\\"_source\\":{","a":"}]"}', '{"x":[1,{"_source":{}}]}', '{\n  "pretty": true\n}']
+    text = ('{"_scroll_id":"abc","hits":{"total":{"value":3},"hits":['
+            '{"_id":"_source","_source":' + sources[0] + ',"sort":[1]},'
+            '{"_id":"2","_source" : ' + sources[1] + '},'
+            '{"_id":"3","_source":' + sources[2] + ',"sort":[3]}]}}')
+    response = passthrough.loads_raw_sources(text)
+    assert [hit["_source"] for hit in response["hits"]["hits"]] == sources
+    response["hits"]["hits"] = [dict(hit, _source=json.loads(hit["_source"])) for hit in response["hits"]["hits"]]
+    assert response == json.loads(text)
+
+
+def test_loads_raw_sources_no_sources():
+    for text in ('{"docs":[{"_id":"1","found":false}]}', '{"a":"_source","b":["_source"]}', '{"_source":false}'):
+        assert passthrough.loads_raw_sources(text) == json.loads(text)
+
+
+def test_raw_line():
+    assert passthrough.raw_line('{\r\n  "a": "ä"\n}') == '{    "a": "ä" }'.encode("utf-8")
+    assert passthrough.raw_line('{"a":1}') == b'{"a":1}'
+
+
+def test_passthrough_not_encoded_again():
+    """
+    the documents are the bytes Elasticsearch sent, not encoded again: compact and the ä as UTF-8,
+    the stdlib encoder of the output would write them with spaces and escape the ä,
+    without passthrough the records are the decoded dicts, which the output has to encode again
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"test": {"1": {"name": "ä", "n": 1.0}}}))
+    kwargs = dict(default_kwargs, port=server.server_address[1], headless=True, verbose=False)
+    try:
+        with es2json.ESGenerator(passthrough=True, **kwargs) as es:
+            assert list(es.generator()) == ['{"name":"ä","n":1.0}'.encode("utf-8")]
+        with es2json.ESGenerator(**kwargs) as es:
+            assert list(es.generator()) == [{"name": "ä", "n": 1.0}]
+    finally:
+        server.shutdown()
@@ -0,0 +1,45 @@
+import es2json
+import elasticsearch
+import pytest
+from es2json.progress import Progress, format_duration
+from generate_testdata import MAX
+from test_es2json_esfunctions import default_kwargs
+
+
+def test_format_duration():
+    assert format_duration(6.7) == "6s"
+    assert format_duration(245) == "4m05s"
+    assert format_duration(3723) == "1h02m03s"
+
+
+def test_progress(capsys):
+    progress = Progress(every=10)
+    assert progress.line().startswith("0/? ")
+    progress.add_total(15)
+    progress.add_total(10)
+    for n in range(1, 21):
+        progress.update(n)
+    progress.finish()  # already reported
+    lines = capsys.readouterr().err.splitlines()
+    assert [line.split()[0] for line in lines] == ["10/25", "20/25"]
+    assert "docs/s ETA " in lines[-1]
+    for n in range(21, 26):
+        progress.update(n)
+    line = capsys.readouterr().err
+    assert line.startswith("25/25 ") and line.endswith(" docs/s\n")  # no ETA when done
+
+
+@pytest.mark.parametrize("kwargs", [{"paginator": "scroll"}, {"paginator": "pit"}, {"parallel": 3},
+                                    {"paginator": "pit", "parallel": 3}])
+def test_esgenerator_verbose(kwargs, capsys, monkeypatch):
+    """
+    the total comes from the first responses, no _count request
+    """
+    def count(*args, **kwargs):
+        raise AssertionError("no _count request expected")
+    monkeypatch.setattr(elasticsearch.Elasticsearch, "count", count)
+    records = list(es2json.ESGenerator(verbose=True, chunksize=100, **default_kwargs, **kwargs).generator())
+    assert len(records) == MAX
+    lines = capsys.readouterr().err.splitlines()
+    assert lines[-1].startswith("{0}/{0} ".format(MAX))
+    assert len(lines) == MAX // 100 + (MAX % 100 > 0)
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import gzip
+import pytest
+import es2json
+import es2json.cli
+import elasticsearch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+import fake_es  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def cluster():
+    """
+    a fake cluster of its own, with indices of different sizes
+    """
+    server = fake_es.serve(fake_es.FakeCluster({"logs-a": fake_es.make_docs(10),
+                                                "logs-b": fake_es.make_docs(300),
+                                                "logs-c": fake_es.make_docs(100, 500),
+                                                "users": fake_es.make_docs(5)}))
+    yield server.server_address[1]
+    server.shutdown()
+
+
+def read(path):
+    with gzip.open(path, "rt") as inp:
+        return [json.loads(line) for line in inp]
+
+
+def test_resolve_indices(cluster):
+    es = elasticsearch.Elasticsearch([{"host": "127.0.0.1", "port": cluster}])
+    assert [row[0] for row in es2json.resolve_indices(es, "logs-*")] == ["logs-c", "logs-b", "logs-a"]
+    assert [row[0] for row in es2json.resolve_indices(es, ["users", "logs-a"])] == ["logs-a", "users"]
+    assert es2json.resolve_indices(es, "users")[0][2] == 5
+
+
+def test_tag_index():
+    assert es2json.tag_index({"foo": 1}, "test") == {"_index": "test", "foo": 1}
+    assert es2json.tag_index({"_index": "other"}, "test") == {"_index": "other"}
+    assert es2json.tag_index(b'{"foo": 1}', "test") == b'{"_index":"test","foo": 1}'
+    assert es2json.tag_index(b'{ }', "test") == b'{"_index":"test"}'
+
+
+def test_multi_index_export(cluster, tmp_path):
+    path = str(tmp_path / "{index}.ldj.gz")
+    export = es2json.MultiIndexExport("logs-*,users", path, concurrency=2, tag=True, port=cluster,
+                                      headless=True, chunksize=40, verbose=False)
+    assert export.run() == {"logs-a": 10, "logs-b": 300, "logs-c": 100, "users": 5}
+    assert sorted(os.listdir(tmp_path)) == ["logs-a.ldj.gz", "logs-b.ldj.gz", "logs-c.ldj.gz", "users.ldj.gz"]
+    records = read(path.format(index="logs-b"))
+    assert sorted(record["foo"] for record in records) == list(range(300))
+    assert all(record["_index"] == "logs-b" for record in records)
+
+
+def test_multi_index_export_passthrough(cluster, tmp_path):
+    path = str(tmp_path / "{index}.ldj.gz")
+    export = es2json.MultiIndexExport(["users"], path, tag=True, port=cluster, headless=True, passthrough=True, verbose=False)
+    assert export.run() == {"users": 5}
+    assert read(path.format(index="users"))[0] == {"_index": "users", "foo": 0, "bar": 5, "baz": "test0"}
+
+
+def test_multi_index_export_error(cluster, tmp_path):
+    """
+    a failing index doesn't stop the others and leaves no (partial) file
+    """
+    path = str(tmp_path / "{index}.ldj")
+    export = es2json.MultiIndexExport("logs-*", path, port=cluster, verbose=False, body={"query": {"bogus": {}}})
+    with pytest.raises(RuntimeError, match="3 of 3"):
+        export.run()
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(ValueError):
+        es2json.MultiIndexExport("logs-*", str(tmp_path / "out.ldj"), port=cluster)
+
+
+def test_cli_multi_index_export(cluster, tmp_path):
+    path = str(tmp_path / "{index}.ldj.gz")
+    es2json.cli.run(["-server", "http://127.0.0.1:{}/logs-a,users".format(cluster), "-output", path,
+                     "-headless", "-tag_index", "-concurrency", "2"])
+    assert sorted(os.listdir(tmp_path)) == ["logs-a.ldj.gz", "users.ldj.gz"]
+    assert len(read(path.format(index="logs-a"))) == 10
+    with pytest.raises(SystemExit):
+        es2json.cli.run(["-server", "http://127.0.0.1:{}/users/_doc/1".format(cluster), "-output", path])
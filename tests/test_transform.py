@@ -0,0 +1,68 @@
+import os
+import json
+import pytest
+import es2json
+import es2json.cli
+from generate_testdata import MAX
+from test_es2json_esfunctions import default_kwargs
+
+
+def double(record):
+    if record["foo"] % 3 == 0:
+        return None
+    record["foo"] *= 2
+    return record
+
+
+def test_projection():
+    record = {"_id": "1", "_source": {"title": "foo", "author": {"name": "bar", "born": 1900}, "tags": ["a"]}}
+    assert es2json.Projection({"where": {"_source.author.name": ["baz", "bar"]}})(dict(record)) == record
+    assert es2json.Projection({"where": {"_source.author.name": "baz"}})(dict(record)) is None
+    projection = es2json.Projection({"drop": ["_source.author.born"],
+                                     "select": {"id": "_id", "author": "_source.author", "meta.tags": "_source.tags",
+                                                "missing": "_source.missing"},
+                                     "flatten": True})
+    assert projection(record) == {"id": "1", "author.name": "bar", "meta.tags": ["a"]}
+    with pytest.raises(ValueError):
+        es2json.Projection({"rename": {}})
+
+
+def test_load_transform(tmp_path):
+    assert es2json.load_transform("test_transform:double") is double
+    assert isinstance(es2json.load_transform('{"flatten": "_"}'), es2json.Projection)
+    spec = tmp_path / "spec.json"
+    spec.write_text('{"select": {"x": "foo"}}')
+    assert es2json.load_transform(str(spec))({"foo": 1}) == {"x": 1}
+    with pytest.raises(ValueError):
+        es2json.load_transform("double")
+
+
+def test_transformer():
+    records = [{"foo": n} for n in range(100)]
+    expected = [double(dict(record)) for record in records if record["foo"] % 3]
+    for processes in (0, 2):
+        transformer = es2json.Transformer(double, processes=processes, batchsize=7)
+        assert list(transformer.transform(dict(record) for record in records)) == expected
+    transformer = es2json.Transformer([double, {"select": {"bar": "foo"}}], processes=2, ordered=False, batchsize=7,
+                                      encoder="json")
+    lines = list(transformer.transform(records))
+    assert sorted(json.loads(line)["bar"] for line in lines) == sorted(record["foo"] for record in expected)
+
+
+def test_transformer_esgenerator():
+    transformer = es2json.Transformer(double, processes=2, batchsize=100)
+    records = list(transformer.transform(es2json.ESGenerator(headless=True, verbose=False, **default_kwargs).generator()))
+    assert sorted(record["foo"] for record in records) == [n * 2 for n in range(MAX) if n % 3]
+
+
+def test_cli_transform(tmp_path):
+    path = str(tmp_path / "out.ldj")
+    es2json.cli.run(["-server", "http://localhost:9200/test", "-headless", "-output", path,
+                     "-transform", "test_transform:double", "-transform", '{"select": {"x": "foo"}}',
+                     "-transform_processes", "2"])
+    with open(path) as inp:
+        records = [json.loads(line) for line in inp]
+    assert sorted(record["x"] for record in records) == [n * 2 for n in range(MAX) if n % 3]
+    with pytest.raises(SystemExit):
+        es2json.cli.run(["-server", "http://localhost:9200/test", "-headless", "-passthrough",
+                         "-transform", "test_transform:double"])